@@ -9,7 +9,9 @@ import {
   obtenerNotaCombinada,
   crearSesionParaMi,
   enviarFrame,
+  abrirCanalMonitoreo,
 } from "@/services/monitoreo";
+import type { CanalMonitoreo } from "@/services/monitoreo";
 import RecomendacionIA from "./RecomendacionIA";
 
 async function obtenerSesionMonitoreo(recursoId: string, token: string) {
@@ -74,6 +76,7 @@ export default function ResourceViewer({ cursoId }: { cursoId: string }) {
   const videoRef = useRef<HTMLVideoElement | null>(null);
   const streamRef = useRef<MediaStream | null>(null);
   const frameIntervalRef = useRef<ReturnType<typeof setInterval> | null>(null);
+  const canalRef = useRef<CanalMonitoreo | null>(null);
 
   const estudianteId =
     typeof window !== "undefined" ? localStorage.getItem("user_id") : null;
@@ -187,6 +190,11 @@ export default function ResourceViewer({ cursoId }: { cursoId: string }) {
   }, [monitoreoEnCurso]);
 
   const detenerCamara = () => {
+    if (canalRef.current) {
+      canalRef.current.cerrar();
+      canalRef.current = null;
+    }
+
     if (frameIntervalRef.current) {
       clearInterval(frameIntervalRef.current);
       frameIntervalRef.current = null;
@@ -220,7 +228,13 @@ export default function ResourceViewer({ cursoId }: { cursoId: string }) {
     if (!ctx) return;
 
     ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
-    const frame = canvas.toDataURL("image/jpeg");
+    const frame = await new Promise<Blob | null>((resolve) =>
+      canvas.toBlob(resolve, "image/jpeg")
+    );
+    if (!frame) return;
+
+    // Canal WebSocket abierto: el resultado llega por el mismo canal
+    if (canalRef.current?.enviar(frame)) return;
 
     try {
       await enviarFrame({ sesionId: sesion, frame });
@@ -288,7 +302,8 @@ export default function ResourceViewer({ cursoId }: { cursoId: string }) {
         });
       }, 1000);
 
-      // 4) Enviar frames periódicamente
+      // 4) Enviar frames periódicamente (WebSocket si está disponible, si no HTTP)
+      canalRef.current = abrirCanalMonitoreo(sesionId, token);
       frameIntervalRef.current = setInterval(() => {
         capturarYEnviarFrame(sesionId, token);
       }, 1000);
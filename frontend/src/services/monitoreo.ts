@@ -128,12 +128,15 @@ export async function obtenerNotaCombinada(
 }
 
 /* -----------------------------------------------------
-   🔥 NUEVO — ENVÍO DE FRAME BASE64 AL BACKEND
+   🔥 NUEVO — ENVÍO DE FRAME AL BACKEND
+   - Blob: bytes JPEG crudos (application/octet-stream), ~25% menos
+     que base64 y sin decodificación base64 en el servidor
+   - string: dataURL completa (compatibilidad)
 ----------------------------------------------------- */
 
 interface EnviarFrameParams {
   sesionId: string;
-  frame: string; // dataURL completa "data:image/jpeg;base64,XXXXX"
+  frame: Blob | string; // Blob JPEG o dataURL "data:image/jpeg;base64,XXXXX"
 }
 
 export async function enviarFrame(
@@ -147,15 +150,15 @@ export async function enviarFrame(
 
   const url = `${API_URL}/api/sesiones/${sesionId}/monitoreo-atencion/`;
 
+  const esBinario = typeof frame !== "string";
+
   const res = await fetch(url, {
     method: "POST",
     headers: {
-      "Content-Type": "application/json",
+      "Content-Type": esBinario ? "application/octet-stream" : "application/json",
       ...(token ? { Authorization: `Bearer ${token}` } : {}),
     },
-    body: JSON.stringify({
-      frame, // ✔ enviamos el frame completo
-    }),
+    body: esBinario ? frame : JSON.stringify({ frame }),
   });
 
   if (!res.ok) {
@@ -165,3 +168,44 @@ export async function enviarFrame(
 
   return (await res.json()) as RespuestaMonitoreo;
 }
+
+/* -----------------------------------------------------
+   🔌 CANAL WEBSOCKET DE MONITOREO
+   Una conexión persistente por sesión: se envían frames binarios y
+   los resultados llegan por el mismo canal (sin un POST por segundo).
+----------------------------------------------------- */
+
+export interface CanalMonitoreo {
+  enviar: (frame: Blob) => boolean;
+  cerrar: () => void;
+}
+
+export function abrirCanalMonitoreo(
+  sesionId: string,
+  token: string,
+  onMensaje?: (data: RespuestaMonitoreo) => void
+): CanalMonitoreo {
+  const wsUrl = API_URL.replace(/^http/, "ws");
+  const ws = new WebSocket(
+    `${wsUrl}/ws/sesiones/${sesionId}/monitoreo-atencion/?token=${encodeURIComponent(token)}`
+  );
+
+  ws.onmessage = (event) => {
+    if (!onMensaje || typeof event.data !== "string") return;
+    try {
+      onMensaje(JSON.parse(event.data) as RespuestaMonitoreo);
+    } catch {
+      // mensaje no JSON: se ignora
+    }
+  };
+
+  return {
+    // Devuelve false si el canal no está abierto (el llamador usa HTTP)
+    enviar: (frame: Blob) => {
+      if (ws.readyState !== WebSocket.OPEN) return false;
+      ws.send(frame);
+      return true;
+    },
+    cerrar: () => ws.close(),
+  };
+}
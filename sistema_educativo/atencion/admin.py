@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import SesionMonitoreo, AtencionVisual
+from .models import SesionMonitoreo, AtencionVisual, BloqueAtencion, ResumenMinuto, ResumenEstudianteRecurso
 
 admin.site.register(SesionMonitoreo)
-admin.site.register(AtencionVisual)
\ No newline at end of file
+admin.site.register(AtencionVisual)
+admin.site.register(BloqueAtencion)
+admin.site.register(ResumenMinuto)
+admin.site.register(ResumenEstudianteRecurso)
\ No newline at end of file
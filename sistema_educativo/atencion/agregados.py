@@ -0,0 +1,438 @@
+"""
+Agregados de atención por sesión, calculados en línea.
+
+Cada frame clasificado actualiza en O(1) un acumulador por sesión en la
+memoria del proceso (sumas y conteos, sin guardar los frames). El
+acumulador se vuelca a SesionMonitoreo.score_atencion / patrones cada
+MONITOREO_AGREGADO_INTERVALO segundos, al cerrar el WebSocket y al
+terminar el proceso; los reportes leen esos campos en lugar de recorrer
+los registros AtencionVisual.
+
+Lo que se vuelca es el *delta* desde el último volcado y se combina con
+lo ya guardado en patrones["acumulado"], dentro de una transacción: así
+varios workers que reciben frames de la misma sesión suman sus partes en
+lugar de pisarse. Un hilo de fondo por proceso vuelca cada INTERVALO los
+deltas de las sesiones que dejaron de recibir frames. Si la sesión ya
+está `finalizada`, el delta se descarta: los valores finales salen de
+los frames y un volcado tardío de otro worker no los pisa.
+
+patrones queda como:
+    {
+        "frames": 3600,
+        "score_medio": 71.2,          # = score_atencion
+        "score_ewma": 64.8,           # media móvil exponencial (reciente)
+        "fraccion_no_atento": 0.21,   # frames con nivel 0
+        "perclos": 0.08,              # frames con EAR < UMBRAL_OJOS_CERRADOS
+        "bostezos": 3,
+        "bostezos_por_minuto": 0.05,
+        "segundos": 3580.0,           # tiempo monitoreado (huecos > DT_MAX no cuentan)
+        "segundos_cabeza_girada": 410.0,
+        "fraccion_cabeza_girada": 0.11,
+        "acumulado": {...},           # estado combinable, no leer directamente
+    }
+
+Al finalizar la sesión (acción `finalizar` o `manage.py finalizar_sesiones`)
+score_medio, frames, fraccion_no_atento y perclos se recalculan con una
+consulta agregada sobre sus AtencionVisual de la corrida [inicio, fin],
+que es la fuente completa (incluye frames de todos los workers y los
+anteriores a este módulo). Iniciar otra corrida de la misma sesión
+(reiniciar_sesion) vacía estos agregados.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Avg, Count, F, Max, Min, Q
+from django.utils import timezone
+
+from .bloques import almacen_bloques
+from .escritura import buffer_escritura
+from .models import AtencionVisual, SesionMonitoreo
+from .motor import liberar_sesion
+
+
+logger = logging.getLogger(__name__)
+
+INTERVALO = getattr(settings, "MONITOREO_AGREGADO_INTERVALO", 10)  # segundos entre volcados
+ALFA_EWMA = getattr(settings, "MONITOREO_AGREGADO_ALFA", 0.1)
+INACTIVIDAD = getattr(settings, "MONITOREO_AGREGADO_INACTIVIDAD", 300)  # segundos sin frames
+
+# Umbrales de los patrones (EAR/MAR adimensionales, ángulos en grados)
+UMBRAL_OJOS_CERRADOS = 0.2
+UMBRAL_BOSTEZO = 0.6
+UMBRAL_YAW = 30.0
+UMBRAL_PITCH = 20.0
+DT_MAX = 2.0  # segundos máximos atribuidos a un frame (pausas, pestaña oculta)
+
+
+# ============================================================
+#  ACUMULADOR (estado combinable)
+# ============================================================
+
+class Acumulador:
+    """
+    Sumas y conteos de una sesión. Dos acumuladores se combinan con
+    combinar(); la EWMA se combina exactamente porque es lineal: el delta
+    guarda su contribución partiendo de 0 y el factor de decaimiento
+    (1 - alfa)^n de sus frames.
+    """
+
+    CAMPOS = (
+        "frames", "no_atentos", "suma_score", "ojos_cerrados", "bostezos",
+        "segundos", "segundos_cabeza_girada", "ewma", "decaimiento",
+    )
+
+    def __init__(self, **valores):
+        self.frames = 0
+        self.no_atentos = 0
+        self.suma_score = 0.0
+        self.ojos_cerrados = 0
+        self.bostezos = 0
+        self.segundos = 0.0
+        self.segundos_cabeza_girada = 0.0
+        self.ewma = 0.0
+        self.decaimiento = 1.0
+        for campo, valor in valores.items():
+            if campo in self.CAMPOS:
+                setattr(self, campo, valor)
+
+    def __bool__(self):
+        return self.frames > 0
+
+    def combinar(self, delta):
+        """Acumulador con lo guardado (`self`) seguido de `delta`."""
+        combinado = Acumulador(**{
+            campo: getattr(self, campo) + getattr(delta, campo)
+            for campo in self.CAMPOS
+        })
+        combinado.ewma = self.ewma * delta.decaimiento + delta.ewma
+        combinado.decaimiento = self.decaimiento * delta.decaimiento
+        return combinado
+
+    def a_dict(self):
+        return {campo: getattr(self, campo) for campo in self.CAMPOS}
+
+    def resumen(self):
+        """(score_atencion, patrones) para guardar en la sesión."""
+        if not self.frames:
+            return None, {"frames": 0, "acumulado": self.a_dict()}
+
+        score_medio = self.suma_score / self.frames
+        # Corrección de sesgo: la EWMA parte de 0
+        score_ewma = self.ewma / (1.0 - self.decaimiento) if self.decaimiento < 1.0 else score_medio
+        minutos = self.segundos / 60.0
+
+        return score_medio, {
+            "frames": self.frames,
+            "score_medio": round(score_medio, 2),
+            "score_ewma": round(score_ewma, 2),
+            "fraccion_no_atento": round(self.no_atentos / self.frames, 4),
+            "perclos": round(self.ojos_cerrados / self.frames, 4),
+            "bostezos": self.bostezos,
+            "bostezos_por_minuto": round(self.bostezos / minutos, 3) if minutos else None,
+            "segundos": round(self.segundos, 1),
+            "segundos_cabeza_girada": round(self.segundos_cabeza_girada, 1),
+            "fraccion_cabeza_girada": (
+                round(self.segundos_cabeza_girada / self.segundos, 4) if self.segundos else None
+            ),
+            "acumulado": self.a_dict(),
+        }
+
+
+class EstadoAgregado:
+    """Delta pendiente de una sesión + lo necesario para el siguiente frame."""
+
+    def __init__(self):
+        self.delta = Acumulador()
+        self.ultimo_momento = None
+        self.bostezando = False
+        self.guardado = time.monotonic()
+        self.actividad = time.monotonic()
+
+    def registrar(self, metricas, nivel, score, momento, alfa):
+        delta = self.delta
+        delta.frames += 1
+        delta.suma_score += score
+        delta.ewma = (1.0 - alfa) * delta.ewma + alfa * score
+        delta.decaimiento *= 1.0 - alfa
+        if not nivel:
+            delta.no_atentos += 1
+        if metricas["ear"] < UMBRAL_OJOS_CERRADOS:
+            delta.ojos_cerrados += 1
+
+        # Bostezo = flanco de subida de MAR sobre el umbral
+        bostezando = metricas["mar"] > UMBRAL_BOSTEZO
+        if bostezando and not self.bostezando:
+            delta.bostezos += 1
+        self.bostezando = bostezando
+
+        # Tiempo atribuido al frame: hasta el frame anterior, acotado
+        if self.ultimo_momento is not None:
+            dt = min(max((momento - self.ultimo_momento).total_seconds(), 0.0), DT_MAX)
+            delta.segundos += dt
+            if abs(metricas["yaw"]) > UMBRAL_YAW or abs(metricas["pitch"]) > UMBRAL_PITCH:
+                delta.segundos_cabeza_girada += dt
+        if self.ultimo_momento is None or momento > self.ultimo_momento:
+            self.ultimo_momento = momento
+
+        self.actividad = time.monotonic()
+
+
+# ============================================================
+#  AGREGADOR DEL PROCESO
+# ============================================================
+
+class AgregadorSesiones:
+    """Acumuladores de las sesiones activas en este proceso."""
+
+    def __init__(self, intervalo=INTERVALO, alfa=ALFA_EWMA, inactividad=INACTIVIDAD):
+        self.intervalo = intervalo
+        self.alfa = alfa
+        self.inactividad = inactividad
+        self._estados = {}
+        self._hilo = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _iniciar(self):
+        # El hilo no sobrevive a un fork: se crea de nuevo en cada proceso
+        if self._hilo is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._hilo is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._hilo = threading.Thread(
+                    target=self._bucle, name="agregados-atencion", daemon=True
+                )
+                self._hilo.start()
+
+    def registrar(self, sesion_id, metricas, nivel, score, momento):
+        """Suma un frame clasificado; vuelca si ya pasó el intervalo."""
+        self._iniciar()
+        ahora = time.monotonic()
+        with self._lock:
+            estado = self._estados.get(sesion_id)
+            if estado is None:
+                estado = self._estados[sesion_id] = EstadoAgregado()
+            estado.registrar(metricas, nivel, score, momento, self.alfa)
+            vencido = ahora - estado.guardado >= self.intervalo
+
+        if vencido:
+            self.guardar(sesion_id)
+
+    def guardar(self, sesion_id, olvidar=False):
+        """
+        Vuelca el delta pendiente de la sesión (y opcionalmente la olvida).
+        Si la escritura falla, el delta vuelve al estado y se reintenta en
+        el próximo volcado; devuelve False.
+        """
+        with self._lock:
+            estado = self._estados.pop(sesion_id, None) if olvidar else self._estados.get(sesion_id)
+            if estado is None:
+                return True
+            delta, estado.delta = estado.delta, Acumulador()
+            estado.guardado = time.monotonic()
+
+        if not delta:
+            return True
+        try:
+            _combinar_en_sesion(sesion_id, delta)
+        except Exception:
+            logger.exception("No se pudieron guardar los agregados de la sesión %s.", sesion_id)
+            with self._lock:
+                estado.delta = delta.combinar(estado.delta)
+                if olvidar:
+                    self._estados.setdefault(sesion_id, estado)
+            return False
+        return True
+
+    def cerrar(self, sesion_id):
+        """Volcado final de la sesión (fin del WebSocket o de la sesión)."""
+        return self.guardar(sesion_id, olvidar=True)
+
+    def guardar_todo(self):
+        for sesion_id in list(self._estados):
+            self.guardar(sesion_id, olvidar=True)
+
+    def _bucle(self):
+        # Sin este barrido, el último delta de un worker que deja de
+        # recibir frames esperaría hasta el apagado
+        while True:
+            time.sleep(self.intervalo)
+            close_old_connections()
+            try:
+                self._barrer(time.monotonic())
+            except Exception:
+                logger.exception("Falló el volcado periódico de agregados.")
+            finally:
+                close_old_connections()
+
+    def _barrer(self, ahora):
+        # Sesiones con delta pendiente que no volvieron a recibir frames, y
+        # sesiones inactivas (último volcado y se liberan)
+        with self._lock:
+            pendientes = [
+                (sesion_id, ahora - estado.actividad >= self.inactividad)
+                for sesion_id, estado in self._estados.items()
+                if ahora - estado.actividad >= self.inactividad
+                or (estado.delta and ahora - estado.guardado >= self.intervalo)
+            ]
+        for sesion_id, olvidar in pendientes:
+            self.guardar(sesion_id, olvidar=olvidar)
+
+
+def reiniciar_sesion(sesion, segundos):
+    """
+    Abre una nueva corrida de monitoreo de la sesión (modo A de
+    monitoreo-atencion): guarda lo pendiente de la corrida anterior y
+    después deja inicio = ahora, fin = ahora + `segundos` y los agregados
+    vacíos (score, patrones con su "acumulado", finalizada), así el
+    volcado en línea, `finalizar` y el barrido calculan la nueva corrida.
+    El tracking, la ROI, el dedup y la pose guiada de la corrida anterior
+    se descartan: la nueva empieza sin estado de visión.
+    """
+    buffer_escritura.guardar()
+    almacen_bloques.cerrar(sesion.id)
+    agregador.cerrar(sesion.id)
+    liberar_sesion(sesion.id)
+
+    ahora = timezone.now()
+    sesion.inicio = ahora
+    sesion.fin = ahora + timedelta(seconds=segundos)
+    sesion.duracion = sesion.fin - sesion.inicio
+    sesion.score_atencion = None
+    sesion.patrones = None
+    sesion.finalizada = None
+    sesion.save()
+    return sesion
+
+
+def _combinar_en_sesion(sesion_id, delta):
+    with transaction.atomic():
+        fila = (
+            SesionMonitoreo.objects.select_for_update()
+            .filter(pk=sesion_id)
+            .values_list("patrones", "finalizada")
+            .first()
+        )
+        if fila is None:
+            return
+        patrones, finalizada = fila
+        if finalizada is not None:
+            # finalizar_sesiones ya calculó los valores finales desde los frames
+            logger.info("Sesión %s finalizada: se descartan %d frames del volcado.", sesion_id, delta.frames)
+            return
+        guardado = Acumulador(**((patrones or {}).get("acumulado") or {}))
+        score, patrones = guardado.combinar(delta).resumen()
+        SesionMonitoreo.objects.filter(pk=sesion_id).update(score_atencion=score, patrones=patrones)
+
+
+agregador = AgregadorSesiones()
+
+
+@atexit.register
+def _guardar_al_salir():
+    # Apagado ordenado del worker: no perder el último intervalo
+    agregador.guardar_todo()
+    close_old_connections()
+
+
+# ============================================================
+#  FINALIZACIÓN
+# ============================================================
+
+def _agregados_sql(sesion_ids):
+    """
+    Una fila por sesión con los agregados de los frames de su corrida
+    [inicio, fin] (un solo GROUP BY).
+    """
+    cabeza_girada = (
+        Q(yaw__gt=UMBRAL_YAW) | Q(yaw__lt=-UMBRAL_YAW)
+        | Q(pitch__gt=UMBRAL_PITCH) | Q(pitch__lt=-UMBRAL_PITCH)
+    )
+    filas = (
+        AtencionVisual.objects.filter(sesion_id__in=sesion_ids, score_atencion__isnull=False)
+        .filter(timestamp__gte=F("sesion__inicio"))
+        .filter(Q(sesion__fin__isnull=True) | Q(timestamp__lte=F("sesion__fin")))
+        .values("sesion_id")
+        .annotate(
+            frames=Count("id"),
+            score_medio=Avg("score_atencion"),
+            # nivel_atencion guarda la clase del modelo: "1" = atento
+            no_atentos=Count("id", filter=~Q(nivel_atencion="1")),
+            ojos_cerrados=Count("id", filter=Q(ear__lt=UMBRAL_OJOS_CERRADOS)),
+            cabeza_girada=Count("id", filter=cabeza_girada),
+            primero=Min("timestamp"),
+            ultimo=Max("timestamp"),
+        )
+        .order_by()
+    )
+    return {fila["sesion_id"]: fila for fila in filas}
+
+
+def finalizar_sesiones(sesion_ids, marcar=True):
+    """
+    Calcula score_atencion y patrones de las sesiones desde los frames de
+    su corrida y, con `marcar`, las da por cerradas (finalizada = ahora; si
+    el `fin` previsto aún no llegó, pasa a ser ahora). duracion = fin -
+    inicio; sin `fin`, el tramo de frames acotado a [inicio, ahora] (los
+    timestamps los manda el cliente). Sesiones sin frames en filas
+    conservan el score de los agregados en línea.
+    Devuelve la cantidad de sesiones actualizadas.
+    """
+    sesion_ids = list(sesion_ids)
+    if not sesion_ids:
+        return 0
+
+    # Lo pendiente en este proceso tiene que estar en la base antes de agregar
+    buffer_escritura.guardar()
+    for sesion_id in sesion_ids:
+        almacen_bloques.cerrar(sesion_id)
+        agregador.cerrar(sesion_id)
+
+    ahora = timezone.now()
+    campos = ["score_atencion", "patrones", "duracion"]
+    if marcar:
+        campos += ["fin", "finalizada"]
+
+    with transaction.atomic():
+        agregados = _agregados_sql(sesion_ids)
+        sesiones = list(
+            SesionMonitoreo.objects.select_for_update()
+            .filter(pk__in=sesion_ids)
+            .only("id", "inicio", "fin", "duracion", "score_atencion", "patrones", "finalizada")
+        )
+        for sesion in sesiones:
+            if marcar:
+                if sesion.fin is None or sesion.fin > ahora:
+                    sesion.fin = ahora
+                sesion.finalizada = ahora
+
+            fila = agregados.get(sesion.id)
+            if sesion.fin is not None:
+                sesion.duracion = sesion.fin - sesion.inicio
+            elif fila is not None:
+                sesion.duracion = max(min(fila["ultimo"], ahora) - fila["primero"], timedelta(0))
+            if fila is None:
+                continue
+
+            frames = fila["frames"]
+            sesion.score_atencion = fila["score_medio"]
+            patrones = dict(sesion.patrones or {})
+            patrones.update({
+                "frames": frames,
+                "score_medio": round(fila["score_medio"], 2),
+                "fraccion_no_atento": round(fila["no_atentos"] / frames, 4),
+                "perclos": round(fila["ojos_cerrados"] / frames, 4),
+            })
+            # Sin agregados en línea (sesiones históricas): fracción de frames
+            patrones.setdefault("fraccion_cabeza_girada", round(fila["cabeza_girada"] / frames, 4))
+            sesion.patrones = patrones
+
+        SesionMonitoreo.objects.bulk_update(sesiones, campos)
+    return len(sesiones)
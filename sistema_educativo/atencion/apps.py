@@ -1,6 +1,44 @@
+import logging
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def proceso_servidor(argv=None, entorno=None):
+    """
+    True si este proceso va a atender solicitudes: un servidor WSGI/ASGI
+    (gunicorn, uvicorn, daphne...) o el proceso hijo de `runserver` (con
+    el autoreloader, el padre solo vigila archivos). Falso para el resto de
+    comandos de manage.py (migrate, test, makemigrations, shell...).
+    """
+    argv = sys.argv if argv is None else argv
+    entorno = os.environ if entorno is None else entorno
+    programa = os.path.basename(argv[0]) if argv else ""
+    if programa not in ("manage.py", "django-admin", "django-admin.py"):
+        return True
+    if len(argv) < 2 or argv[1] != "runserver":
+        return False
+    return entorno.get("RUN_MAIN") == "true" or "--noreload" in argv
 
 
 class AtencionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'atencion'
+
+    def ready(self):
+        # Calentamiento opcional: cada worker inicializa FaceMesh, OpenCV y el
+        # modelo antes de atender tráfico, en lugar de hacerlo en su primer frame
+        if getattr(settings, "MONITOREO_CALENTAR", False) and proceso_servidor():
+            from .motor import calentar
+
+            try:
+                segundos = calentar()
+            except Exception:
+                logger.exception("Falló el calentamiento del monitoreo de atención.")
+            else:
+                logger.info("Monitoreo de atención calentado en %.2f s.", segundos)
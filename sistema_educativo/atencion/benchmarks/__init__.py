@@ -0,0 +1,27 @@
+"""
+Escenarios de `python manage.py benchmark_atencion`, agrupados por lo que miden:
+- vision: pipeline de FaceMesh y features (pool, tracking, binario, roi,
+  dedup, head_pose)
+- modelo: clasificador (microlotes, bosque_plano, memoria_workers)
+- base_datos: persistencia de frames (escritura, almacenamiento)
+
+Cada escenario es una función bench_<nombre>(banco) que recibe un Banco
+(base.py) con las opciones del comando y las utilidades de medición.
+"""
+from . import base_datos, modelo, vision
+from .base import Banco
+
+
+ESCENARIOS = {
+    "pool": vision.bench_pool,
+    "tracking": vision.bench_tracking,
+    "binario": vision.bench_binario,
+    "roi": vision.bench_roi,
+    "dedup": vision.bench_dedup,
+    "head_pose": vision.bench_head_pose,
+    "microlotes": modelo.bench_microlotes,
+    "bosque_plano": modelo.bench_bosque_plano,
+    "memoria_workers": modelo.bench_memoria_workers,
+    "escritura": base_datos.bench_escritura,
+    "almacenamiento": base_datos.bench_almacenamiento,
+}
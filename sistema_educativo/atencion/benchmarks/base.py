@@ -0,0 +1,87 @@
+"""
+Utilidades comunes de los escenarios: frames de muestra, medición y reporte.
+"""
+import time
+
+import numpy as np
+from django.core.management.base import CommandError
+
+
+def estadisticas(tiempos):
+    """Resumen en milisegundos de una lista de tiempos en segundos."""
+    ms = np.array(tiempos) * 1000.0
+    return {
+        "media": float(ms.mean()),
+        "p50": float(np.percentile(ms, 50)),
+        "p95": float(np.percentile(ms, 95)),
+    }
+
+
+def diferencia_angular(diffs):
+    """Diferencia de ángulos en grados, llevada a [-180, 180)."""
+    return (np.asarray(diffs) + 180.0) % 360.0 - 180.0
+
+
+class Banco:
+    """
+    Una corrida de benchmark_atencion: opciones y salida del comando, más lo
+    que comparten los escenarios para generar entradas, medir y reportar.
+    """
+
+    def __init__(self, opciones, stdout):
+        self.opciones = opciones
+        self.stdout = stdout
+
+    def cargar_frames(self):
+        """
+        Frames de --imagen o, por defecto, un rostro sintético 640x480 que
+        FaceMesh detecta (cara_sintetica): así los escenarios de visión
+        miden el camino con rostro (landmarks, ROI, head pose) y no el
+        atajo de "sin rostro".
+        """
+        import cv2
+
+        rutas = self.opciones["imagen"]
+        if not rutas:
+            from atencion.scripts.procesamiento_mediapipe import cara_sintetica
+
+            return [cara_sintetica()]
+
+        frames = []
+        for ruta in rutas:
+            frame = cv2.imread(ruta)
+            if frame is None:
+                raise CommandError(f"No se pudo leer la imagen: {ruta}")
+            frames.append(frame)
+        return frames
+
+    def secuencia_video(self, frames):
+        """Simula un stream de webcam: pequeños desplazamientos entre frames."""
+        import cv2
+
+        secuencia = []
+        for i in range(self.opciones["frames"]):
+            frame = frames[i % len(frames)]
+            h, w = frame.shape[:2]
+            dx, dy = 3 * np.sin(i / 5.0), 2 * np.cos(i / 7.0)
+            m = np.float32([[1, 0, dx], [0, 1, dy]])
+            secuencia.append(cv2.warpAffine(frame, m, (w, h)))
+        return secuencia
+
+    def medir(self, funcion, entradas):
+        n = self.opciones["frames"]
+        tiempos = []
+        for i in range(n):
+            entrada = entradas[i % len(entradas)]
+            t0 = time.perf_counter()
+            funcion(entrada)
+            tiempos.append(time.perf_counter() - t0)
+        return tiempos
+
+    def reportar(self, nombre, tiempos):
+        est = estadisticas(tiempos)
+        self.stdout.write(
+            f"{nombre:<32} media={est['media']:8.2f} ms  "
+            f"p50={est['p50']:8.2f} ms  p95={est['p95']:8.2f} ms"
+        )
+        return est
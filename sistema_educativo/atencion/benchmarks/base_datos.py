@@ -0,0 +1,159 @@
+"""
+Escenarios de persistencia: escritura directa vs diferida (escritura.py) y
+filas vs bloques columnares (bloques.py).
+"""
+import time
+
+import numpy as np
+
+
+def bench_escritura(banco):
+    """
+    Inserción de AtencionVisual por frame (directa) vs buffer diferido,
+    con 50 y 500 estudiantes simulados enviando --frames frames cada uno
+    sobre la base configurada. Los registros de prueba se borran al final.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from django.db import OperationalError, connection
+
+    from atencion.escritura import DIFERIDA, DIRECTA, BufferEscritura
+    from atencion.models import AtencionVisual
+
+    marca = "benchmark-escritura"
+    n = banco.opciones["frames"]
+
+    def estudiante(buffer):
+        tiempos, errores = [], 0
+        try:
+            for _ in range(n):
+                registro = AtencionVisual(
+                    score_atencion=50.0, nivel_atencion="1", modelo_version=marca,
+                    ear=0.3, mar=0.2, yaw=0.0, pitch=0.0, roll=0.0,
+                )
+                t0 = time.perf_counter()
+                try:
+                    buffer.agregar([registro])
+                except OperationalError:
+                    # SQLite: "database is locked" tras agotar el timeout
+                    errores += 1
+                tiempos.append(time.perf_counter() - t0)
+                time.sleep(0.001)
+        finally:
+            connection.close()
+        return tiempos, errores
+
+    try:
+        for estudiantes in (50, 500):
+            for modo in (DIRECTA, DIFERIDA):
+                buffer = BufferEscritura(modo)
+                with ThreadPoolExecutor(max_workers=estudiantes) as pool:
+                    t0 = time.perf_counter()
+                    resultados = list(pool.map(estudiante, [buffer] * estudiantes))
+                    buffer.guardar()
+                    total = time.perf_counter() - t0
+
+                tiempos = sum((r[0] for r in resultados), [])
+                errores = sum(r[1] for r in resultados)
+                guardados = AtencionVisual.objects.filter(modelo_version=marca).count()
+                AtencionVisual.objects.filter(modelo_version=marca).delete()
+
+                banco.reportar(f"{estudiantes:>3} estudiantes, {modo}", tiempos)
+                banco.stdout.write(
+                    f"{'':<32} throughput={guardados / total:8.0f} filas/s  "
+                    f"guardadas={guardados}/{len(tiempos)}  errores={errores}"
+                )
+    finally:
+        AtencionVisual.objects.filter(modelo_version=marca).delete()
+
+
+def bench_almacenamiento(banco):
+    """
+    Una sesión de 1 hora a 1 fps (3600 frames): espacio en disco (SQLite,
+    tabla + índices) y tiempo de carga a NumPy, fila por frame
+    (AtencionVisual) vs bloques columnares (BloqueAtencion).
+    """
+    from datetime import timedelta
+
+    from django.db import connection
+    from django.utils import timezone
+
+    from atencion.bloques import AlmacenBloques, cargar_sesion
+    from atencion.models import AtencionVisual, SesionMonitoreo
+    from cursos.models import Curso, Fase, Nivel, Recurso
+    from usuarios.models import Usuario
+
+    def paginas(prefijo):
+        if connection.vendor != "sqlite":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE %s", [prefijo + "%"])
+            return cursor.fetchone()[0] or 0
+
+    marca = "benchmark-almacenamiento"
+    docente = Usuario.objects.create(username=f"{marca}-doc", email=f"{marca}-doc@x.com", rol="docente")
+    try:
+        estudiante = Usuario.objects.create(username=f"{marca}-est", email=f"{marca}-est@x.com", rol="estudiante")
+        curso = Curso.objects.create(nombre=marca, descripcion=marca, docente=docente)
+        nivel = Nivel.objects.create(curso=curso, orden=1, nombre=marca)
+        fase = Fase.objects.create(nivel=nivel, orden=1, nombre=marca)
+        recurso = Recurso.objects.create(fase=fase, nombre=marca, tipo="video", archivo="recursos/x.mp4")
+        sesion = SesionMonitoreo.objects.create(estudiante=estudiante, recurso=recurso, fase=fase)
+
+        rng = np.random.default_rng(0)
+        n = 3600
+        inicio = timezone.now()
+        metricas = np.column_stack([
+            rng.uniform(0.15, 0.35, n), rng.uniform(0.0, 0.6, n),
+            rng.normal(0, 15, n), rng.normal(0, 15, n), rng.normal(0, 5, n),
+        ])
+        scores = rng.uniform(0, 100, n)
+        niveles = (scores >= 50).astype(int)
+        momentos = [inicio + timedelta(seconds=i) for i in range(n)]
+
+        antes = paginas("atencion_atencionvisual")
+        AtencionVisual.objects.bulk_create([
+            AtencionVisual(
+                sesion=sesion, estudiante=estudiante, recurso=recurso, fase=fase,
+                ear=m[0], mar=m[1], yaw=m[2], pitch=m[3], roll=m[4],
+                score_atencion=score, nivel_atencion=str(nivel), modelo_version="v1", timestamp=momento,
+            )
+            for m, score, nivel, momento in zip(metricas.tolist(), scores.tolist(), niveles, momentos)
+        ], batch_size=500)
+        bytes_filas = paginas("atencion_atencionvisual")
+
+        antes_bloques = paginas("atencion_bloqueatencion")
+        almacen = AlmacenBloques(intervalo=3600)
+        for m, score, nivel, momento in zip(metricas.tolist(), scores.tolist(), niveles, momentos):
+            almacen.registrar(sesion.id, dict(zip(("ear", "mar", "yaw", "pitch", "roll"), m)), nivel, score, momento, "v1")
+        almacen.cerrar(sesion.id)
+        bytes_bloques = paginas("atencion_bloqueatencion")
+
+        def cargar_filas():
+            filas = list(
+                AtencionVisual.objects.filter(sesion=sesion).order_by("timestamp")
+                .values_list("ear", "mar", "yaw", "pitch", "roll", "score_atencion", "nivel_atencion", "timestamp")
+            )
+            columnas = list(zip(*filas))
+            datos = {c: np.array(v, dtype=np.float32) for c, v in zip(("ear", "mar", "yaw", "pitch", "roll", "score"), columnas)}
+            datos["etiqueta"] = np.array(columnas[6], dtype=np.uint8)
+            datos["timestamp"] = np.array([t.replace(tzinfo=None) for t in columnas[7]], dtype="datetime64[ms]")
+            return datos
+
+        tiempos_filas = banco.medir(lambda _: cargar_filas(), [None])
+        tiempos_bloques = banco.medir(lambda _: cargar_sesion(sesion.id), [None])
+
+        a, b = cargar_filas(), cargar_sesion(sesion.id)
+        iguales = all(np.array_equal(a[c], b[c]) for c in ("ear", "score", "etiqueta", "timestamp"))
+
+        banco.stdout.write(f"Sesión de {n} frames (carga: {banco.opciones['frames']} repeticiones)")
+        if bytes_filas is not None:
+            banco.stdout.write(f"  disco filas   = {(bytes_filas - antes) / 1024:8.0f} KiB")
+            banco.stdout.write(f"  disco bloques = {(bytes_bloques - antes_bloques) / 1024:8.0f} KiB")
+        banco.reportar("  carga filas", tiempos_filas)
+        banco.reportar("  carga bloques", tiempos_bloques)
+        banco.stdout.write(f"  mismos datos: {iguales}")
+    finally:
+        # Borra usuarios, curso, sesión, registros y bloques en cascada
+        Curso.objects.filter(nombre=marca).delete()
+        Usuario.objects.filter(username__startswith=marca).delete()
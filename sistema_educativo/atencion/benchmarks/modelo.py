@@ -0,0 +1,188 @@
+"""
+Escenarios del clasificador: micro-lotes (inferencia.py), bosque plano vs
+scikit-learn y memoria por worker del modelo cargado.
+"""
+import os
+import time
+
+import numpy as np
+from django.core.management.base import CommandError
+
+
+def bench_microlotes(banco):
+    """Predicción directa vs micro-lotes con 1, 10 y 100 llamadores concurrentes."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from atencion.inferencia import MicroLotes
+    from atencion.scripts.modelo_atencion_rf import predecir_atencion_lote
+
+    rng = np.random.default_rng(0)
+    n = banco.opciones["frames"]
+    muestras = np.column_stack([
+        rng.uniform(0.15, 0.35, n), rng.uniform(0.0, 0.6, n),
+        rng.normal(0, 15, n), rng.normal(0, 15, n), rng.normal(0, 5, n),
+    ])
+    agrupador = MicroLotes(predecir_atencion_lote)
+    predecir_atencion_lote(muestras[:1])
+
+    def llamador(predecir):
+        tiempos = []
+        for fila in muestras:
+            t0 = time.perf_counter()
+            predecir(fila[None, :])
+            tiempos.append(time.perf_counter() - t0)
+        return tiempos
+
+    for llamadores in (1, 10, 100):
+        for nombre, predecir in (("directo", predecir_atencion_lote), ("micro-lotes", agrupador.predecir)):
+            with ThreadPoolExecutor(max_workers=llamadores) as pool:
+                t0 = time.perf_counter()
+                tiempos = sum(pool.map(llamador, [predecir] * llamadores), [])
+                total = time.perf_counter() - t0
+            banco.reportar(f"{llamadores:>3} llamadores, {nombre}", tiempos)
+            banco.stdout.write(f"{'':<32} throughput={len(tiempos) / total:8.0f} pred/s")
+
+
+def bench_bosque_plano(banco):
+    """Random Forest de scikit-learn (pickle) vs bosque plano: latencia, concordancia y memoria."""
+    import pickle
+    import subprocess
+    import sys
+
+    from atencion.scripts import modelo_atencion_rf as rf
+    from atencion.scripts.bosque_plano import BosquePlano, exportar_bosque
+
+    ruta_pickle, ruta_bosque = rf.registro.rutas(rf.registro.version_activa() or "legacy")
+    if not os.path.exists(ruta_pickle):
+        raise CommandError(f"Se necesita el modelo de scikit-learn en {ruta_pickle}")
+
+    with open(ruta_pickle, "rb") as f:
+        paquete = pickle.load(f)
+    modelo, scaler = paquete["modelo"], paquete["scaler"]
+    bosque = BosquePlano(exportar_bosque(modelo, scaler, paquete["features"]))
+
+    rng = np.random.default_rng(0)
+    n = 1000
+    muestras = np.column_stack([
+        rng.uniform(0.15, 0.35, n), rng.uniform(0.0, 0.6, n),
+        rng.normal(0, 15, n), rng.normal(0, 15, n), rng.normal(0, 5, n),
+    ])
+    filas = [muestras[i:i + 1] for i in range(n)]
+
+    def sklearn(matriz):
+        return modelo.predict_proba(scaler.transform(matriz))
+
+    base = banco.reportar("sklearn, 1 fila", banco.medir(sklearn, filas))
+    plano = banco.reportar("Bosque plano, 1 fila", banco.medir(bosque.predict_proba, filas))
+    banco.stdout.write(f"Aceleración 1 fila: x{base['media'] / plano['media']:.1f}")
+
+    base = banco.reportar(f"sklearn, {n} filas", banco.medir(sklearn, [muestras]))
+    plano = banco.reportar(f"Bosque plano, {n} filas", banco.medir(bosque.predict_proba, [muestras]))
+    banco.stdout.write(f"Aceleración {n} filas: x{base['media'] / plano['media']:.1f}")
+
+    prob_sklearn, prob_plano = sklearn(muestras), bosque.predict_proba(muestras)
+    iguales = (prob_sklearn.argmax(axis=1) == prob_plano.argmax(axis=1)).mean()
+    banco.stdout.write(
+        f"Concordancia: predicciones iguales={iguales:.2%}, "
+        f"diferencia máx. de probabilidad={np.abs(prob_sklearn - prob_plano).max():.2e}"
+    )
+
+    # Memoria residente máxima (VmHWM) de un proceso nuevo que solo carga
+    # cada modelo; ru_maxrss no sirve aquí porque se hereda del padre
+    codigos = {
+        "pickle (sklearn)": f"import pickle; pickle.load(open({ruta_pickle!r}, 'rb'))",
+        "bosque plano": (
+            "from atencion.scripts.bosque_plano import BosquePlano; "
+            f"BosquePlano.cargar({ruta_bosque!r})"
+        ),
+    }
+    if not os.path.exists(ruta_bosque):
+        del codigos["bosque plano"]
+    for nombre, codigo in codigos.items():
+        salida = subprocess.run(
+            [sys.executable, "-c", codigo + "; print([l.split()[1] for l in "
+             "open('/proc/self/status') if l.startswith('VmHWM')][0])"],
+            capture_output=True, text=True, check=True,
+        )
+        banco.stdout.write(f"RSS máx. al cargar {nombre:<18} {int(salida.stdout) / 1024:8.1f} MiB")
+
+
+def bench_memoria_workers(banco):
+    """RSS/PSS por worker: pickle de sklearn vs bosque plano en memoria vs mapeado (mmap)."""
+    import pickle
+    import subprocess
+    import sys
+    import tempfile
+
+    from atencion.scripts import modelo_atencion_rf as rf
+    from atencion.scripts.bosque_plano import exportar_bosque, guardar_bosque
+
+    ruta_pickle, _ = rf.registro.rutas(rf.registro.version_activa() or "legacy")
+    if not os.path.exists(ruta_pickle):
+        raise CommandError(f"Se necesita el modelo de scikit-learn en {ruta_pickle}")
+
+    with open(ruta_pickle, "rb") as f:
+        paquete = pickle.load(f)
+
+    directorio = tempfile.mkdtemp(prefix="bosque-")
+    guardar_bosque(
+        exportar_bosque(paquete["modelo"], paquete["scaler"], paquete["features"]), directorio
+    )
+
+    cargas = {
+        "pickle (sklearn)": (
+            f"import pickle; p = pickle.load(open({ruta_pickle!r}, 'rb')); "
+            "predecir = lambda X: p['modelo'].predict_proba(p['scaler'].transform(X))"
+        ),
+        "bosque plano en memoria": (
+            "from atencion.scripts.bosque_plano import BosquePlano; "
+            f"predecir = BosquePlano.cargar({directorio!r}, mmap=False).predict_proba"
+        ),
+        "bosque plano mapeado": (
+            "from atencion.scripts.bosque_plano import BosquePlano; "
+            f"predecir = BosquePlano.cargar({directorio!r}).predict_proba"
+        ),
+    }
+    programa = (
+        "import sys\nimport numpy as np\n{carga}\n"
+        "rng = np.random.default_rng(0)\n"
+        "for fila in rng.normal([0.25, 0.3, 0, 0, 0], [0.05, 0.2, 20, 20, 8], (500, 1, 5)):\n"
+        "    predecir(fila)\n"
+        "print('listo', flush=True)\n"
+        "sys.stdin.read()\n"
+    )
+
+    def memoria(pid):
+        # Rss: memoria residente; Pss: con las páginas compartidas repartidas entre procesos
+        valores = {}
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for linea in f:
+                clave, _, resto = linea.partition(":")
+                if clave in ("Rss", "Pss"):
+                    valores[clave] = int(resto.split()[0]) / 1024
+        return valores
+
+    n = banco.opciones["procesos"]
+    banco.stdout.write(f"{n} workers por modo (MiB por worker, media):")
+    for nombre, carga in cargas.items():
+        procesos = [
+            subprocess.Popen(
+                [sys.executable, "-c", programa.format(carga=carga)],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+            )
+            for _ in range(n)
+        ]
+        try:
+            for proceso in procesos:
+                proceso.stdout.readline()
+            medidas = [memoria(proceso.pid) for proceso in procesos]
+        finally:
+            for proceso in procesos:
+                proceso.stdin.close()
+                proceso.wait()
+
+        rss = np.mean([m["Rss"] for m in medidas])
+        pss = np.mean([m["Pss"] for m in medidas])
+        banco.stdout.write(
+            f"  {nombre:<26} RSS={rss:7.1f}  PSS={pss:7.1f}  total PSS={pss * n:7.1f}"
+        )
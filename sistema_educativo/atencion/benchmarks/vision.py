@@ -0,0 +1,249 @@
+"""
+Escenarios de visión (scripts/procesamiento_mediapipe.py): pool de FaceMesh,
+tracking, frames binarios, recorte ROI, omisión de repetidos y head pose.
+"""
+import numpy as np
+
+from .base import diferencia_angular
+
+
+def bench_pool(banco):
+    """FaceMesh construido por frame (antes) vs pool reutilizable (después)."""
+    import cv2
+    from atencion.scripts import procesamiento_mediapipe as pm
+
+    frames = banco.cargar_frames()
+
+    def por_frame(frame):
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        with pm.mp_face_mesh.FaceMesh(**pm.FACE_MESH_CONFIG) as face_mesh:
+            face_mesh.process(rgb)
+
+    # Primera llamada fuera de la medición (carga inicial del pool)
+    pm.procesar_frame_numpy(frames[0])
+
+    antes = banco.reportar("FaceMesh por frame (antes)", banco.medir(por_frame, frames))
+    despues = banco.reportar(
+        "Pool FaceMesh (después)", banco.medir(pm.procesar_frame_numpy, frames)
+    )
+    banco.stdout.write(f"Aceleración: x{antes['media'] / despues['media']:.1f}")
+
+
+def bench_tracking(banco):
+    """Detección completa por frame vs FaceMesh en modo video por sesión."""
+    from atencion.scripts import procesamiento_mediapipe as pm
+
+    secuencia = banco.secuencia_video(banco.cargar_frames())
+    pm.procesar_frame_numpy(secuencia[0])
+
+    deteccion = banco.reportar(
+        "Detección por frame (pool)", banco.medir(pm.procesar_frame_numpy, secuencia)
+    )
+
+    activo_previo = pm.TRACKING_ACTIVO
+    pm.TRACKING_ACTIVO = True
+    try:
+        def tracking(frame):
+            pm.procesar_frame_numpy(frame, sesion_id="benchmark")
+
+        # El primer frame de la sesión detecta; los siguientes hacen tracking
+        tracking(secuencia[0])
+        seguimiento = banco.reportar("Tracking por sesión", banco.medir(tracking, secuencia))
+    finally:
+        pm.finalizar_sesion("benchmark")
+        pm.TRACKING_ACTIVO = activo_previo
+
+    banco.stdout.write(f"Aceleración: x{deteccion['media'] / seguimiento['media']:.1f}")
+
+
+def bench_binario(banco):
+    """Frame en JSON base64 vs bytes crudos: tamaño del payload y CPU de decodificación."""
+    import base64
+    import json
+
+    import cv2
+    from atencion.scripts import procesamiento_mediapipe as pm
+
+    jpegs = [
+        cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 92])[1].tobytes()
+        for frame in banco.cargar_frames()
+    ]
+    payloads_json = [
+        json.dumps({"frame": "data:image/jpeg;base64," + base64.b64encode(j).decode()}).encode()
+        for j in jpegs
+    ]
+
+    bytes_json = sum(map(len, payloads_json)) / len(payloads_json)
+    bytes_bin = sum(map(len, jpegs)) / len(jpegs)
+    banco.stdout.write(
+        f"Payload medio: JSON base64 = {bytes_json / 1024:.1f} KiB, "
+        f"binario = {bytes_bin / 1024:.1f} KiB (-{100 * (1 - bytes_bin / bytes_json):.0f}%)"
+    )
+
+    def via_json(payload):
+        pm.decodificar_imagen(json.loads(payload)["frame"])
+
+    base = banco.reportar("JSON + base64 + imdecode", banco.medir(via_json, payloads_json))
+    binario = banco.reportar("Binario + imdecode", banco.medir(pm.decodificar_imagen, jpegs))
+    banco.stdout.write(f"CPU de decodificación: x{base['media'] / binario['media']:.2f}")
+
+
+def bench_roi(banco):
+    """Pasada completa vs recorte del rostro con decodificación reducida: latencia y precisión."""
+    import cv2
+    from atencion.scripts import procesamiento_mediapipe as pm
+
+    jpegs = [
+        cv2.imencode(".jpg", frame)[1].tobytes()
+        for frame in banco.secuencia_video(banco.cargar_frames())
+    ]
+
+    completos = [pm.procesar_frame(j) for j in jpegs]
+    completa = banco.reportar("Frame completo", banco.medir(pm.procesar_frame, jpegs))
+
+    roi_previo = pm.ROI_ACTIVO
+    pm.ROI_ACTIVO = True
+    try:
+        recortes = [pm.procesar_frame(j, sesion_id="benchmark-roi") for j in jpegs]
+        roi = banco.reportar(
+            "Recorte ROI + reducción",
+            banco.medir(lambda j: pm.procesar_frame(j, sesion_id="benchmark-roi"), jpegs),
+        )
+        estado = pm.obtener_registro_sesiones().obtener("benchmark-roi")
+        banco.stdout.write(f"Factor de reducción usado: {estado.factor_reduccion()}")
+    finally:
+        pm.finalizar_sesion("benchmark-roi")
+        pm.ROI_ACTIVO = roi_previo
+
+    banco.stdout.write(f"Aceleración: x{completa['media'] / roi['media']:.1f}")
+
+    pares = [(a, b) for a, b in zip(completos, recortes) if a and b]
+    if not pares:
+        banco.stdout.write("Sin rostro en las muestras: no se puede comparar precisión.")
+        return
+
+    banco.stdout.write(f"Precisión vs frame completo ({len(pares)} frames con rostro):")
+    for clave in ("ear", "mar", "yaw", "pitch", "roll"):
+        diffs = np.array([a[clave] - b[clave] for a, b in pares])
+        unidad = ""
+        if clave in ("yaw", "pitch", "roll"):
+            diffs = diferencia_angular(diffs)
+            unidad = "°"
+        diffs = np.abs(diffs)
+        banco.stdout.write(
+            f"  {clave:<6} error medio={diffs.mean():.4f}{unidad}  máx={diffs.max():.4f}{unidad}"
+        )
+
+
+def bench_dedup(banco):
+    """Sesión con la cámara casi quieta: pasada completa siempre vs omisión de frames repetidos."""
+    import cv2
+    from atencion.scripts import procesamiento_mediapipe as pm
+
+    # Alumno quieto: mismo frame con ruido de sensor, y un movimiento cada 15 frames
+    rng = np.random.default_rng(0)
+    base = banco.cargar_frames()
+    movidos = banco.secuencia_video(base)
+    jpegs = []
+    for i in range(banco.opciones["frames"]):
+        frame = movidos[i // 15 % len(movidos)]
+        ruido = rng.normal(0, 2, frame.shape)
+        frame = np.clip(frame + ruido, 0, 255).astype(np.uint8)
+        jpegs.append(cv2.imencode(".jpg", frame)[1].tobytes())
+
+    completos = [pm.procesar_frame(j) for j in jpegs]
+    completa = banco.reportar("Pasada completa", banco.medir(pm.procesar_frame, jpegs))
+
+    dedup_previo = pm.DEDUP_ACTIVO
+    pm.DEDUP_ACTIVO = True
+    pm.metricas_dedup.reiniciar()
+    try:
+        reusados = [pm.procesar_frame(j, sesion_id="benchmark-dedup") for j in jpegs]
+        pm.finalizar_sesion("benchmark-dedup")
+        pm.metricas_dedup.reiniciar()
+        dedup = banco.reportar(
+            "Omisión de repetidos",
+            banco.medir(lambda j: pm.procesar_frame(j, sesion_id="benchmark-dedup"), jpegs),
+        )
+        resumen = pm.metricas_dedup.resumen()
+    finally:
+        pm.finalizar_sesion("benchmark-dedup")
+        pm.DEDUP_ACTIVO = dedup_previo
+
+    banco.stdout.write(f"Aceleración: x{completa['media'] / dedup['media']:.1f}")
+    banco.stdout.write(
+        f"Frames omitidos: {resumen['reutilizados']}/{resumen['frames']} "
+        f"({100 * resumen['ratio_omitidos']:.0f}%), detector={resumen['ms_detector_medio']:.2f} ms, "
+        f"tiempo ahorrado={resumen['segundos_ahorrados']:.2f} s"
+    )
+
+    pares = [(a, b) for a, b in zip(completos, reusados) if a and b]
+    if pares:
+        for clave in ("ear", "mar"):
+            diffs = np.abs([a[clave] - b[clave] for a, b in pares])
+            banco.stdout.write(f"  {clave:<6} error medio={diffs.mean():.4f}  máx={diffs.max():.4f}")
+
+
+def bench_head_pose(banco):
+    """solvePnP original vs matriz de cámara cacheada y arranque desde la pose anterior."""
+    import cv2
+    from atencion.scripts import procesamiento_mediapipe as pm
+
+    secuencia = banco.secuencia_video(banco.cargar_frames())
+    muestras = [(pm._extraer_puntos(f), f.shape) for f in secuencia]
+    muestras = [(p, forma) for p, forma in muestras if p is not None]
+    if not muestras:
+        banco.stdout.write("Sin rostro en las muestras: no se puede medir head pose.")
+        return
+
+    def original(muestra):
+        # Implementación anterior: arreglos reconstruidos en cada llamada
+        puntos, forma = muestra
+        h, w = forma[:2]
+        puntos_3d = np.array([
+            [0.0, 0.0, 0.0], [-30.0, -125.0, -30.0], [30.0, -125.0, -30.0],
+            [-70.0, -70.0, -50.0], [70.0, -70.0, -50.0], [0.0, -150.0, -10.0],
+        ], dtype=np.float64)
+        cam_matrix = np.array([[w, 0, w / 2], [0, w, h / 2], [0, 0, 1]])
+        dist = np.zeros((4, 1))
+        ok, rot_vec, _ = cv2.solvePnP(
+            puntos_3d, puntos[pm.HEAD_POSE_IDX], cam_matrix, dist, flags=cv2.SOLVEPNP_ITERATIVE
+        )
+        rot_mat, _ = cv2.Rodrigues(rot_vec)
+        return cv2.RQDecomp3x3(rot_mat)[0]
+
+    estado = pm.EstadoSesion("benchmark-pose")
+
+    def guiada(muestra):
+        return pm.calcular_head_pose(muestra[0], muestra[1], estado)
+
+    referencia = [original(m) for m in muestras]
+    base = banco.reportar("solvePnP original", banco.medir(original, muestras))
+    cacheada = banco.reportar(
+        "Cámara cacheada", banco.medir(lambda m: pm.calcular_head_pose(*m), muestras)
+    )
+    estado.pose = None
+    guiados = [guiada(m) for m in muestras]
+    con_guia = banco.reportar("Cacheada + useExtrinsicGuess", banco.medir(guiada, muestras))
+
+    banco.stdout.write(
+        f"Aceleración: cacheada x{base['media'] / cacheada['media']:.2f}, "
+        f"guiada x{base['media'] / con_guia['media']:.2f}"
+    )
+    banco.stdout.write(f"Concordancia con la implementación original ({len(muestras)} frames):")
+    diffs = np.abs(diferencia_angular(np.array(guiados) - np.array(referencia)))
+    for j, clave in enumerate(("pitch", "yaw", "roll")):
+        banco.stdout.write(
+            f"  {clave:<6} error p50={np.median(diffs[:, j]):.4f}°  "
+            f"medio={diffs[:, j].mean():.4f}°  máx={diffs[:, j].max():.4f}°"
+        )
+
+    # solvePnP desde cero puede saltar a otra solución entre frames casi
+    # iguales; se reporta la variación entre frames consecutivos de cada uno
+    banco.stdout.write("Variación media entre frames consecutivos (original / guiada):")
+    saltos_ref = np.abs(diferencia_angular(np.diff(np.array(referencia), axis=0)))
+    saltos_guia = np.abs(diferencia_angular(np.diff(np.array(guiados), axis=0)))
+    for j, clave in enumerate(("pitch", "yaw", "roll")):
+        banco.stdout.write(
+            f"  {clave:<6} {saltos_ref[:, j].mean():.4f}° / {saltos_guia[:, j].mean():.4f}°"
+        )
@@ -0,0 +1,219 @@
+"""
+Almacenamiento columnar compacto de los frames de una sesión.
+
+Un registro AtencionVisual por frame repite en cada fila el UUID, las
+cuatro claves foráneas, el JSON y dos timestamps. Con
+MONITOREO_ALMACENAMIENTO = "bloques" (o "ambos") los frames se agregan a
+un BloqueAtencion abierto por sesión: arreglos float32 / uint8 / int32
+empaquetados que se reescriben cada MONITOREO_BLOQUE_INTERVALO segundos
+y se cierran al llegar a MONITOREO_BLOQUE_MAX_FRAMES frames, al cerrar el
+WebSocket o al terminar el proceso.
+
+El lado de escritura usa solo `array` de la biblioteca estándar (sin
+NumPy en el camino de las vistas); cargar_sesion() devuelve directamente
+arreglos NumPy para análisis.
+
+Cada worker tiene su propio bloque abierto por sesión: con varios workers
+una sesión puede tener bloques solapados en el tiempo, por eso la lectura
+ordena por timestamp.
+"""
+import atexit
+import logging
+import sys
+import threading
+import time
+from array import array
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import BloqueAtencion
+
+
+logger = logging.getLogger(__name__)
+
+ALMACENAMIENTO = getattr(settings, "MONITOREO_ALMACENAMIENTO", "filas")
+MAX_FRAMES = getattr(settings, "MONITOREO_BLOQUE_MAX_FRAMES", 600)
+INTERVALO = getattr(settings, "MONITOREO_BLOQUE_INTERVALO", 10)  # segundos entre reescrituras
+INACTIVIDAD = getattr(settings, "MONITOREO_AGREGADO_INACTIVIDAD", 300)
+
+FILAS = "filas"
+BLOQUES = "bloques"
+AMBOS = "ambos"
+
+GUARDAR_FILAS = ALMACENAMIENTO in (FILAS, AMBOS)
+GUARDAR_BLOQUES = ALMACENAMIENTO in (BLOQUES, AMBOS)
+
+COLUMNAS = ("ear", "mar", "yaw", "pitch", "roll", "score")
+
+
+def _empaquetar(arreglo):
+    # En disco siempre little-endian
+    if sys.byteorder == "big":
+        arreglo = array(arreglo.typecode, arreglo)
+        arreglo.byteswap()
+    return arreglo.tobytes()
+
+
+class BloqueAbierto:
+    """Frames acumulados de un bloque que todavía admite más."""
+
+    def __init__(self, inicio, version):
+        self.inicio = inicio
+        self.version = version
+        self.pk = None
+        self.columnas = [array("f") for _ in COLUMNAS]
+        self.etiquetas = array("B")
+        self.tiempos = array("i")
+        self.sucio = False
+        self.guardado = time.monotonic()
+        self.actividad = time.monotonic()
+        self.escritura = threading.Lock()  # el INSERT inicial y las reescrituras, de a uno
+
+    def __len__(self):
+        return len(self.etiquetas)
+
+    def agregar(self, metricas, nivel, score, momento):
+        for columna, valor in zip(self.columnas, (*(metricas[c] for c in COLUMNAS[:-1]), score)):
+            columna.append(valor)
+        self.etiquetas.append(int(nivel))
+        self.tiempos.append(round((momento - self.inicio).total_seconds() * 1000))
+        self.sucio = True
+        self.actividad = time.monotonic()
+
+    def campos(self):
+        return {
+            "n_frames": len(self),
+            "metricas": b"".join(_empaquetar(columna) for columna in self.columnas),
+            "etiquetas": self.etiquetas.tobytes(),
+            "tiempos": _empaquetar(self.tiempos),
+        }
+
+
+class AlmacenBloques:
+    """Bloques abiertos de las sesiones activas en este proceso."""
+
+    def __init__(self, max_frames=MAX_FRAMES, intervalo=INTERVALO, inactividad=INACTIVIDAD):
+        self.max_frames = max_frames
+        self.intervalo = intervalo
+        self.inactividad = inactividad
+        self._abiertos = {}
+        self._barrido = time.monotonic()
+        self._lock = threading.Lock()
+
+    def registrar(self, sesion_id, metricas, nivel, score, momento, version=""):
+        """Agrega un frame al bloque abierto de la sesión."""
+        ahora = time.monotonic()
+        a_guardar = []
+        with self._lock:
+            bloque = self._abiertos.get(sesion_id)
+            if bloque is not None and (len(bloque) >= self.max_frames or bloque.version != version):
+                # Bloque lleno o cambio de modelo: se cierra y se abre otro
+                a_guardar.append(bloque)
+                bloque = None
+            if bloque is None:
+                bloque = self._abiertos[sesion_id] = BloqueAbierto(momento, version)
+            bloque.agregar(metricas, nivel, score, momento)
+            if ahora - bloque.guardado >= self.intervalo:
+                a_guardar.append(bloque)
+            barrer = ahora - self._barrido >= self.intervalo
+            if barrer:
+                self._barrido = ahora
+
+        for pendiente in a_guardar:
+            self._guardar(sesion_id, pendiente)
+        if barrer:
+            self._barrer(ahora)
+
+    def cerrar(self, sesion_id):
+        """Escribe el bloque abierto de la sesión y lo olvida."""
+        with self._lock:
+            bloque = self._abiertos.pop(sesion_id, None)
+        if bloque is not None:
+            self._guardar(sesion_id, bloque)
+
+    def guardar_todo(self):
+        for sesion_id in list(self._abiertos):
+            self.cerrar(sesion_id)
+
+    def _barrer(self, ahora):
+        with self._lock:
+            pendientes = [
+                (sesion_id, bloque) for sesion_id, bloque in self._abiertos.items()
+                if bloque.sucio and ahora - bloque.guardado >= self.intervalo
+            ]
+            for sesion_id, bloque in list(self._abiertos.items()):
+                if ahora - bloque.actividad >= self.inactividad:
+                    del self._abiertos[sesion_id]
+                    pendientes.append((sesion_id, bloque))
+        for sesion_id, bloque in pendientes:
+            self._guardar(sesion_id, bloque)
+
+    def _guardar(self, sesion_id, bloque):
+        with bloque.escritura:
+            with self._lock:
+                if not bloque.sucio:
+                    return
+                campos = bloque.campos()
+                bloque.sucio = False
+                bloque.guardado = time.monotonic()
+            try:
+                if bloque.pk is None:
+                    bloque.pk = BloqueAtencion.objects.create(
+                        sesion_id=sesion_id, inicio=bloque.inicio, modelo_version=bloque.version, **campos
+                    ).pk
+                else:
+                    BloqueAtencion.objects.filter(pk=bloque.pk).update(**campos)
+            except Exception:
+                # El bloque queda sucio y se reescribe en el próximo intento
+                logger.exception("No se pudo guardar el bloque de atención de la sesión %s.", sesion_id)
+                bloque.sucio = True
+
+
+almacen_bloques = AlmacenBloques()
+
+
+@atexit.register
+def _guardar_al_salir():
+    if almacen_bloques._abiertos:
+        almacen_bloques.guardar_todo()
+        close_old_connections()
+
+
+# ============================================================
+#  LECTURA
+# ============================================================
+
+def cargar_sesion(sesion_id):
+    """
+    Todos los frames guardados en bloques de una sesión, ordenados por
+    timestamp, como diccionario de arreglos NumPy:
+    ear, mar, yaw, pitch, roll, score (float32), etiqueta (uint8) y
+    timestamp (datetime64[ms], UTC).
+    """
+    import numpy as np
+
+    partes = {columna: [] for columna in (*COLUMNAS, "etiqueta", "timestamp")}
+    bloques = (
+        BloqueAtencion.objects.filter(sesion_id=sesion_id)
+        .order_by("inicio")
+        .values_list("inicio", "n_frames", "metricas", "etiquetas", "tiempos")
+    )
+    for inicio, n, metricas, etiquetas, tiempos in bloques:
+        matriz = np.frombuffer(metricas, dtype="<f4").reshape(len(COLUMNAS), n)
+        for columna, valores in zip(COLUMNAS, matriz):
+            partes[columna].append(valores)
+        partes["etiqueta"].append(np.frombuffer(etiquetas, dtype=np.uint8))
+        if inicio.tzinfo is not None:
+            inicio = inicio.astimezone(dt_timezone.utc).replace(tzinfo=None)
+        base = np.datetime64(inicio, "ms")
+        partes["timestamp"].append(base + np.frombuffer(tiempos, dtype="<i4").astype("timedelta64[ms]"))
+
+    if not partes["timestamp"]:
+        vacios = {columna: np.empty(0, dtype=np.float32) for columna in COLUMNAS}
+        return {**vacios, "etiqueta": np.empty(0, dtype=np.uint8), "timestamp": np.empty(0, dtype="datetime64[ms]")}
+
+    resultado = {columna: np.concatenate(valores) for columna, valores in partes.items()}
+    orden = np.argsort(resultado["timestamp"], kind="stable")
+    return {columna: valores[orden] for columna, valores in resultado.items()}
@@ -0,0 +1,108 @@
+"""
+Cola local de procesamiento asíncrono de frames.
+
+En modo asíncrono, monitoreo-atencion valida el frame, lo encola aquí y
+responde 202 con un número de secuencia; un pool de hilos de fondo hace
+decodificación + FaceMesh + head pose + Random Forest + insert. Así los
+workers web no quedan bloqueados por el trabajo de visión.
+
+Los resultados se guardan en memoria del proceso (acotados) para consultarlos
+con monitoreo-atencion/resultado/?secuencia=N. Con varios procesos web la
+consulta puede caer en otro proceso: en ese caso el resultado sigue
+disponible en los registros AtencionVisual de la sesión.
+"""
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .servicios import analizar_frame_en_hilo
+
+
+HILOS = getattr(settings, "MONITOREO_COLA_HILOS", os.cpu_count() or 1)
+MAX_PENDIENTES = getattr(settings, "MONITOREO_COLA_MAX_PENDIENTES", 256)
+MAX_RESULTADOS = getattr(settings, "MONITOREO_COLA_MAX_RESULTADOS", 10000)
+
+PENDIENTE = "pendiente"
+LISTO = "listo"
+
+
+class ColaLlena(Exception):
+    """No hay capacidad para encolar más frames (se debe reintentar)."""
+
+
+class ColaMonitoreo:
+    """Pool de hilos con límite de frames pendientes y resultados acotados."""
+
+    def __init__(self, hilos=HILOS, max_pendientes=MAX_PENDIENTES, max_resultados=MAX_RESULTADOS):
+        self.hilos = hilos
+        self.max_pendientes = max_pendientes
+        self.max_resultados = max_resultados
+        self._executor = None
+        self._pendientes = 0
+        self._resultados = OrderedDict()
+        self._secuencias = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _obtener_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.hilos, thread_name_prefix="monitoreo-cola"
+            )
+        return self._executor
+
+    @property
+    def pendientes(self):
+        return self._pendientes
+
+    def encolar(self, sesion, frame):
+        """Encola un frame de la sesión y devuelve su número de secuencia."""
+        # Los memoryview apuntan al buffer de la solicitud, que se libera al responder
+        if isinstance(frame, memoryview):
+            frame = frame.tobytes()
+
+        with self._lock:
+            if self._pendientes >= self.max_pendientes:
+                raise ColaLlena()
+            self._pendientes += 1
+            secuencia = next(self._secuencias)
+            self._guardar_locked((sesion.id, secuencia), (PENDIENTE, None))
+
+        try:
+            self._obtener_executor().submit(self._procesar, sesion, secuencia, frame)
+        except Exception:
+            with self._lock:
+                self._pendientes -= 1
+                self._resultados.pop((sesion.id, secuencia), None)
+            raise
+        return secuencia
+
+    def resultado(self, sesion_id, secuencia):
+        """
+        Devuelve (estado, resultado): (PENDIENTE, None), (LISTO, {...})
+        o (None, None) si la secuencia no se conoce en este proceso.
+        """
+        with self._lock:
+            return self._resultados.get((sesion_id, secuencia), (None, None))
+
+    def _procesar(self, sesion, secuencia, frame):
+        try:
+            resultado = analizar_frame_en_hilo(sesion, frame)
+        except Exception:
+            resultado = {"error": "Error procesando el frame."}
+
+        with self._lock:
+            self._pendientes -= 1
+            self._guardar_locked((sesion.id, secuencia), (LISTO, resultado))
+
+    def _guardar_locked(self, clave, valor):
+        self._resultados[clave] = valor
+        self._resultados.move_to_end(clave)
+        while len(self._resultados) > self.max_resultados:
+            self._resultados.popitem(last=False)
+
+
+cola_monitoreo = ColaMonitoreo()
@@ -0,0 +1,174 @@
+"""
+Escritura diferida (write-behind) de los registros AtencionVisual.
+
+Con MONITOREO_ESCRITURA = "directa" cada solicitud guarda sus registros
+con un bulk_create antes de responder. En SQLite cada escritura toma el
+lock global de la base: con muchos estudiantes enviando frames a la vez,
+las solicitudes se serializan en ese lock.
+
+Con "diferida" los registros se acumulan en memoria del proceso y un hilo
+de fondo los guarda con UN bulk_create (en una transacción) cada
+MONITOREO_ESCRITURA_INTERVALO_MS milisegundos o al juntar
+MONITOREO_ESCRITURA_MAX_FILAS filas: el lock se toma una vez por lote en
+lugar de una vez por frame.
+
+Durabilidad:
+- "directa": el registro está en la base cuando la solicitud responde.
+- "diferida": la respuesta sale antes de escribir. Se guarda todo lo
+  pendiente al cerrar el WebSocket de la sesión y al terminar el worker de
+  forma ordenada (SIGTERM / atexit); si el proceso muere de golpe
+  (kill -9, OOM) se pierden como mucho los frames del último intervalo.
+  Si la base no acepta escrituras, los registros se reintentan en el
+  siguiente lote; al superar MONITOREO_ESCRITURA_MAX_PENDIENTES el
+  llamador escribe en línea (contrapresión). Si aun así la escritura
+  falla, MONITOREO_ESCRITURA_MAX_PENDIENTES es un tope duro: se descartan
+  los registros más antiguos, se cuentan en `descartados` y se registra
+  el error (memoria acotada aunque la base siga caída).
+"""
+import atexit
+import functools
+import logging
+import os
+import threading
+import weakref
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import AtencionVisual
+
+
+logger = logging.getLogger(__name__)
+
+MODO = getattr(settings, "MONITOREO_ESCRITURA", "directa")
+MAX_FILAS = getattr(settings, "MONITOREO_ESCRITURA_MAX_FILAS", 500)
+INTERVALO = getattr(settings, "MONITOREO_ESCRITURA_INTERVALO_MS", 1000) / 1000.0
+MAX_PENDIENTES = getattr(settings, "MONITOREO_ESCRITURA_MAX_PENDIENTES", 20000)
+
+DIRECTA = "directa"
+DIFERIDA = "diferida"
+
+
+def _despues_de_fork(referencia):
+    buffer = referencia()
+    if buffer is not None:
+        buffer._despues_de_fork()
+
+
+class BufferEscritura:
+    """Acumula instancias AtencionVisual y las guarda por lotes."""
+
+    def __init__(self, modo=MODO, max_filas=MAX_FILAS, intervalo=INTERVALO, max_pendientes=MAX_PENDIENTES):
+        if modo not in (DIRECTA, DIFERIDA):
+            raise ValueError(f"MONITOREO_ESCRITURA debe ser '{DIRECTA}' o '{DIFERIDA}', no {modo!r}.")
+        self.modo = modo
+        self.max_filas = max(1, int(max_filas))
+        self.intervalo = intervalo
+        self.max_pendientes = max(self.max_filas, int(max_pendientes))
+        self.descartados = 0
+        self._pendientes = []
+        self._hilo = None
+        self._condicion = threading.Condition()
+        self._escritura = threading.Lock()  # un solo lote escribiéndose a la vez
+
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=functools.partial(_despues_de_fork, weakref.ref(self)))
+
+    @property
+    def pendientes(self):
+        return len(self._pendientes)
+
+    def _despues_de_fork(self):
+        # En el hijo solo existe el hilo que hizo el fork: locks nuevos (los
+        # del padre pueden haber quedado tomados) antes de que otro hilo los
+        # vea. Lo pendiente heredado del padre lo guarda el padre.
+        self._pendientes = []
+        self._hilo = None
+        self._condicion = threading.Condition()
+        self._escritura = threading.Lock()
+
+    def _iniciar(self):
+        if self._hilo is not None:
+            return
+        with self._condicion:
+            if self._hilo is None:
+                self._hilo = threading.Thread(
+                    target=self._bucle, name="escritura-atencion", daemon=True
+                )
+                self._hilo.start()
+
+    def agregar(self, registros):
+        """Guarda (directa) o encola (diferida) una lista de AtencionVisual."""
+        if not registros:
+            return
+        if self.modo == DIRECTA:
+            AtencionVisual.objects.bulk_create(registros)
+            return
+
+        self._iniciar()
+        with self._condicion:
+            self._pendientes.extend(registros)
+            pendientes = len(self._pendientes)
+            if pendientes >= self.max_filas:
+                self._condicion.notify()
+
+        if pendientes >= self.max_pendientes:
+            # La base no da abasto: el llamador espera a que se escriba
+            self.guardar()
+
+    def guardar(self):
+        """Escribe ya todo lo pendiente (cierre de sesión, apagado)."""
+        while self._escribir_lote(todo=True):
+            pass
+
+    def _bucle(self):
+        while True:
+            with self._condicion:
+                if len(self._pendientes) < self.max_filas:
+                    self._condicion.wait(self.intervalo)
+            close_old_connections()
+            try:
+                while self._escribir_lote() and len(self._pendientes) >= self.max_filas:
+                    pass
+            finally:
+                close_old_connections()
+
+    def _escribir_lote(self, todo=False):
+        """Escribe hasta max_filas registros (o todos). Devuelve False si no había o falló."""
+        with self._escritura:
+            with self._condicion:
+                limite = len(self._pendientes) if todo else self.max_filas
+                lote = self._pendientes[:limite]
+                del self._pendientes[:limite]
+            if not lote:
+                return False
+
+            try:
+                with transaction.atomic():
+                    AtencionVisual.objects.bulk_create(lote, batch_size=self.max_filas)
+            except Exception:
+                logger.exception("No se pudieron guardar %d registros de atención; se reintentará.", len(lote))
+                with self._condicion:
+                    self._pendientes[:0] = lote
+                    sobrantes = len(self._pendientes) - self.max_pendientes
+                    if sobrantes > 0:
+                        del self._pendientes[:sobrantes]
+                        self.descartados += sobrantes
+                if sobrantes > 0:
+                    logger.error(
+                        "Tope de %d registros pendientes: se descartaron %d (%d en total).",
+                        self.max_pendientes, sobrantes, self.descartados,
+                    )
+                return False
+            return True
+
+
+buffer_escritura = BufferEscritura()
+
+
+@atexit.register
+def _guardar_al_salir():
+    # Apagado ordenado del worker: escribir lo que quedó en memoria
+    if buffer_escritura.pendientes:
+        buffer_escritura.guardar()
+        close_old_connections()
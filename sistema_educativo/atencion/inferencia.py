@@ -0,0 +1,129 @@
+"""
+Micro-lotes de inferencia para el clasificador de atención.
+
+Con varias solicitudes concurrentes, cada una llamaría al Random Forest con
+una matriz de 1 fila; el costo fijo por llamada (validación de scikit-learn,
+recorrido de los 350 árboles) domina sobre el cálculo en sí. Un hilo de
+fondo junta las predicciones que llegan dentro de una ventana corta
+(MONITOREO_MICROLOTES_VENTANA_MS) o hasta MONITOREO_MICROLOTES_MAX_FILAS
+filas, hace UNA llamada al modelo con la matriz apilada y reparte los
+resultados a cada llamador.
+
+Con un solo llamador la ventana es latencia añadida: por eso está
+desactivado por defecto (MONITOREO_MICROLOTES).
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from django.conf import settings
+
+from atencion.scripts.modelo_atencion_rf import obtener_modelo
+
+
+ACTIVO = getattr(settings, "MONITOREO_MICROLOTES", False)
+VENTANA = getattr(settings, "MONITOREO_MICROLOTES_VENTANA_MS", 2) / 1000.0
+MAX_FILAS = getattr(settings, "MONITOREO_MICROLOTES_MAX_FILAS", 128)
+
+
+class MicroLotes:
+    """
+    Agrupa llamadas concurrentes a `funcion(matriz)` en un hilo de fondo.
+    `funcion` devuelve una tupla de arreglos con una entrada por fila
+    (como predecir_atencion_lote); cada llamador recibe sus filas. Los
+    elementos que no son arreglos (p. ej. la versión del modelo) se
+    entregan tal cual a todos los llamadores del micro-lote.
+    """
+
+    def __init__(self, funcion, ventana=VENTANA, max_filas=MAX_FILAS):
+        self.funcion = funcion
+        self.ventana = ventana
+        self.max_filas = max(1, int(max_filas))
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _iniciar(self):
+        # El hilo no sobrevive a un fork: se crea de nuevo en cada proceso
+        if self._hilo is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._hilo is None or self._pid != os.getpid():
+                self._cola = queue.Queue()
+                self._pid = os.getpid()
+                self._hilo = threading.Thread(
+                    target=self._bucle, name="microlotes-rf", daemon=True
+                )
+                self._hilo.start()
+
+    def predecir(self, matriz):
+        """Encola la matriz (n, 5) y espera su parte del resultado."""
+        matriz = np.asarray(matriz, dtype=float)
+        if len(matriz) == 0:
+            return self.funcion(matriz)
+
+        self._iniciar()
+        futuro = Future()
+        self._cola.put((matriz, futuro))
+        return futuro.result()
+
+    def _bucle(self):
+        while True:
+            pendientes = [self._cola.get()]
+            filas = len(pendientes[0][0])
+
+            limite = time.monotonic() + self.ventana
+            while filas < self.max_filas:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                pendientes.append(item)
+                filas += len(item[0])
+
+            self._ejecutar(pendientes)
+
+    def _ejecutar(self, pendientes):
+        try:
+            resultados = self.funcion(np.vstack([matriz for matriz, _ in pendientes]))
+        except Exception as exc:
+            for _, futuro in pendientes:
+                futuro.set_exception(exc)
+            return
+
+        inicio = 0
+        for matriz, futuro in pendientes:
+            fin = inicio + len(matriz)
+            futuro.set_result(tuple(
+                r[inicio:fin] if isinstance(r, np.ndarray) else r for r in resultados
+            ))
+            inicio = fin
+
+
+def _clasificar_con_version(matriz):
+    # El modelo se toma una sola vez: las filas y la versión reportada
+    # corresponden siempre al mismo modelo aunque haya un cambio en caliente
+    modelo = obtener_modelo()
+    niveles, prob_atencion = modelo.predecir_lote(matriz)
+    return niveles, prob_atencion, modelo.version
+
+
+micro_lotes = MicroLotes(_clasificar_con_version)
+
+
+def clasificar(matriz):
+    """
+    Clasifica una matriz (n, 5) de métricas: por micro-lotes si
+    MONITOREO_MICROLOTES está activo, o directamente con el modelo.
+    Devuelve (niveles, prob_atencion, version_del_modelo).
+    """
+    if ACTIVO:
+        return micro_lotes.predecir(matriz)
+    return _clasificar_con_version(matriz)
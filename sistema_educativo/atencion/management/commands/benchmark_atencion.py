@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from atencion.benchmarks import ESCENARIOS, Banco
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la latencia del pipeline de atención. "
+        "Uso: python manage.py benchmark_atencion <escenario> [--imagen ruta]"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("escenario", choices=list(ESCENARIOS))
+        parser.add_argument(
+            "--imagen",
+            action="append",
+            default=[],
+            help="Imagen(es) de muestra (por defecto un rostro sintético 640x480).",
+        )
+        parser.add_argument("--frames", type=int, default=30)
+        parser.add_argument("--procesos", type=int, default=4, help="Workers simulados (memoria_workers).")
+
+    def handle(self, *args, **opciones):
+        ESCENARIOS[opciones["escenario"]](Banco(opciones, self.stdout))
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from atencion.agregados import finalizar_sesiones
+from atencion.models import AtencionVisual, SesionMonitoreo
+
+
+class Command(BaseCommand):
+    help = (
+        "Finaliza por lotes las sesiones cuyo `fin` ya pasó (score_atencion, patrones, "
+        "duracion y finalizada). Con --historico también calcula los agregados de las "
+        "sesiones con frames y score_atencion vacío. Pensado para correr periódicamente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=200, help="Sesiones por consulta agregada.")
+        parser.add_argument(
+            "--gracia",
+            type=int,
+            default=60,
+            help="Segundos después de `fin` antes de finalizar (frames que llegan tarde).",
+        )
+        parser.add_argument(
+            "--historico",
+            action="store_true",
+            help="Completa además las sesiones con frames y score_atencion vacío.",
+        )
+
+    def _por_lotes(self, queryset, lote, marcar):
+        # Se avanza por id: una sesión sin frames válidos no se vuelve a tomar
+        total, ultimo = 0, None
+        while True:
+            pagina = queryset if ultimo is None else queryset.filter(pk__gt=ultimo)
+            ids = list(pagina.order_by("pk").values_list("pk", flat=True)[:lote])
+            if not ids:
+                return total
+            total += finalizar_sesiones(ids, marcar=marcar)
+            ultimo = ids[-1]
+
+    def handle(self, *args, **opciones):
+        lote = opciones["lote"]
+        corte = timezone.now() - timedelta(seconds=opciones["gracia"])
+
+        vencidas = self._por_lotes(
+            SesionMonitoreo.objects.filter(finalizada__isnull=True, fin__lt=corte),
+            lote,
+            marcar=True,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Sesiones vencidas finalizadas: {vencidas}."))
+
+        if opciones["historico"]:
+            # Sin `fin` pueden seguir activas: se calculan los agregados sin cerrarlas
+            historicas = self._por_lotes(
+                SesionMonitoreo.objects.filter(score_atencion__isnull=True)
+                .filter(Q(fin__isnull=True) | Q(fin__gte=corte))
+                .filter(Exists(AtencionVisual.objects.filter(sesion=OuterRef("pk")))),
+                lote,
+                marcar=False,
+            )
+            self.stdout.write(self.style.SUCCESS(f"Sesiones históricas completadas: {historicas}."))
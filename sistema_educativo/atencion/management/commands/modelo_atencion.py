@@ -0,0 +1,74 @@
+import pickle
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from atencion.scripts.bosque_plano import exportar_bosque
+from atencion.scripts.registro_modelos import RegistroModelos, hash_archivo
+
+
+class Command(BaseCommand):
+    help = (
+        "Administra las versiones del modelo de atención. "
+        "Uso: python manage.py modelo_atencion listar | activar <version> | importar <ruta.pkl>"
+    )
+
+    def add_arguments(self, parser):
+        sub = parser.add_subparsers(dest="accion", required=True)
+
+        sub.add_parser("listar", help="Versiones publicadas (* = activa).")
+
+        activar = sub.add_parser("activar", help="Activa una versión (los workers la recargan).")
+        activar.add_argument("version")
+
+        importar = sub.add_parser(
+            "importar", help="Publica un modelo .pkl existente (modelo + scaler + features)."
+        )
+        importar.add_argument("ruta")
+        importar.add_argument("--activar", action="store_true")
+
+    def handle(self, *args, **opciones):
+        self.registro = RegistroModelos()
+        getattr(self, f"accion_{opciones['accion']}")(opciones)
+
+    def accion_listar(self, opciones):
+        activa = self.registro.version_activa()
+        versiones = self.registro.versiones()
+        if not versiones:
+            self.stdout.write(f"Registro vacío ({self.registro.directorio}). Activa: {activa or '-'}")
+            return
+
+        for version in versiones:
+            metadata = self.registro.metadata(version)
+            accuracy = metadata.get("metricas", {}).get("accuracy")
+            marca = "*" if version == activa else " "
+            self.stdout.write(
+                f"{marca} {version}  fecha={metadata.get('fecha', '-')}  "
+                f"accuracy={accuracy if accuracy is not None else '-'}"
+            )
+
+    def accion_activar(self, opciones):
+        try:
+            self.registro.activar(opciones["version"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Versión activa: {opciones['version']}"))
+
+    def accion_importar(self, opciones):
+        ruta = opciones["ruta"]
+        try:
+            with open(ruta, "rb") as f:
+                paquete = pickle.load(f)
+        except FileNotFoundError:
+            raise CommandError(f"No existe el archivo: {ruta}")
+
+        arreglos = exportar_bosque(paquete["modelo"], paquete["scaler"], paquete["features"])
+        metadata = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "features": list(paquete["features"]),
+            "metricas": {},
+            "origen": ruta,
+            "hash_pickle": hash_archivo(ruta),
+        }
+        version = self.registro.publicar(arreglos, metadata, paquete, activar=opciones["activar"])
+        self.stdout.write(self.style.SUCCESS(f"Modelo importado como versión {version}"))
@@ -0,0 +1,50 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from atencion.models import SesionMonitoreo
+from atencion.retencion import LOTE, PAUSA, RETENCION_DIAS, borrar_con_telemetria, purgar_frames_antiguos
+from cursos.models import Curso, Fase, Nivel, Recurso
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplica la retención de frames crudos de atención (resúmenes y agregados se conservan), "
+        "o elimina un curso/nivel/fase/recurso/sesión borrando su telemetría por lotes. "
+        "Uso: python manage.py purgar_atencion [--dias N] | --curso <id> | --recurso <id> | ..."
+    )
+
+    OBJETOS = {
+        "curso": Curso,
+        "nivel": Nivel,
+        "fase": Fase,
+        "recurso": Recurso,
+        "sesion": SesionMonitoreo,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=RETENCION_DIAS, help="Días de frames crudos a conservar.")
+        parser.add_argument("--lote", type=int, default=LOTE, help="Filas por DELETE.")
+        parser.add_argument("--pausa-ms", type=int, default=int(PAUSA * 1000), help="Pausa entre lotes.")
+        objetos = parser.add_mutually_exclusive_group()
+        for nombre in self.OBJETOS:
+            objetos.add_argument(f"--{nombre}", metavar="ID", help=f"Elimina el {nombre} con toda su telemetría.")
+
+    def handle(self, *args, **opciones):
+        lote, pausa = opciones["lote"], opciones["pausa_ms"] / 1000.0
+
+        for nombre, modelo in self.OBJETOS.items():
+            if opciones[nombre]:
+                try:
+                    instancia = modelo.objects.get(pk=opciones[nombre])
+                except (modelo.DoesNotExist, ValidationError, ValueError):
+                    raise CommandError(f"No existe el {nombre} {opciones[nombre]}")
+                total = borrar_con_telemetria(instancia, lote, pausa)
+                self.stdout.write(self.style.SUCCESS(
+                    f"{nombre.capitalize()} {instancia.pk} eliminado ({total} registros de atención)."
+                ))
+                return
+
+        registros, bloques = purgar_frames_antiguos(opciones["dias"], lote, pausa)
+        self.stdout.write(self.style.SUCCESS(
+            f"Frames de más de {opciones['dias']} días eliminados: {registros} registros, {bloques} bloques."
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from atencion.resumenes import actualizar_resumenes, reconstruir_resumenes
+
+
+class Command(BaseCommand):
+    help = (
+        "Actualiza los resúmenes de atención (por minuto de sesión y por estudiante/recurso) "
+        "con los registros AtencionVisual nuevos. Pensado para correr periódicamente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reconstruir",
+            action="store_true",
+            help=(
+                "Borra los resúmenes y los recalcula desde todos los registros "
+                "(no disponible si purgar_atencion ya borró frames)."
+            ),
+        )
+
+    def handle(self, *args, **opciones):
+        if opciones["reconstruir"]:
+            try:
+                reconstruir_resumenes()
+            except ValueError as error:
+                raise CommandError(str(error))
+
+        minutos, estudiantes = actualizar_resumenes()
+        self.stdout.write(self.style.SUCCESS(
+            f"Resúmenes actualizados: {minutos} minutos de sesión, {estudiantes} estudiante/recurso."
+        ))
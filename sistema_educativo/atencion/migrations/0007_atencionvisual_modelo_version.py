@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atencion', '0006_atencionvisual_ear_atencionvisual_mar_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='atencionvisual',
+            name='modelo_version',
+            field=models.CharField(blank=True, default='', help_text='Versión del modelo de atención que calculó este registro', max_length=64),
+        ),
+    ]
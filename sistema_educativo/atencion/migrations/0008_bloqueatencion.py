@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atencion', '0007_atencionvisual_modelo_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BloqueAtencion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField(help_text='Momento del primer frame del bloque')),
+                ('n_frames', models.PositiveIntegerField(default=0)),
+                ('metricas', models.BinaryField()),
+                ('etiquetas', models.BinaryField()),
+                ('tiempos', models.BinaryField()),
+                ('modelo_version', models.CharField(blank=True, default='', max_length=64)),
+                ('sesion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bloques_atencion', to='atencion.sesionmonitoreo')),
+            ],
+            options={
+                'verbose_name': 'Bloque de Atención',
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atencion', '0008_bloqueatencion'),
+        ('cursos', '0006_curso_requiere_frames'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgresoResumen',
+            fields=[
+                ('nombre', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('hasta', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenEstudianteRecurso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('n_frames', models.PositiveIntegerField(default=0)),
+                ('n_atentos', models.PositiveIntegerField(default=0)),
+                ('suma_score', models.FloatField(default=0.0)),
+                ('suma_ear', models.FloatField(default=0.0)),
+                ('suma2_ear', models.FloatField(default=0.0)),
+                ('suma_mar', models.FloatField(default=0.0)),
+                ('suma2_mar', models.FloatField(default=0.0)),
+                ('suma_yaw', models.FloatField(default=0.0)),
+                ('suma2_yaw', models.FloatField(default=0.0)),
+                ('suma_pitch', models.FloatField(default=0.0)),
+                ('suma2_pitch', models.FloatField(default=0.0)),
+                ('suma_roll', models.FloatField(default=0.0)),
+                ('suma2_roll', models.FloatField(default=0.0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('estudiante', models.ForeignKey(limit_choices_to={'rol': 'estudiante'}, on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_atencion', to=settings.AUTH_USER_MODEL)),
+                ('recurso', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cursos.recurso')),
+            ],
+            options={
+                'verbose_name': 'Resumen por Estudiante y Recurso',
+                'constraints': [models.UniqueConstraint(fields=('estudiante', 'recurso'), name='resumen_estudiante_recurso_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenMinuto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('n_frames', models.PositiveIntegerField(default=0)),
+                ('n_atentos', models.PositiveIntegerField(default=0)),
+                ('suma_score', models.FloatField(default=0.0)),
+                ('suma_ear', models.FloatField(default=0.0)),
+                ('suma2_ear', models.FloatField(default=0.0)),
+                ('suma_mar', models.FloatField(default=0.0)),
+                ('suma2_mar', models.FloatField(default=0.0)),
+                ('suma_yaw', models.FloatField(default=0.0)),
+                ('suma2_yaw', models.FloatField(default=0.0)),
+                ('suma_pitch', models.FloatField(default=0.0)),
+                ('suma2_pitch', models.FloatField(default=0.0)),
+                ('suma_roll', models.FloatField(default=0.0)),
+                ('suma2_roll', models.FloatField(default=0.0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('minuto', models.DateTimeField()),
+                ('sesion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_minuto', to='atencion.sesionmonitoreo')),
+            ],
+            options={
+                'verbose_name': 'Resumen por Minuto',
+                'constraints': [models.UniqueConstraint(fields=('sesion', 'minuto'), name='resumen_minuto_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atencion', '0009_resumenes_atencion'),
+        ('cursos', '0006_curso_requiere_frames'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='atencionvisual',
+            index=models.Index(fields=['fecha'], name='atencionvisual_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atencion', '0010_atencionvisual_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sesionmonitoreo',
+            name='finalizada',
+            field=models.DateTimeField(blank=True, help_text='Momento en que se cerró la sesión y se calcularon sus agregados finales', null=True),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:09
+
+from django.db import migrations
+from django.db.models import Avg, Count
+
+
+# Copia fija de resumenes.CAMPOS_SUMA (la migración no importa código de la app)
+CAMPOS_SUMA = (
+    "n_frames", "n_atentos", "suma_score",
+    "suma_ear", "suma2_ear", "suma_mar", "suma2_mar", "suma_yaw", "suma2_yaw",
+    "suma_pitch", "suma2_pitch", "suma_roll", "suma2_roll",
+)
+
+
+def fusionar_sesiones_duplicadas(apps, schema_editor):
+    """
+    Antes de la restricción única: por cada (estudiante, recurso, fase)
+    repetido se conserva la sesión más antigua y se le pasan los frames,
+    bloques y resúmenes por minuto de las demás. El score se recalcula
+    desde los frames y `finalizada` queda vacía para que
+    `manage.py finalizar_sesiones` recalcule los patrones.
+    """
+    SesionMonitoreo = apps.get_model("atencion", "SesionMonitoreo")
+    AtencionVisual = apps.get_model("atencion", "AtencionVisual")
+    BloqueAtencion = apps.get_model("atencion", "BloqueAtencion")
+    ResumenMinuto = apps.get_model("atencion", "ResumenMinuto")
+
+    claves = ("estudiante_id", "recurso_id", "fase_id")
+    repetidas = (
+        SesionMonitoreo.objects.values(*claves)
+        .annotate(n=Count("id"))
+        .filter(n__gt=1)
+        .order_by()
+    )
+    for grupo in list(repetidas):
+        sesiones = list(
+            SesionMonitoreo.objects.filter(**{clave: grupo[clave] for clave in claves}).order_by("inicio", "pk")
+        )
+        conservada, sobrantes = sesiones[0], [sesion.pk for sesion in sesiones[1:]]
+
+        AtencionVisual.objects.filter(sesion_id__in=sobrantes).update(sesion_id=conservada.pk)
+        BloqueAtencion.objects.filter(sesion_id__in=sobrantes).update(sesion_id=conservada.pk)
+        for resumen in ResumenMinuto.objects.filter(sesion_id__in=sobrantes):
+            destino, _ = ResumenMinuto.objects.get_or_create(sesion_id=conservada.pk, minuto=resumen.minuto)
+            for campo in CAMPOS_SUMA:
+                setattr(destino, campo, getattr(destino, campo) + getattr(resumen, campo))
+            destino.save()
+
+        fines = [sesion.fin for sesion in sesiones if sesion.fin]
+        conservada.fin = max(fines) if fines else None
+        conservada.duracion = conservada.fin - conservada.inicio if conservada.fin else None
+        score = AtencionVisual.objects.filter(
+            sesion_id=conservada.pk, score_atencion__isnull=False
+        ).aggregate(media=Avg("score_atencion"))["media"]
+        if score is None:
+            scores = [sesion.score_atencion for sesion in sesiones if sesion.score_atencion is not None]
+            score = sum(scores) / len(scores) if scores else None
+        conservada.score_atencion = score
+        conservada.patrones = next((sesion.patrones for sesion in sesiones if sesion.patrones), None)
+        conservada.finalizada = None
+        conservada.save()
+
+        SesionMonitoreo.objects.filter(pk__in=sobrantes).delete()
+
+
+class Migration(migrations.Migration):
+    # Solo datos: el esquema (índices y restricción única) va en 0013, en
+    # su propia transacción (en PostgreSQL, mezclar ambos en una migración
+    # puede fallar con "pending trigger events")
+
+    dependencies = [
+        ('atencion', '0011_sesionmonitoreo_finalizada'),
+    ]
+
+    operations = [
+        migrations.RunPython(fusionar_sesiones_duplicadas, migrations.RunPython.noop),
+    ]
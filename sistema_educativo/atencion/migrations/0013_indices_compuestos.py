@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atencion', '0012_fusionar_sesiones_duplicadas'),
+        ('cursos', '0006_curso_requiere_frames'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='atencionvisual',
+            index=models.Index(fields=['sesion', 'timestamp'], name='atencionvisual_sesion_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atencionvisual',
+            index=models.Index(fields=['estudiante', 'recurso'], name='atencionvisual_est_rec_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='sesionmonitoreo',
+            constraint=models.UniqueConstraint(fields=('estudiante', 'recurso', 'fase'), name='sesion_estudiante_recurso_fase_unica'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('atencion', '0013_indices_compuestos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloqueatencion',
+            name='n_resumidos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -33,6 +33,11 @@ class SesionMonitoreo(models.Model):
         blank=True,
         help_text="Datos JSON con patrones de atención (e.g., {'desviacion_gaze': 0.4, 'cierre_ojos': 0.3, ...})"
     )
+    finalizada = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Momento en que se cerró la sesión y se calcularon sus agregados finales",
+    )
 
     def __str__(self):
         return f"Sesión de {self.estudiante.username} - {self.recurso.nombre} (Fase: {self.fase.nombre})"
@@ -48,6 +53,16 @@ class SesionMonitoreo(models.Model):
             self.duracion = self.fin - self.inicio
         super().save(*args, **kwargs)
 
+    class Meta:
+        constraints = [
+            # Una sesión por estudiante, recurso y fase (crear_multiples y
+            # crear_sesion_para_mi usan get_or_create sobre estas columnas).
+            # Su índice también sirve a nota-combinada (estudiante, recurso).
+            models.UniqueConstraint(
+                fields=["estudiante", "recurso", "fase"], name="sesion_estudiante_recurso_fase_unica"
+            ),
+        ]
+
 
 class AtencionVisual(models.Model):
     """
@@ -99,6 +114,12 @@ class AtencionVisual(models.Model):
         blank=True,
         help_text="Nivel de atención calculado (Alta/Media/Baja, etc.)",
     )
+    modelo_version = models.CharField(
+        max_length=64,
+        blank=True,
+        default="",
+        help_text="Versión del modelo de atención que calculó este registro",
+    )
 
     # Momento exacto del frame analizado
     timestamp = models.DateTimeField(
@@ -120,6 +141,112 @@ class AtencionVisual(models.Model):
 
     class Meta:
         verbose_name = "Atención Visual"
+        indexes = [
+            # Retención: purgar_atencion borra por rangos de fecha
+            models.Index(fields=["fecha"], name="atencionvisual_fecha_idx"),
+            # Frames de una sesión en orden (monitoreo, serie por minuto, finalizar)
+            models.Index(fields=["sesion", "timestamp"], name="atencionvisual_sesion_ts_idx"),
+            # Atención de un estudiante en un recurso (reportes con fuente=crudo)
+            models.Index(fields=["estudiante", "recurso"], name="atencionvisual_est_rec_idx"),
+        ]
+
+
+class BloqueAtencion(models.Model):
+    """
+    Frames de una sesión en formato columnar compacto (ver bloques.py).
+    Cada bloque guarda hasta MONITOREO_BLOQUE_MAX_FRAMES frames como
+    arreglos empaquetados little-endian, en lugar de una fila por frame:
+    - metricas: float32, 6 columnas seguidas (ear, mar, yaw, pitch, roll, score)
+    - etiquetas: uint8, nivel de atención por frame
+    - tiempos: int32, milisegundos desde `inicio`
+    Los frames solo se agregan al final: `n_resumidos` es cuántos ya se
+    incorporaron a los resúmenes (resumenes.py).
+    """
+    sesion = models.ForeignKey(
+        SesionMonitoreo,
+        on_delete=models.CASCADE,
+        related_name="bloques_atencion",
+    )
+    inicio = models.DateTimeField(help_text="Momento del primer frame del bloque")
+    n_frames = models.PositiveIntegerField(default=0)
+    metricas = models.BinaryField()
+    etiquetas = models.BinaryField()
+    tiempos = models.BinaryField()
+    modelo_version = models.CharField(max_length=64, blank=True, default="")
+    n_resumidos = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Bloque de {self.n_frames} frames - Sesión {self.sesion_id}"
+
+    class Meta:
+        verbose_name = "Bloque de Atención"
+
+
+class ResumenAtencionBase(models.Model):
+    """
+    Sumas de un grupo de frames (ver resumenes.py). Se guardan sumas y no
+    promedios para poder agregar frames nuevos sin releer los anteriores:
+    media = suma / n_frames, varianza = suma2 / n_frames - media².
+    """
+    n_frames = models.PositiveIntegerField(default=0)
+    n_atentos = models.PositiveIntegerField(default=0)
+    suma_score = models.FloatField(default=0.0)
+    suma_ear = models.FloatField(default=0.0)
+    suma2_ear = models.FloatField(default=0.0)
+    suma_mar = models.FloatField(default=0.0)
+    suma2_mar = models.FloatField(default=0.0)
+    suma_yaw = models.FloatField(default=0.0)
+    suma2_yaw = models.FloatField(default=0.0)
+    suma_pitch = models.FloatField(default=0.0)
+    suma2_pitch = models.FloatField(default=0.0)
+    suma_roll = models.FloatField(default=0.0)
+    suma2_roll = models.FloatField(default=0.0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class ResumenMinuto(ResumenAtencionBase):
+    """Frames de una sesión agrupados por minuto (según su timestamp)."""
+    sesion = models.ForeignKey(
+        SesionMonitoreo,
+        on_delete=models.CASCADE,
+        related_name="resumenes_minuto",
+    )
+    minuto = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Resumen por Minuto"
+        constraints = [
+            models.UniqueConstraint(fields=["sesion", "minuto"], name="resumen_minuto_unico"),
+        ]
+
+
+class ResumenEstudianteRecurso(ResumenAtencionBase):
+    """Todos los frames de un estudiante en un recurso (todas sus sesiones)."""
+    estudiante = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        limit_choices_to={'rol': 'estudiante'},
+        related_name="resumenes_atencion",
+    )
+    recurso = models.ForeignKey(Recurso, on_delete=models.CASCADE)
+
+    class Meta:
+        verbose_name = "Resumen por Estudiante y Recurso"
+        constraints = [
+            models.UniqueConstraint(fields=["estudiante", "recurso"], name="resumen_estudiante_recurso_unico"),
+        ]
+
+
+class ProgresoResumen(models.Model):
+    """Hasta qué `AtencionVisual.fecha` ya se incorporó a los resúmenes."""
+    nombre = models.CharField(max_length=50, primary_key=True)
+    hasta = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.nombre}: {self.hasta}"
 
 
 class NotaAcademica(models.Model):
@@ -0,0 +1,76 @@
+"""
+Fachada perezosa del motor de atención (visión + clasificación).
+
+cv2, MediaPipe, NumPy y el modelo se importan en la primera llamada de
+monitoreo, no al importar las vistas: así `migrate`, `shell`, el admin y
+el resto de la API arrancan sin cargar el stack de visión. Después de la
+primera llamada el import local es solo una búsqueda en sys.modules.
+"""
+import sys
+import time
+
+
+def procesar_frame(imagen, sesion_id=None, fin=None):
+    """Métricas {"ear", "mar", "yaw", "pitch", "roll"} de un frame, o None."""
+    from atencion.scripts.procesamiento_mediapipe import procesar_frame as _procesar_frame
+
+    return _procesar_frame(imagen, sesion_id=sesion_id, fin=fin)
+
+
+def liberar_sesion(sesion_id):
+    """
+    Libera el estado de visión de la sesión en este proceso (FaceMesh en
+    modo video, ROI, dedup y pose guiada). Si este proceso todavía no cargó
+    el stack de visión no hay nada que liberar y no se importa.
+    """
+    modulo = sys.modules.get("atencion.scripts.procesamiento_mediapipe")
+    if modulo is not None:
+        modulo.finalizar_sesion(sesion_id)
+
+
+def clasificar(filas):
+    """
+    Clasifica filas [ear, mar, yaw, pitch, roll].
+    Devuelve (niveles, scores 0-100, versión del modelo) con listas de Python.
+    """
+    import numpy as np
+
+    from .inferencia import clasificar as _clasificar
+
+    niveles, prob_atencion, version = _clasificar(np.asarray(filas, dtype=float))
+    return niveles.tolist(), (prob_atencion * 100.0).tolist(), version
+
+
+def calentar():
+    """
+    Pasa un rostro sintético por todo el pipeline para que la primera
+    solicitud real no pague la construcción del grafo de MediaPipe, la
+    carga de los modelos TFLite, la inicialización diferida de OpenCV ni
+    la carga del clasificador:
+      - cada instancia del pool de FaceMesh procesa el rostro (no solo la
+        primera), así se cargan también los modelos de landmarks;
+      - procesar_frame decodifica el JPEG y recorre landmarks, EAR/MAR y
+        solvePnP;
+      - el clasificador recibe las métricas obtenidas.
+    Devuelve la duración en segundos. RuntimeError si no se detectó el
+    rostro (el calentamiento quedaría a medias).
+
+    Se llama desde AtencionConfig.ready() en el proceso que atiende
+    solicitudes si MONITOREO_CALENTAR está activo; con `gunicorn --preload`
+    conviene llamarla en el hook post_fork (las instancias de FaceMesh no
+    sobreviven al fork).
+    """
+    import cv2
+
+    from atencion.scripts.procesamiento_mediapipe import cara_sintetica, obtener_pool
+
+    inicio = time.perf_counter()
+
+    frame = cara_sintetica()
+    obtener_pool().calentar(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    metricas = procesar_frame(cv2.imencode(".jpg", frame)[1].tobytes())
+    if metricas is None:
+        raise RuntimeError("El frame de calentamiento no produjo métricas (rostro no detectado).")
+    clasificar([[metricas[c] for c in ("ear", "mar", "yaw", "pitch", "roll")]])
+
+    return time.perf_counter() - inicio
@@ -0,0 +1,28 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+MAX_BYTES_FRAME = getattr(settings, "MONITOREO_MAX_BYTES_FRAME", 2 * 1024 * 1024)
+
+
+class FrameBinarioParser(BaseParser):
+    """
+    Cuerpo de la solicitud = bytes crudos de la imagen (JPEG/WebP).
+    request.data queda como `bytes`, listo para cv2.imdecode.
+    """
+    media_type = "application/octet-stream"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return b""
+
+        datos = stream.read(MAX_BYTES_FRAME + 1)
+        if len(datos) > MAX_BYTES_FRAME:
+            raise ParseError(f"El frame supera el máximo de {MAX_BYTES_FRAME} bytes.")
+        return datos
+
+
+class FrameImagenParser(FrameBinarioParser):
+    """Igual que FrameBinarioParser para Content-Type image/jpeg, image/webp, etc."""
+    media_type = "image/*"
@@ -0,0 +1,338 @@
+"""
+Resúmenes (rollups) de la telemetría de atención.
+
+Los tableros y reportes no necesitan cada frame: les basta la atención
+por minuto de una sesión (ResumenMinuto) o por estudiante y recurso
+(ResumenEstudianteRecurso). actualizar_resumenes() incorpora a esas
+tablas los AtencionVisual insertados desde la última corrida, con UNA
+consulta agregada por ventana (GROUP BY en la base) y sumando al resumen
+existente; la marca de agua es AtencionVisual.fecha (momento de inserción),
+así que los frames que llegan tarde también se cuentan.
+
+Con MONITOREO_ALMACENAMIENTO = "bloques" no hay AtencionVisual: los frames
+se leen de BloqueAtencion. Un bloque solo crece por el final, así que su
+marca de agua es BloqueAtencion.n_resumidos (frames ya incorporados) y en
+cada corrida se suman únicamente los frames siguientes. Con "ambos" los
+mismos frames están en las dos tablas y solo se resumen las filas.
+
+Se corre periódicamente con `python manage.py resumir_atencion`. Los
+reportes leen los resúmenes; con fuente="crudo" se calculan los mismos
+números directamente desde AtencionVisual, o desde los bloques (al día,
+pero recorriendo los frames).
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMinute
+from django.utils import timezone
+
+from .bloques import COLUMNAS, GUARDAR_FILAS
+from .models import AtencionVisual, BloqueAtencion, ProgresoResumen, ResumenEstudianteRecurso, ResumenMinuto
+
+
+METRICAS = ("ear", "mar", "yaw", "pitch", "roll")
+
+CAMPOS_SUMA = (
+    "n_frames", "n_atentos", "suma_score",
+    *(f"{prefijo}_{metrica}" for metrica in METRICAS for prefijo in ("suma", "suma2")),
+)
+
+PROGRESO = "atencion"
+PURGA = "purga"  # hasta dónde purgar_atencion ya borró frames crudos
+MARGEN = timedelta(seconds=5)  # transacciones en vuelo con `fecha` apenas anterior al corte
+PASO = timedelta(hours=6)  # ventana de `fecha` por consulta/transacción
+LOTE_BLOQUES = 200  # bloques por transacción
+
+EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+CRUDO = "crudo"
+RESUMEN = "resumen"
+
+
+def _anotaciones():
+    """Sumas de CAMPOS_SUMA como anotaciones de un values().annotate()."""
+    anotaciones = {
+        "n_frames": Count("id"),
+        # nivel_atencion guarda la clase del modelo: "1" = atento
+        "n_atentos": Count("id", filter=Q(nivel_atencion="1")),
+        "suma_score": Sum("score_atencion"),
+    }
+    for metrica in METRICAS:
+        anotaciones[f"suma_{metrica}"] = Sum(metrica)
+        anotaciones[f"suma2_{metrica}"] = Sum(F(metrica) * F(metrica))
+    return anotaciones
+
+
+def agrupar(queryset, *claves):
+    """Sumas por grupo de una consulta de AtencionVisual (una fila por grupo)."""
+    return (
+        queryset.filter(score_atencion__isnull=False)
+        .values(*claves)
+        .annotate(**_anotaciones())
+        .order_by(*claves)
+    )
+
+
+def describir(sumas):
+    """Sumas (dict o resumen) → frames, score medio, fracción atenta, medias y varianzas."""
+    valor = sumas.get if isinstance(sumas, dict) else lambda campo: getattr(sumas, campo)
+    n = valor("n_frames") or 0
+    if not n:
+        return {"frames": 0, "score_medio": None, "fraccion_atento": None, "medias": {}, "varianzas": {}}
+
+    medias, varianzas = {}, {}
+    for metrica in METRICAS:
+        media = (valor(f"suma_{metrica}") or 0.0) / n
+        medias[metrica] = media
+        # max(0, ...): errores de redondeo con varianzas casi nulas
+        varianzas[metrica] = max((valor(f"suma2_{metrica}") or 0.0) / n - media * media, 0.0)
+
+    return {
+        "frames": n,
+        "score_medio": (valor("suma_score") or 0.0) / n,
+        "fraccion_atento": valor("n_atentos") / n,
+        "medias": medias,
+        "varianzas": varianzas,
+    }
+
+
+def _acumular(grupos, clave, sumas):
+    grupo = grupos.get(clave)
+    if grupo is None:
+        grupos[clave] = dict(sumas)
+    else:
+        for campo, valor in sumas.items():
+            grupo[campo] += valor
+
+
+def agrupar_bloques(bloques, incremental=False):
+    """
+    Sumas de los frames de una consulta de BloqueAtencion, con los mismos
+    campos que agrupar(): por (sesion_id, minuto) y por (estudiante_id,
+    recurso_id). Con `incremental` solo cuenta los frames posteriores a
+    n_resumidos. Devuelve (minutos, estudiantes, leidos), con `leidos` =
+    [(pk, n_frames)] de cada bloque recorrido.
+    """
+    import numpy as np
+
+    minutos, estudiantes, leidos = {}, {}, []
+    filas = bloques.values_list(
+        "pk", "sesion_id", "sesion__estudiante_id", "sesion__recurso_id",
+        "inicio", "n_frames", "n_resumidos", "metricas", "etiquetas", "tiempos",
+    )
+    for pk, sesion_id, estudiante_id, recurso_id, inicio, n, resumidos, metricas, etiquetas, tiempos in filas:
+        leidos.append((pk, n))
+        desde = resumidos if incremental else 0
+        if n <= desde:
+            continue
+
+        columnas = np.frombuffer(metricas, dtype="<f4").reshape(len(COLUMNAS), n)[:, desde:].astype(np.float64)
+        atentos = np.frombuffer(etiquetas, dtype=np.uint8)[desde:] == 1
+        # Microsegundos enteros desde la época: el minuto sale sin errores de redondeo
+        micros = (inicio - EPOCA) // timedelta(microseconds=1)
+        micros += np.frombuffer(tiempos, dtype="<i4")[desde:].astype(np.int64) * 1000
+        claves, inverso = np.unique(micros // 60_000_000, return_inverse=True)
+
+        def sumar(pesos=None):
+            return np.bincount(inverso, weights=pesos, minlength=len(claves))
+
+        por_minuto = {
+            "n_frames": sumar(),
+            "n_atentos": sumar(atentos),
+            "suma_score": sumar(columnas[COLUMNAS.index("score")]),
+        }
+        for metrica in METRICAS:
+            valores = columnas[COLUMNAS.index(metrica)]
+            por_minuto[f"suma_{metrica}"] = sumar(valores)
+            por_minuto[f"suma2_{metrica}"] = sumar(valores * valores)
+
+        for j, clave in enumerate(claves):
+            sumas = {campo: valores[j].item() for campo, valores in por_minuto.items()}
+            sumas["n_frames"], sumas["n_atentos"] = int(sumas["n_frames"]), int(sumas["n_atentos"])
+            minuto = EPOCA + timedelta(minutes=int(clave))
+            _acumular(minutos, (sesion_id, minuto), sumas)
+            if estudiante_id is not None and recurso_id is not None:
+                _acumular(estudiantes, (estudiante_id, recurso_id), sumas)
+
+    return (
+        [{"sesion_id": s, "minuto": m, **sumas} for (s, m), sumas in sorted(minutos.items())],
+        [{"estudiante_id": e, "recurso_id": r, **sumas} for (e, r), sumas in sorted(estudiantes.items())],
+        leidos,
+    )
+
+
+# ============================================================
+#  ACTUALIZACIÓN INCREMENTAL
+# ============================================================
+
+def _sumar(modelo, claves, grupos, lote=500):
+    """Suma los grupos a las filas de `modelo` (crea las que falten)."""
+    ahora = timezone.now()
+    for inicio in range(0, len(grupos), lote):
+        parte = grupos[inicio:inicio + lote]
+        # Superconjunto por columna (sin un OR por grupo); se cruza en Python
+        existentes = {
+            tuple(getattr(resumen, clave) for clave in claves): resumen
+            for resumen in modelo.objects.filter(
+                **{f"{clave}__in": {grupo[clave] for grupo in parte} for clave in claves}
+            )
+        }
+
+        nuevos, modificados = [], []
+        for grupo in parte:
+            resumen = existentes.get(tuple(grupo[clave] for clave in claves))
+            if resumen is None:
+                resumen = modelo(**{clave: grupo[clave] for clave in claves})
+                nuevos.append(resumen)
+            else:
+                resumen.actualizado = ahora
+                modificados.append(resumen)
+            for campo in CAMPOS_SUMA:
+                setattr(resumen, campo, getattr(resumen, campo) + (grupo[campo] or 0))
+
+        modelo.objects.bulk_create(nuevos)
+        modelo.objects.bulk_update(modificados, [*CAMPOS_SUMA, "actualizado"])
+    return len(grupos)
+
+
+def actualizar_resumenes(hasta=None, paso=PASO):
+    """
+    Incorpora los frames registrados desde la última corrida: los
+    AtencionVisual insertados hasta `hasta` (por defecto ahora - MARGEN)
+    o, sin filas (MONITOREO_ALMACENAMIENTO = "bloques"), los frames nuevos
+    de cada BloqueAtencion. Cada ventana se suma en su propia transacción
+    junto con la marca de agua, así una corrida interrumpida retoma donde
+    quedó sin contar dos veces.
+    Devuelve (grupos por minuto, grupos estudiante/recurso) actualizados.
+    """
+    if not GUARDAR_FILAS:
+        return _actualizar_desde_bloques()
+
+    hasta = hasta or timezone.now() - MARGEN
+    progreso = ProgresoResumen.objects.filter(pk=PROGRESO).first()
+    desde = progreso.hasta if progreso else None
+    if desde is None:
+        primera = AtencionVisual.objects.order_by("fecha").values_list("fecha", flat=True).first()
+        if primera is None:
+            return 0, 0
+        desde = primera - timedelta(microseconds=1)
+
+    minutos = estudiantes = 0
+    while desde < hasta:
+        siguiente = (
+            AtencionVisual.objects.filter(fecha__gt=desde, fecha__lte=hasta)
+            .order_by("fecha").values_list("fecha", flat=True).first()
+        )
+        # Los tramos sin registros se saltan en lugar de recorrerlos de a `paso`
+        corte = hasta if siguiente is None else min(siguiente + paso, hasta)
+        ventana = AtencionVisual.objects.filter(fecha__gt=desde, fecha__lte=corte)
+        with transaction.atomic():
+            minutos += _sumar(
+                ResumenMinuto,
+                ("sesion_id", "minuto"),
+                list(agrupar(
+                    ventana.filter(sesion__isnull=False).annotate(minuto=TruncMinute("timestamp")),
+                    "sesion_id", "minuto",
+                )),
+            )
+            estudiantes += _sumar(
+                ResumenEstudianteRecurso,
+                ("estudiante_id", "recurso_id"),
+                list(agrupar(
+                    ventana.filter(estudiante__isnull=False, recurso__isnull=False),
+                    "estudiante_id", "recurso_id",
+                )),
+            )
+            ProgresoResumen.objects.update_or_create(pk=PROGRESO, defaults={"hasta": corte})
+        desde = corte
+
+    return minutos, estudiantes
+
+
+def _actualizar_desde_bloques(lote=LOTE_BLOQUES):
+    minutos = estudiantes = 0
+    ultimo = None
+    while True:
+        pendientes = BloqueAtencion.objects.filter(n_frames__gt=F("n_resumidos")).order_by("pk")
+        if ultimo is not None:
+            pendientes = pendientes.filter(pk__gt=ultimo)
+        pks = list(pendientes.values_list("pk", flat=True)[:lote])
+        if not pks:
+            return minutos, estudiantes
+
+        with transaction.atomic():
+            por_minuto, por_estudiante, leidos = agrupar_bloques(
+                BloqueAtencion.objects.filter(pk__in=pks), incremental=True
+            )
+            minutos += _sumar(ResumenMinuto, ("sesion_id", "minuto"), por_minuto)
+            estudiantes += _sumar(ResumenEstudianteRecurso, ("estudiante_id", "recurso_id"), por_estudiante)
+            # Solo los frames leídos: si el bloque creció entretanto, el resto va en la próxima corrida
+            for pk, n in leidos:
+                BloqueAtencion.objects.filter(pk=pk).update(n_resumidos=n)
+        ultimo = pks[-1]
+
+
+def reconstruir_resumenes():
+    """
+    Borra los resúmenes y la marca de agua (la próxima corrida recalcula
+    todo). Si purgar_atencion ya borró frames crudos, los resúmenes son la
+    única copia de ese historial y se rechaza con ValueError.
+    """
+    purga = ProgresoResumen.objects.filter(pk=PURGA).values_list("hasta", flat=True).first()
+    if purga is not None:
+        raise ValueError(
+            f"No se pueden reconstruir los resúmenes: los frames anteriores a {purga:%Y-%m-%d %H:%M} "
+            "ya se purgaron y solo quedan en los resúmenes."
+        )
+
+    with transaction.atomic():
+        ResumenMinuto.objects.all().delete()
+        ResumenEstudianteRecurso.objects.all().delete()
+        ProgresoResumen.objects.filter(pk=PROGRESO).delete()
+        BloqueAtencion.objects.update(n_resumidos=0)
+
+
+# ============================================================
+#  LECTURA PARA REPORTES
+# ============================================================
+
+def serie_por_minuto(sesion, fuente=RESUMEN):
+    """Atención minuto a minuto de una sesión: [{"minuto": ..., **describir()}]."""
+    if fuente == CRUDO:
+        if GUARDAR_FILAS:
+            grupos = agrupar(
+                AtencionVisual.objects.filter(sesion=sesion).annotate(minuto=TruncMinute("timestamp")),
+                "minuto",
+            )
+        else:
+            grupos, _, _ = agrupar_bloques(BloqueAtencion.objects.filter(sesion=sesion))
+        return [{"minuto": grupo["minuto"], **describir(grupo)} for grupo in grupos]
+
+    return [
+        {"minuto": resumen.minuto, **describir(resumen)}
+        for resumen in ResumenMinuto.objects.filter(sesion=sesion).order_by("minuto")
+    ]
+
+
+def resumen_por_estudiante(fuente=RESUMEN, **filtros):
+    """
+    Atención por estudiante y recurso, filtrada por `estudiante_id` y/o
+    `recurso_id`: [{"estudiante": id, "recurso": id, **describir()}].
+    """
+    if fuente == CRUDO:
+        if GUARDAR_FILAS:
+            grupos = agrupar(AtencionVisual.objects.filter(**filtros), "estudiante_id", "recurso_id")
+        else:
+            _, grupos, _ = agrupar_bloques(
+                BloqueAtencion.objects.filter(**{f"sesion__{campo}": valor for campo, valor in filtros.items()})
+            )
+        return [
+            {"estudiante": grupo["estudiante_id"], "recurso": grupo["recurso_id"], **describir(grupo)}
+            for grupo in grupos
+        ]
+
+    return [
+        {"estudiante": resumen.estudiante_id, "recurso": resumen.recurso_id, **describir(resumen)}
+        for resumen in ResumenEstudianteRecurso.objects.filter(**filtros).order_by("estudiante_id", "recurso_id")
+    ]
@@ -0,0 +1,213 @@
+"""
+Retención de la telemetría cruda de atención.
+
+Política: los frames crudos (AtencionVisual, BloqueAtencion) se guardan
+MONITOREO_RETENCION_DIAS días; los resúmenes (ResumenMinuto,
+ResumenEstudianteRecurso) y los agregados de SesionMonitoreo se guardan
+siempre. `python manage.py purgar_atencion` aplica la política.
+
+Todo se borra en lotes acotados (MONITOREO_PURGA_LOTE filas por DELETE,
+cada uno en su propia transacción, con una pausa entre lotes). Las tablas
+de telemetría no tienen relaciones entrantes ni señales, así que
+QuerySet.delete() hace un DELETE ... WHERE id IN (...) directo, sin cargar
+los objetos. Así SQLite no queda bloqueado durante todo el borrado y los
+frames que siguen llegando pueden escribirse entre lote y lote.
+
+Los frames crudos solo se borran cuando ya están en los resúmenes: los
+AtencionVisual hasta la marca de agua de resumenes.py y, si los frames
+solo se guardan en bloques (MONITOREO_ALMACENAMIENTO = "bloques"), los
+BloqueAtencion con todos sus frames resumidos (n_resumidos = n_frames).
+
+Borrar un Curso, Nivel, Fase, Recurso o SesionMonitoreo arrastraría en
+cascada todos sus frames en una sola transacción; borrar_con_telemetria()
+primero vacía esa telemetría por lotes y después borra el objeto (la
+cascada restante es pequeña). Si hay muchos frames, las vistas lo hacen en
+un hilo de fondo (BorradoConTelemetriaMixin).
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from cursos.models import Curso, Fase, Nivel, Recurso
+
+from .bloques import GUARDAR_FILAS
+from .models import AtencionVisual, BloqueAtencion, ProgresoResumen, ResumenMinuto, SesionMonitoreo
+from .resumenes import PROGRESO, PURGA, actualizar_resumenes
+
+
+logger = logging.getLogger(__name__)
+
+RETENCION_DIAS = getattr(settings, "MONITOREO_RETENCION_DIAS", 180)
+LOTE = getattr(settings, "MONITOREO_PURGA_LOTE", 5000)
+PAUSA = getattr(settings, "MONITOREO_PURGA_PAUSA_MS", 50) / 1000.0
+MIN_FILAS_ASINCRONO = getattr(settings, "MONITOREO_BORRADO_ASINCRONO_MIN_FILAS", 10000)
+
+
+def borrar_por_lotes(queryset, lote=LOTE, pausa=PAUSA):
+    """
+    Borra las filas de `queryset` de a `lote` con DELETE directos.
+    Devuelve el total borrado.
+    """
+    modelo = queryset.model
+    total = 0
+    while True:
+        ids = list(queryset.values_list("pk", flat=True)[:lote])
+        if not ids:
+            return total
+        borrados, _ = modelo.objects.using(queryset.db).filter(pk__in=ids).delete()
+        total += borrados
+        if len(ids) < lote:
+            return total
+        if pausa:
+            # Deja pasar a los escritores antes del siguiente lote
+            time.sleep(pausa)
+
+
+# ============================================================
+#  RETENCIÓN POR ANTIGÜEDAD
+# ============================================================
+
+def _registrar_purga(hasta):
+    """Desde aquí los resúmenes no se pueden reconstruir desde los frames."""
+    purgado = ProgresoResumen.objects.filter(pk=PURGA).values_list("hasta", flat=True).first()
+    if purgado is None or hasta > purgado:
+        ProgresoResumen.objects.update_or_create(pk=PURGA, defaults={"hasta": hasta})
+
+
+def purgar_frames_antiguos(dias=RETENCION_DIAS, lote=LOTE, pausa=PAUSA):
+    """
+    Borra los frames crudos de más de `dias` días. Antes se actualizan los
+    resúmenes, y solo se borra lo que ya está incorporado a ellos: de
+    AtencionVisual, hasta la marca de agua; de BloqueAtencion (cuando es la
+    única copia de los frames), los bloques ya resumidos por completo.
+    Devuelve (registros, bloques) borrados.
+    """
+    actualizar_resumenes()
+    corte = timezone.now() - timedelta(days=dias)
+
+    resumido = ProgresoResumen.objects.filter(pk=PROGRESO).values_list("hasta", flat=True).first()
+    registros = 0
+    if resumido is not None:
+        limite = min(corte, resumido)
+        registros = borrar_por_lotes(AtencionVisual.objects.filter(fecha__lt=limite), lote, pausa)
+        if registros:
+            _registrar_purga(limite)
+
+    antiguos = BloqueAtencion.objects.filter(inicio__lt=corte)
+    if not GUARDAR_FILAS:
+        antiguos = antiguos.filter(n_resumidos__gte=F("n_frames"))
+    bloques = borrar_por_lotes(antiguos, lote, pausa)
+    if bloques and not GUARDAR_FILAS:
+        _registrar_purga(corte)
+    return registros, bloques
+
+
+# ============================================================
+#  BORRADO DE CURSOS / RECURSOS / SESIONES CON SU TELEMETRÍA
+# ============================================================
+
+def _alcance(instancia):
+    """(fases, recursos, sesiones) cuya telemetría cae con `instancia`."""
+    if isinstance(instancia, SesionMonitoreo):
+        return [], [], [instancia.pk]
+    if isinstance(instancia, Recurso):
+        fases, recursos = [], [instancia.pk]
+    else:
+        filtro = {
+            Curso: {"nivel__curso": instancia.pk},
+            Nivel: {"nivel": instancia.pk},
+            Fase: {"pk": instancia.pk},
+        }[type(instancia)]
+        fases = list(Fase.objects.filter(**filtro).values_list("pk", flat=True))
+        recursos = list(Recurso.objects.filter(fase__in=fases).values_list("pk", flat=True))
+
+    sesiones = list(
+        SesionMonitoreo.objects.filter(Q(fase__in=fases) | Q(recurso__in=recursos))
+        .values_list("pk", flat=True)
+    )
+    return fases, recursos, sesiones
+
+
+def filas_telemetria(instancia, limite=MIN_FILAS_ASINCRONO):
+    """Frames que arrastra `instancia`, contados como mucho hasta `limite`."""
+    _, _, sesiones = _alcance(instancia)
+    return AtencionVisual.objects.filter(sesion__in=sesiones)[:limite].count()
+
+
+def vaciar_telemetria(instancia, lote=LOTE, pausa=PAUSA):
+    """Borra por lotes los frames, bloques y resúmenes por minuto que caen con `instancia`."""
+    fases, recursos, sesiones = _alcance(instancia)
+    total = 0
+    for sesion_id in sesiones:
+        # Un lote por sesión: cada consulta usa el índice de sesion_id
+        total += borrar_por_lotes(AtencionVisual.objects.filter(sesion_id=sesion_id), lote, pausa)
+        borrar_por_lotes(BloqueAtencion.objects.filter(sesion_id=sesion_id), lote, pausa)
+        borrar_por_lotes(ResumenMinuto.objects.filter(sesion_id=sesion_id), lote, pausa)
+
+    # Registros sin sesión que apuntan directo al recurso o a la fase
+    if recursos:
+        total += borrar_por_lotes(AtencionVisual.objects.filter(recurso_id__in=recursos), lote, pausa)
+    if fases:
+        total += borrar_por_lotes(AtencionVisual.objects.filter(fase_id__in=fases), lote, pausa)
+    return total
+
+
+def borrar_con_telemetria(instancia, lote=LOTE, pausa=PAUSA):
+    """Vacía la telemetría por lotes y luego borra `instancia` (cascada ya pequeña)."""
+    total = vaciar_telemetria(instancia, lote, pausa)
+    instancia.delete()
+    return total
+
+
+_executor = None
+
+
+def _borrar_en_hilo(modelo, pk):
+    close_old_connections()
+    try:
+        instancia = modelo.objects.filter(pk=pk).first()
+        if instancia is not None:
+            total = borrar_con_telemetria(instancia)
+            logger.info("%s %s eliminado con %d registros de atención.", modelo.__name__, pk, total)
+    except Exception:
+        # Queda a medio vaciar (sin inconsistencias): se puede repetir con
+        # `manage.py purgar_atencion --<modelo> <id>`
+        logger.exception("Falló el borrado de %s %s.", modelo.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+def borrar_en_segundo_plano(instancia):
+    global _executor
+    if _executor is None:
+        # Un solo hilo: los borrados grandes no compiten entre sí por el lock de escritura
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="borrado-telemetria")
+    return _executor.submit(_borrar_en_hilo, type(instancia), instancia.pk)
+
+
+class BorradoConTelemetriaMixin:
+    """
+    destroy() para viewsets cuyos objetos arrastran telemetría de atención:
+    con pocos frames se borra en la solicitud (por lotes, 204); con
+    MONITOREO_BORRADO_ASINCRONO_MIN_FILAS o más, en segundo plano (202).
+    """
+
+    def destroy(self, request, *args, **kwargs):
+        instancia = self.get_object()
+        if filas_telemetria(instancia) >= MIN_FILAS_ASINCRONO:
+            borrar_en_segundo_plano(instancia)
+            return Response(
+                {"detail": "La eliminación continúa en segundo plano."},
+                status=status.HTTP_202_ACCEPTED,
+            )
+
+        borrar_con_telemetria(instancia)
+        return Response(status=status.HTTP_204_NO_CONTENT)
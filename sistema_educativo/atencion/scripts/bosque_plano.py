@@ -0,0 +1,214 @@
+"""
+Random Forest "aplanado": todos los árboles del bosque en arreglos NumPy
+contiguos, con el StandardScaler ya incorporado en los umbrales.
+
+exportar_bosque() convierte el modelo entrenado (RandomForestClassifier +
+StandardScaler) en esos arreglos y BosquePlano los evalúa de forma
+vectorizada: todas las filas y todos los árboles avanzan un nivel por
+iteración, así que una predicción cuesta ~max_depth operaciones NumPy en
+lugar de recorrer el bosque con la maquinaria genérica de scikit-learn.
+Para cargar el modelo plano no hace falta importar scikit-learn.
+
+Formato en disco: un directorio con un .npy por arreglo. Se carga con
+np.load(mmap_mode="r"), así que los workers de un mismo servidor comparten
+las mismas páginas físicas (page cache) en lugar de tener cada uno su copia.
+Los .npz de versiones anteriores se convierten a ese formato la primera vez
+que se cargan (ver convertir_npz).
+"""
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+def exportar_bosque(modelo, scaler, features):
+    """
+    Aplana un RandomForestClassifier entrenado sobre datos escalados.
+
+    Devuelve un diccionario de arreglos:
+    - caracteristica, umbral: por nodo (en hojas: 0 y 0.0)
+    - hijos: hijos intercalados [izq0, der0, izq1, der1, ...] con índices
+      globales (en hojas: el propio nodo, así la hoja es un punto fijo del
+      recorrido); el siguiente nodo es hijos[2 * nodo + no(x <= umbral)]
+    - valor: probabilidades de clase por nodo (n_nodos, n_clases)
+    - raices: índice global de la raíz de cada árbol
+    - profundidad, clases, features
+
+    Umbral plegado: el árbol compara (x - media) / escala <= t, que para
+    escala > 0 equivale a x <= t * escala + media.
+    """
+    media = np.asarray(scaler.mean_, dtype=np.float64)
+    escala = np.asarray(scaler.scale_, dtype=np.float64)
+
+    caracteristicas, umbrales, izquierdos, derechos, valores, raices = [], [], [], [], [], []
+    desplazamiento = 0
+    profundidad = 0
+
+    for estimador in modelo.estimators_:
+        arbol = estimador.tree_
+        n = arbol.node_count
+        indices = np.arange(n) + desplazamiento
+        hoja = arbol.children_left == -1
+
+        caracteristica = np.where(hoja, 0, arbol.feature).astype(np.int32)
+        umbral = arbol.threshold * escala[caracteristica] + media[caracteristica]
+
+        caracteristicas.append(caracteristica)
+        umbrales.append(np.where(hoja, 0.0, umbral))
+        izquierdos.append(np.where(hoja, indices, arbol.children_left + desplazamiento))
+        derechos.append(np.where(hoja, indices, arbol.children_right + desplazamiento))
+
+        # Según la versión de scikit-learn, value guarda conteos o fracciones
+        valor = arbol.value[:, 0, :]
+        valores.append(valor / valor.sum(axis=1, keepdims=True))
+
+        raices.append(desplazamiento)
+        desplazamiento += n
+        profundidad = max(profundidad, arbol.max_depth)
+
+    hijos = np.column_stack([np.concatenate(izquierdos), np.concatenate(derechos)])
+
+    return {
+        "caracteristica": np.concatenate(caracteristicas).astype(np.int32),
+        "umbral": np.concatenate(umbrales).astype(np.float64),
+        "hijos": hijos.ravel().astype(np.int32),
+        "valor": np.concatenate(valores).astype(np.float64),
+        "raices": np.array(raices, dtype=np.int32),
+        "profundidad": np.array(profundidad, dtype=np.int32),
+        "clases": np.asarray(modelo.classes_),
+        "features": np.array(features),
+    }
+
+
+def guardar_bosque(arreglos, directorio):
+    """Guarda los arreglos del bosque plano como <directorio>/<nombre>.npy (sin pickle)."""
+    os.makedirs(directorio, exist_ok=True)
+    for nombre, arreglo in arreglos.items():
+        np.save(os.path.join(directorio, f"{nombre}.npy"), np.ascontiguousarray(arreglo))
+
+
+def convertir_npz(ruta):
+    """
+    Escribe el bosque de un .npz antiguo en el formato de directorio
+    (<ruta sin .npz>/, un .npy por arreglo) y devuelve ese directorio.
+    Si ya existe y no es más viejo que el .npz, se reutiliza. Se escribe en
+    un directorio temporal que se renombra al final: varios workers pueden
+    convertir a la vez y ninguno ve una conversión a medias.
+    """
+    destino = os.path.splitext(ruta)[0]
+    if os.path.isdir(destino) and os.path.getmtime(destino) >= os.path.getmtime(ruta):
+        return destino
+
+    with np.load(ruta, allow_pickle=False) as datos:
+        arreglos = {clave: datos[clave] for clave in datos.files}
+    if "hijos" not in arreglos:
+        # Exportaciones .npz anteriores: hijos izquierdo/derecho separados
+        arreglos["hijos"] = np.column_stack(
+            [arreglos.pop("izquierdo"), arreglos.pop("derecho")]
+        ).ravel().astype(np.int32)
+
+    padre = os.path.dirname(os.path.abspath(destino))
+    temporal = tempfile.mkdtemp(prefix=f".{os.path.basename(destino)}-", dir=padre)
+    try:
+        # mkdtemp crea el directorio 0700: los demás workers deben poder leerlo
+        os.chmod(temporal, 0o755)
+        guardar_bosque(arreglos, temporal)
+        if os.path.isdir(destino):
+            # Conversión vieja: se aparta (los mapeos abiertos siguen válidos)
+            viejo = tempfile.mkdtemp(prefix=f".{os.path.basename(destino)}-viejo-", dir=padre)
+            os.rename(destino, os.path.join(viejo, "bosque"))
+            shutil.rmtree(viejo, ignore_errors=True)
+        os.rename(temporal, destino)
+    except OSError:
+        shutil.rmtree(temporal, ignore_errors=True)
+        # Otro worker terminó primero
+        if not os.path.isdir(destino):
+            raise
+    logger.info("Bosque %s convertido a %s (arreglos .npy mapeables).", ruta, destino)
+    return destino
+
+
+class BosquePlano:
+    """Evaluador vectorizado de un bosque exportado con exportar_bosque()."""
+
+    def __init__(self, arreglos):
+        self.caracteristica = arreglos["caracteristica"]
+        self.umbral = arreglos["umbral"]
+        self.valor = arreglos["valor"]
+        self.raices = arreglos["raices"]
+        self.profundidad = int(arreglos["profundidad"].item())
+        self.clases = np.asarray(arreglos["clases"])
+        self.features = [str(f) for f in arreglos["features"]]
+
+        if "hijos" in arreglos:
+            self._hijos = arreglos["hijos"]
+        else:
+            # Exportaciones .npz anteriores: hijos izquierdo/derecho separados
+            self._hijos = np.column_stack([arreglos["izquierdo"], arreglos["derecho"]]).ravel()
+
+    @classmethod
+    def cargar(cls, ruta, mmap=True):
+        """
+        Carga un bosque guardado con guardar_bosque(). Con `mmap` los
+        arreglos quedan mapeados en memoria, solo lectura y compartidos
+        entre procesos. También acepta el .npz de versiones anteriores:
+        con `mmap` se convierte antes al formato de directorio; si no se
+        puede escribir junto a él, se lee completo en memoria.
+        """
+        if mmap and os.path.isfile(ruta):
+            try:
+                ruta = convertir_npz(ruta)
+            except OSError:
+                logger.warning(
+                    "No se pudo convertir %s a arreglos .npy; se carga completo en memoria.",
+                    ruta, exc_info=True,
+                )
+
+        if os.path.isdir(ruta):
+            modo = "r" if mmap else None
+            arreglos = {
+                nombre[:-4]: np.load(os.path.join(ruta, nombre), mmap_mode=modo, allow_pickle=False)
+                for nombre in os.listdir(ruta)
+                if nombre.endswith(".npy")
+            }
+            return cls(arreglos)
+
+        with np.load(ruta, allow_pickle=False) as datos:
+            return cls({clave: datos[clave] for clave in datos.files})
+
+    @property
+    def classes_(self):
+        # Misma interfaz que el clasificador de scikit-learn
+        return self.clases
+
+    @property
+    def n_arboles(self):
+        return len(self.raices)
+
+    def hojas(self, matriz):
+        """Índice de la hoja alcanzada en cada árbol: arreglo (n, n_arboles)."""
+        matriz = np.ascontiguousarray(matriz, dtype=np.float64)
+        n, columnas = matriz.shape
+        valores_planos = matriz.ravel()
+        base = (np.arange(n) * columnas)[:, None]
+        nodos = np.broadcast_to(self.raices, (n, self.n_arboles)).copy()
+
+        # Las hojas apuntan a sí mismas: basta con max_depth pasos
+        for _ in range(self.profundidad):
+            valores = valores_planos.take(base + self.caracteristica.take(nodos))
+            # Igual que scikit-learn: x <= umbral va a la izquierda (NaN, a la derecha)
+            derecha = ~(valores <= self.umbral.take(nodos))
+            nodos = self._hijos.take(2 * nodos + derecha)
+        return nodos
+
+    def predict_proba(self, matriz):
+        """Promedio de las probabilidades de hoja de todos los árboles (n, n_clases)."""
+        return self.valor[self.hojas(matriz)].sum(axis=1) / self.n_arboles
+
+    def predict(self, matriz):
+        return self.clases.take(self.predict_proba(matriz).argmax(axis=1))
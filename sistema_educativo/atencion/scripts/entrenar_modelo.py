@@ -4,16 +4,23 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score, classification_report
-import pickle
+import sys
+from datetime import datetime
+
+import numpy as np
+import sklearn
+
+from atencion.scripts.bosque_plano import exportar_bosque, BosquePlano
+from atencion.scripts.registro_modelos import RegistroModelos, hash_archivo
 
 # RUTA AL CSV EXACTO
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 DATASET_PATH = os.path.join(BASE_DIR, "data", "datos_entrenamiento_ddd.csv")
 
-# RUTA DONDE SE GUARDARÁ EL MODELO
-MODEL_PATH = os.path.join("atencion", "scripts", "modelo_atencion_rf.pkl")
+# El modelo se publica como una versión nueva en el registro de modelos
+# (atencion/scripts/modelos/ o MODELO_ATENCION_DIR)
 
-def entrenar_random_forest():
+def entrenar_random_forest(activar=True):
     print("\n==============================")
     print(" ENTRENANDO MODELO RANDOM FOREST (DDD CSV)")
     print("==============================\n")
@@ -77,20 +84,53 @@ def entrenar_random_forest():
     print(classification_report(y_test, y_pred))
 
     # ===============================
-    # 7. GUARDAR MODELO + SCALER
+    # 7. EXPORTAR BOSQUE PLANO
+    # ===============================
+    arreglos = exportar_bosque(model, scaler, FEATURES)
+    bosque = BosquePlano(arreglos)
+
+    # Debe reproducir exactamente al modelo de scikit-learn en el test
+    prob_sklearn = model.predict_proba(X_test_scaled)
+    prob_plano = bosque.predict_proba(X_test.to_numpy(dtype=float))
+    diferencia = np.abs(prob_sklearn - prob_plano).max()
+    coinciden = (bosque.predict(X_test.to_numpy(dtype=float)) == y_pred).mean()
+    print(f"Bosque plano vs sklearn en test: predicciones iguales={coinciden:.2%}, "
+          f"diferencia máx. de probabilidad={diferencia:.2e}")
+
+    if coinciden < 1.0:
+        raise RuntimeError("El bosque plano no reproduce las predicciones del modelo.")
+
+    # ===============================
+    # 8. PUBLICAR VERSIÓN EN EL REGISTRO
     # ===============================
     paquete_modelo = {
         "modelo": model,
         "scaler": scaler,
         "features": FEATURES
     }
+    metadata = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "features": FEATURES,
+        "metricas": {
+            "accuracy": float(accuracy),
+            "filas_entrenamiento": len(X_train),
+            "filas_test": len(X_test),
+        },
+        "dataset": os.path.basename(DATASET_PATH),
+        "hash_dataset": hash_archivo(DATASET_PATH),
+        "parametros": model.get_params(),
+        "sklearn": sklearn.__version__,
+    }
 
-    with open(MODEL_PATH, "wb") as f:
-        pickle.dump(paquete_modelo, f)
+    registro = RegistroModelos()
+    version = registro.publicar(arreglos, metadata, paquete_modelo, activar=activar)
 
-    print(f"\nModelo entrenado y guardado en: {MODEL_PATH}")
-    print("Listo para usarse en producción.\n")
+    print(f"\nModelo publicado como versión {version} en: {registro.directorio}")
+    if activar:
+        print("Versión activada: los workers la cargarán sin reiniciar.\n")
+    else:
+        print(f"Para activarla: python manage.py modelo_atencion activar {version}\n")
 
 
 if __name__ == "__main__":
-    entrenar_random_forest()
+    entrenar_random_forest(activar="--sin-activar" not in sys.argv)
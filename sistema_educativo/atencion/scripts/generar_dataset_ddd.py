@@ -2,7 +2,7 @@ import os
 import cv2
 import csv
 from tqdm import tqdm
-from sistema_educativo.atencion.scripts.procesamiento_mediapipe import procesar_frame
+from atencion.scripts.procesamiento_mediapipe import procesar_frame_numpy
 
 # Ruta base del proyecto (carpeta Proyecto_Web/data)
 BASE_DATA = os.path.join(
@@ -25,11 +25,18 @@ MAX_IMAGES_PER_CLASS = 3000  # Puedes bajar a 500 si quieres pruebas rápidas
 # Archivo CSV final
 OUTPUT_CSV = os.path.join(BASE_DATA, "datos_entrenamiento_ddd.csv")
 
+# Mismo orden que las columnas del CSV y del modelo: EAR, MAR, Yaw, Pitch, Roll
+COLUMNAS_METRICAS = ("ear", "mar", "yaw", "pitch", "roll")
+
 
 def procesar_imagen(imagen_path, label):
     """
     Procesa una imagen con MediaPipe y extrae EAR, MAR y Head Pose.
     Devuelve [ear, mar, yaw, pitch, roll, label] o None si falla.
+    Las métricas salen del mismo código que usa el servidor
+    (landmarks_a_array, calcular_EAR_MAR y calcular_head_pose vía
+    procesar_frame_numpy), así el modelo se entrena con las mismas features
+    que luego recibe.
     """
     try:
         img = cv2.imread(imagen_path)
@@ -44,13 +51,13 @@ def procesar_imagen(imagen_path, label):
             img = cv2.resize(img, (150, 150))
 
         # Procesar con MediaPipe (EAR, MAR, yaw, pitch, roll)
-        ear, mar, yaw, pitch, roll = procesar_frame(img)
+        metricas = procesar_frame_numpy(img)
 
         # Si no hay rostro, descartamos la imagen
-        if ear is None:
+        if metricas is None:
             return None
 
-        return [ear, mar, yaw, pitch, roll, label]
+        return [metricas[c] for c in COLUMNAS_METRICAS] + [label]
 
     except Exception as e:
         print(f"❌ Error procesando {imagen_path}: {e}")
@@ -1,46 +1,45 @@
-import os
-import pickle
-import numpy as np
+from atencion.scripts.registro_modelos import ModeloActivo, RegistroModelos
 
-# Ruta al archivo .pkl generado por entrenar_modelo.py
-MODEL_PATH = os.path.join("atencion", "scripts", "modelo_atencion_rf.pkl")
+# Registro de versiones del modelo (entrenar_modelo.py publica ahí cada
+# entrenamiento). El modelo activo se carga en el primer uso, no al importar,
+# y se recarga en caliente cuando cambia la versión activa.
+registro = RegistroModelos()
+_modelo_activo = ModeloActivo(registro)
 
-# Cargar modelo y scaler al iniciar el módulo (optimiza rendimiento)
-if not os.path.exists(MODEL_PATH):
-    raise FileNotFoundError(f"No se encontró el modelo entrenado en: {MODEL_PATH}")
 
-with open(MODEL_PATH, "rb") as f:
-    paquete = pickle.load(f)
+def obtener_modelo():
+    """Modelo activo del proceso (ModeloAtencion con `version` y `features`)."""
+    return _modelo_activo.obtener()
 
-modelo = paquete["modelo"]
-scaler = paquete["scaler"]
-features_order = paquete["features"]  # ["EAR", "MAR", "Yaw", "Pitch", "Roll"]
 
-print("\nModelo Random Forest cargado correctamente.")
-print("Características esperadas:", features_order)
+def predecir_atencion_lote(matriz):
+    """
+    Clasifica varias muestras con UNA sola pasada por los árboles.
+    `matriz` es un arreglo (n, 5) con columnas EAR, MAR, Yaw, Pitch, Roll.
+    Devuelve dos arreglos de largo n:
+    - niveles: nivel de atención (0 o 1) por fila
+    - prob_atencion: probabilidad de la clase atención por fila
+    """
+    return obtener_modelo().predecir_lote(matriz)
 
 
-def predecir_atencion(ear, mar, pitch, yaw, roll):
+def predecir_atencion(ear, mar, yaw, pitch, roll):
     """
-    Recibe las métricas procesadas por MediaPipe y devuelve:
+    Recibe las métricas procesadas por MediaPipe, en el orden del modelo
+    (EAR, MAR, Yaw, Pitch, Roll), y devuelve:
     - nivel_atencion (0 o 1)
     - probabilidades de cada clase
     """
-
-    # Convertir a vector en el orden EXACTO usado durante entrenamiento
-    vector = np.array([[ear, mar, yaw, pitch, roll]], dtype=float)
-
-    # Escalar valores
-    vector_scaled = scaler.transform(vector)
-
-    # Predicción
-    pred = modelo.predict(vector_scaled)[0]
-    prob = modelo.predict_proba(vector_scaled)[0]
+    # Vector en el orden EXACTO usado durante entrenamiento
+    niveles, prob_atencion = predecir_atencion_lote([[ear, mar, yaw, pitch, roll]])
+    prob = float(prob_atencion[0])
 
     return {
-        "nivel_atencion": int(pred),
+        "nivel_atencion": int(niveles[0]),
         "probabilidades": {
-            "distraccion": float(prob[0]),
-            "atencion": float(prob[1])
-        }
+            "distraccion": 1.0 - prob,
+            "atencion": prob
+        },
+        # Score 0-100 = probabilidad de atención
+        "score": prob * 100.0
     }
@@ -1,3 +1,13 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+from datetime import datetime
+
 import cv2
 import numpy as np
 import mediapipe as mp
@@ -5,6 +15,52 @@ import base64
 
 mp_face_mesh = mp.solutions.face_mesh
 
+logger = logging.getLogger(__name__)
+
+# Configuración del grafo FaceMesh (detección completa en cada frame)
+FACE_MESH_CONFIG = {
+    "static_image_mode": True,
+    "max_num_faces": 1,
+    "refine_landmarks": True,
+    "min_detection_confidence": 0.5,
+}
+
+# Número máximo de instancias FaceMesh vivas por proceso
+# (por defecto una por núcleo; se puede fijar con FACEMESH_POOL_SIZE)
+POOL_SIZE = int(os.environ.get("FACEMESH_POOL_SIZE", 0)) or (os.cpu_count() or 1)
+
+# Modo tracking: un FaceMesh en modo video por sesión de monitoreo activa
+TRACKING_ACTIVO = os.environ.get("FACEMESH_TRACKING", "0").lower() in ("1", "true", "si")
+TRACKING_MAX_SESIONES = int(os.environ.get("FACEMESH_TRACKING_MAX_SESIONES", 64))
+TRACKING_INACTIVIDAD = float(os.environ.get("FACEMESH_TRACKING_INACTIVIDAD", 120))  # segundos
+
+# Recorte del rostro (ROI): decodificar/procesar solo la región alrededor
+# del último rostro detectado en la sesión, a resolución reducida si el
+# rostro es suficientemente grande
+ROI_ACTIVO = os.environ.get("FACEMESH_ROI", "0").lower() in ("1", "true", "si")
+ROI_MARGEN = float(os.environ.get("FACEMESH_ROI_MARGEN", 0.5))  # fracción del tamaño del rostro
+ROI_MIN_ROSTRO = int(os.environ.get("FACEMESH_ROI_MIN_ROSTRO", 128))  # px mínimos tras reducir
+
+# Omisión de frames casi idénticos: si la miniatura en grises del frame
+# apenas cambia respecto al último frame procesado de la sesión, se
+# reutiliza su resultado sin correr FaceMesh ni head pose
+DEDUP_ACTIVO = os.environ.get("FACEMESH_DEDUP", "0").lower() in ("1", "true", "si")
+DEDUP_UMBRAL = float(os.environ.get("FACEMESH_DEDUP_UMBRAL", 2.0))  # diferencia media (0-255)
+DEDUP_MAX_RACHA = int(os.environ.get("FACEMESH_DEDUP_MAX_RACHA", 10))  # reusos seguidos máximos
+DEDUP_MINIATURA = int(os.environ.get("FACEMESH_DEDUP_MINIATURA", 32))  # lado de la miniatura (px)
+DEDUP_RESUMEN = float(os.environ.get("FACEMESH_DEDUP_RESUMEN", 300))  # segundos entre resúmenes en el log (0: nunca)
+
+# Head pose: en frames consecutivos de una sesión, solvePnP parte de la
+# rotación/traslación del frame anterior (useExtrinsicGuess)
+HEAD_POSE_GUIADA = os.environ.get("FACEMESH_HEAD_POSE_GUIADA", "0").lower() in ("1", "true", "si")
+
+# Modos de decodificación reducida de OpenCV por factor de escala
+DECODIFICACION_REDUCIDA = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+}
+
 # Índices de puntos para EAR (ojos)
 LEFT_EYE = [33, 160, 158, 133, 153, 144]
 RIGHT_EYE = [263, 387, 385, 362, 380, 373]
@@ -12,6 +68,452 @@ RIGHT_EYE = [263, 387, 385, 362, 380, 373]
 # Índices para MAR (boca)
 MOUTH = [13, 14, 78, 308]
 
+# Pares de puntos cuya distancia necesitan EAR y MAR, en un solo arreglo:
+#   filas 0-2: ojo izquierdo (vertical 1, vertical 2, horizontal)
+#   filas 3-5: ojo derecho   (vertical 1, vertical 2, horizontal)
+#   filas 6-7: boca          (vertical, horizontal)
+PARES_EAR_MAR = np.array([
+    [LEFT_EYE[1], LEFT_EYE[5]], [LEFT_EYE[2], LEFT_EYE[4]], [LEFT_EYE[0], LEFT_EYE[3]],
+    [RIGHT_EYE[1], RIGHT_EYE[5]], [RIGHT_EYE[2], RIGHT_EYE[4]], [RIGHT_EYE[0], RIGHT_EYE[3]],
+    [MOUTH[0], MOUTH[1]], [MOUTH[2], MOUTH[3]],
+])
+
+# Puntos 2D usados para head pose (nariz, ojos, comisuras, mentón)
+HEAD_POSE_IDX = np.array([1, 33, 263, 61, 291, 199])
+
+# Modelo 3D genérico del rostro para esos mismos puntos (mm)
+PUNTOS_3D_HEAD_POSE = np.array([
+    [0.0, 0.0, 0.0],
+    [-30.0, -125.0, -30.0],
+    [30.0, -125.0, -30.0],
+    [-70.0, -70.0, -50.0],
+    [70.0, -70.0, -50.0],
+    [0.0, -150.0, -10.0]
+], dtype=np.float64)
+
+# Sin distorsión de lente
+DISTORSION = np.zeros((4, 1))
+
+
+# ============================================================
+#  POOL DE FACEMESH (instancias reutilizables)
+# ============================================================
+
+class FaceMeshPool:
+    """
+    Pool de instancias FaceMesh de larga vida.
+
+    Construir el grafo de MediaPipe y cargar el modelo cuesta mucho más
+    que la inferencia, así que las instancias se crean bajo demanda (hasta
+    `tamano`) y se reutilizan. Cada instancia la usa un solo hilo a la vez:
+    se toma con `obtener()` y se devuelve al salir del bloque `with`.
+    """
+
+    def __init__(self, tamano=POOL_SIZE, **config):
+        self.tamano = max(1, int(tamano))
+        self.config = {**FACE_MESH_CONFIG, **config}
+        self._libres = queue.LifoQueue()
+        self._creadas = 0
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _reiniciar_si_fork(self):
+        # Las instancias heredadas de otro proceso (fork) no son utilizables
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._libres = queue.LifoQueue()
+                    self._creadas = 0
+                    self._pid = os.getpid()
+
+    def _tomar(self, timeout=None):
+        self._reiniciar_si_fork()
+
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            crear = self._creadas < self.tamano
+            if crear:
+                self._creadas += 1
+
+        if crear:
+            try:
+                return mp_face_mesh.FaceMesh(**self.config)
+            except Exception:
+                with self._lock:
+                    self._creadas -= 1
+                raise
+
+        # Todas las instancias están ocupadas: esperar a que se libere una
+        return self._libres.get(timeout=timeout)
+
+    def _descartar(self, face_mesh):
+        try:
+            face_mesh.close()
+        finally:
+            with self._lock:
+                self._creadas -= 1
+
+    @contextmanager
+    def obtener(self, timeout=None):
+        """
+        Presta una instancia FaceMesh al hilo actual.
+        Si el procesamiento falla, la instancia se descarta en lugar de
+        devolverla al pool (su estado interno puede haber quedado corrupto).
+        """
+        face_mesh = self._tomar(timeout)
+        try:
+            yield face_mesh
+        except BaseException:
+            self._descartar(face_mesh)
+            raise
+        else:
+            self._libres.put(face_mesh)
+
+    def calentar(self, rgb):
+        """
+        Crea todas las instancias del pool (tomándolas a la vez) y pasa
+        `rgb` por cada una: grafo y modelos TFLite cargados en todas, no
+        solo en la primera. Devuelve cuántas detectaron el rostro.
+        """
+        with ExitStack() as prestadas:
+            instancias = [prestadas.enter_context(self.obtener()) for _ in range(self.tamano)]
+            return sum(bool(face_mesh.process(rgb).multi_face_landmarks) for face_mesh in instancias)
+
+    def cerrar(self):
+        """Cierra todas las instancias libres del pool."""
+        while True:
+            try:
+                face_mesh = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            self._descartar(face_mesh)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool():
+    """Devuelve el pool de FaceMesh del proceso (se crea en el primer uso)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = FaceMeshPool()
+    return _pool
+
+
+# ============================================================
+#  MODO TRACKING POR SESIÓN (video continuo)
+# ============================================================
+
+class EstadoSesion:
+    """
+    Estado de procesamiento de una sesión de monitoreo.
+    - Tracking: el FaceMesh usa static_image_mode=False, así que reutiliza
+      los landmarks del frame anterior en vez de volver a detectar el rostro.
+      Los frames de una misma sesión se procesan en serie (`lock`).
+    - ROI: recuerda el último rostro (bbox en píxeles del frame completo)
+      para procesar solo esa región en el siguiente frame.
+    - Dedup: guarda la miniatura y el resultado del último frame procesado
+      y cuántas veces seguidas se ha reutilizado.
+    Todo este estado se lee y escribe con `lock` tomado durante el frame
+    completo (ver _sesion_bloqueada).
+    """
+
+    def __init__(self, sesion_id, fin=None):
+        self.sesion_id = sesion_id
+        self.fin = fin
+        self.lock = threading.Lock()
+        self.ultimo_uso = time.monotonic()
+        self.cerrado = False
+        self._face_mesh = None
+
+        # Último rostro detectado: (x0, y0, x1, y1) y forma (h, w) del frame
+        self.bbox = None
+        self.tamano_frame = None
+
+        # Última pose estimada (vectores de solvePnP) para guiar la siguiente
+        self.pose = None
+
+        # Último frame procesado por completo: miniatura y resultado
+        self.miniatura = None
+        self.ultimo_resultado = None
+        self.racha = 0
+
+    @property
+    def face_mesh(self):
+        if self._face_mesh is None:
+            self._face_mesh = mp_face_mesh.FaceMesh(
+                **{**FACE_MESH_CONFIG, "static_image_mode": False}
+            )
+        return self._face_mesh
+
+    def finalizada(self):
+        if self.fin is None:
+            return False
+        return datetime.now(self.fin.tzinfo) > self.fin
+
+    def recordar_rostro(self, puntos, tamano_frame):
+        x0, y0 = puntos.min(axis=0)
+        x1, y1 = puntos.max(axis=0)
+        self.bbox = (float(x0), float(y0), float(x1), float(y1))
+        self.tamano_frame = tuple(tamano_frame[:2])
+
+    def olvidar_rostro(self):
+        self.bbox = None
+        self.pose = None
+
+    def factor_reduccion(self, min_rostro=ROI_MIN_ROSTRO):
+        """Mayor factor (4, 2 o 1) que deja el rostro con al menos `min_rostro` px."""
+        x0, y0, x1, y1 = self.bbox
+        lado = min(x1 - x0, y1 - y0)
+        for factor in (4, 2):
+            if lado / factor >= min_rostro:
+                return factor
+        return 1
+
+    def region(self, factor, forma, margen=ROI_MARGEN):
+        """
+        Región (x0, y0, x1, y1) alrededor del último rostro, con margen,
+        en coordenadas de la imagen decodificada con `factor`.
+        """
+        x0, y0, x1, y1 = self.bbox
+        mx, my = (x1 - x0) * margen, (y1 - y0) * margen
+        h, w = forma[:2]
+        return (
+            max(0, int((x0 - mx) / factor)),
+            max(0, int((y0 - my) / factor)),
+            min(w, int(np.ceil((x1 + mx) / factor))),
+            min(h, int(np.ceil((y1 + my) / factor))),
+        )
+
+    def frame_repetido(self, miniatura, umbral=DEDUP_UMBRAL, max_racha=DEDUP_MAX_RACHA):
+        """
+        True si `miniatura` casi no difiere de la del último frame procesado
+        y aún no se alcanzó la racha máxima de reusos.
+        """
+        if self.miniatura is None or self.ultimo_resultado is None:
+            return False
+        if self.racha >= max_racha:
+            return False
+        diferencia = cv2.norm(miniatura, self.miniatura, cv2.NORM_L1) / miniatura.size
+        return diferencia <= umbral
+
+    def recordar_resultado(self, miniatura, resultado):
+        self.miniatura = miniatura
+        self.ultimo_resultado = resultado
+        self.racha = 0
+
+    def cerrar(self):
+        with self.lock:
+            self.cerrado = True
+            if self._face_mesh is not None:
+                self._face_mesh.close()
+                self._face_mesh = None
+
+
+class RegistroSesiones:
+    """
+    LRU acotado de `EstadoSesion` indexado por id de sesión.
+    Expulsa las sesiones inactivas más de `inactividad` segundos, las que
+    ya pasaron su `fin` y, si se supera `max_sesiones`, la menos reciente.
+    """
+
+    def __init__(self, max_sesiones=TRACKING_MAX_SESIONES, inactividad=TRACKING_INACTIVIDAD):
+        self.max_sesiones = max(1, int(max_sesiones))
+        self.inactividad = inactividad
+        self._estados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._estados)
+
+    def __contains__(self, sesion_id):
+        return sesion_id in self._estados
+
+    def obtener(self, sesion_id, fin=None):
+        """
+        Devuelve (o crea) el estado de la sesión y lo marca como usado.
+        Devuelve None si la sesión ya pasó su `fin`: no se crea un estado
+        (y un FaceMesh en modo video) que la próxima purga cerraría; sus
+        frames se procesan sin estado, con el pool compartido.
+        """
+        with self._lock:
+            expulsados = self._purgar_locked()
+
+            estado = self._estados.get(sesion_id)
+            if estado is None:
+                estado = EstadoSesion(sesion_id, fin)
+                if estado.finalizada():
+                    estado = None
+                else:
+                    self._estados[sesion_id] = estado
+            else:
+                self._estados.move_to_end(sesion_id)
+                if fin is not None:
+                    estado.fin = fin
+            if estado is not None:
+                estado.ultimo_uso = time.monotonic()
+
+            while len(self._estados) > self.max_sesiones:
+                expulsados.append(self._estados.popitem(last=False)[1])
+
+        for viejo in expulsados:
+            viejo.cerrar()
+        return estado
+
+    def descartar(self, sesion_id):
+        """Libera el estado de una sesión (p. ej. al cerrarla)."""
+        with self._lock:
+            estado = self._estados.pop(sesion_id, None)
+        if estado is not None:
+            estado.cerrar()
+
+    def purgar(self):
+        with self._lock:
+            expulsados = self._purgar_locked()
+        for viejo in expulsados:
+            viejo.cerrar()
+
+    def _purgar_locked(self):
+        limite = time.monotonic() - self.inactividad
+        expulsados = []
+        for sesion_id, estado in list(self._estados.items()):
+            if estado.ultimo_uso < limite or estado.finalizada():
+                expulsados.append(self._estados.pop(sesion_id))
+        return expulsados
+
+
+_registro_sesiones = RegistroSesiones()
+
+
+def obtener_registro_sesiones():
+    return _registro_sesiones
+
+
+def finalizar_sesion(sesion_id):
+    """Libera los recursos de tracking asociados a una sesión."""
+    _registro_sesiones.descartar(sesion_id)
+
+
+# ============================================================
+#  OMISIÓN DE FRAMES CASI IDÉNTICOS (métricas)
+# ============================================================
+
+class MetricasDedup:
+    """
+    Contadores del proceso para la omisión de frames repetidos.
+    El tiempo ahorrado se estima como (frames reutilizados × tiempo medio
+    de una pasada completa) menos lo que cuesta el detector de cambios.
+    Cada `intervalo` segundos (si hubo frames) el resumen acumulado se
+    escribe en el log del proceso.
+    """
+
+    def __init__(self, intervalo=DEDUP_RESUMEN):
+        self._lock = threading.Lock()
+        self.intervalo = intervalo
+        self._ultimo_resumen = time.monotonic()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.frames = 0
+            self.reutilizados = 0
+            self.segundos_pasada = 0.0
+            self.segundos_detector = 0.0
+
+    def registrar(self, reutilizado, segundos_detector, segundos_pasada=0.0):
+        ahora = time.monotonic()
+        with self._lock:
+            self.frames += 1
+            self.reutilizados += int(reutilizado)
+            self.segundos_detector += segundos_detector
+            self.segundos_pasada += segundos_pasada
+
+            toca_resumen = self.intervalo > 0 and ahora - self._ultimo_resumen >= self.intervalo
+            if toca_resumen:
+                self._ultimo_resumen = ahora
+
+        if toca_resumen:
+            self.registrar_en_log()
+
+    def registrar_en_log(self):
+        resumen = self.resumen()
+        logger.info(
+            "Frames repetidos: %d de %d reutilizados (%.1f%%), pasada media %.1f ms, "
+            "detector %.2f ms por frame, %.1f s ahorrados.",
+            resumen["reutilizados"], resumen["frames"], resumen["ratio_omitidos"] * 100.0,
+            resumen["ms_pasada_media"], resumen["ms_detector_medio"], resumen["segundos_ahorrados"],
+        )
+
+    def resumen(self):
+        with self._lock:
+            procesados = self.frames - self.reutilizados
+            pasada_media = self.segundos_pasada / procesados if procesados else 0.0
+            return {
+                "frames": self.frames,
+                "reutilizados": self.reutilizados,
+                "ratio_omitidos": self.reutilizados / self.frames if self.frames else 0.0,
+                "ms_pasada_media": pasada_media * 1000.0,
+                "ms_detector_medio": (
+                    self.segundos_detector / self.frames * 1000.0 if self.frames else 0.0
+                ),
+                "segundos_ahorrados": self.reutilizados * pasada_media - self.segundos_detector,
+            }
+
+
+metricas_dedup = MetricasDedup()
+
+
+def miniatura_gris(datos):
+    """
+    Miniatura en escala de grises (DEDUP_MINIATURA x DEDUP_MINIATURA) de un
+    JPEG/PNG/WebP. La decodificación a 1/8 evita casi todo el trabajo del
+    decodificador JPEG; devuelve None si la imagen no se puede decodificar.
+    """
+    gris = cv2.imdecode(np.frombuffer(datos, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if gris is None:
+        return None
+    return cv2.resize(gris, (DEDUP_MINIATURA, DEDUP_MINIATURA), interpolation=cv2.INTER_AREA)
+
+
+# ============================================================
+#  ROSTRO SINTÉTICO (calentamiento y benchmarks)
+# ============================================================
+
+def cara_sintetica(w=640, h=480, desplazamiento=(0, 0), giro=0):
+    """
+    Frame BGR con un rostro dibujado (óvalo, ojos, cejas, nariz y boca) que
+    FaceMesh detecta, para ejercitar el camino completo (landmarks, EAR/MAR,
+    head pose) sin incluir fotos en el repositorio. `desplazamiento` mueve
+    el rostro y `giro` los rasgos (en píxeles de un frame de 480 de alto).
+    """
+    imagen = np.full((h, w, 3), 200, dtype=np.uint8)
+    s = h / 480.0
+    cx, cy = w / 2 + desplazamiento[0] * s, h / 2 + desplazamiento[1] * s
+
+    def punto(x, y):
+        return int(cx + x * s), int(cy + y * s)
+
+    def ejes(a, b):
+        return int(a * s), int(b * s)
+
+    grosor = max(1, int(5 * s))
+    cv2.ellipse(imagen, punto(0, 0), ejes(110, 145), 0, 0, 360, (140, 170, 215), -1)
+    cv2.ellipse(imagen, punto(0, -150), ejes(115, 50), 0, 180, 360, (40, 40, 60), -1)
+    for x in (giro - 45, giro + 45):
+        cv2.ellipse(imagen, punto(x, -30), ejes(24, 12), 0, 0, 360, (255, 255, 255), -1)
+        cv2.circle(imagen, punto(x, -30), int(9 * s), (60, 40, 30), -1)
+        cv2.line(imagen, punto(x - 28, -58), punto(x + 28, -60), (50, 50, 70), grosor)
+    cv2.line(imagen, punto(giro, -20), punto(giro - 10, 30), (100, 120, 170), grosor)
+    cv2.ellipse(imagen, punto(giro, 70), ejes(45, 16), 0, 0, 360, (70, 70, 170), -1)
+    return cv2.GaussianBlur(imagen, (5, 5), 0)
+
 
 # ============================================================
 #  UTILIDADES
@@ -21,83 +523,117 @@ def distancia(a, b):
     return np.linalg.norm(a - b)
 
 
-# ============================================================
-#  EAR
-# ============================================================
+def landmarks_a_array(landmarks, w, h):
+    """
+    Convierte los landmarks normalizados de MediaPipe en un único arreglo
+    contiguo (N, 2) con coordenadas en píxeles.
+    """
+    n = len(landmarks)
+    puntos = np.fromiter(
+        (c for p in landmarks for c in (p.x, p.y)), dtype=np.float64, count=2 * n
+    ).reshape(n, 2)
+    puntos *= (w, h)
+    return puntos
 
-def calcular_EAR(landmarks):
-    ojo_izq = np.array([landmarks[i] for i in LEFT_EYE])
-    ojo_der = np.array([landmarks[i] for i in RIGHT_EYE])
 
-    ear_izq = (distancia(ojo_izq[1], ojo_izq[5]) + distancia(ojo_izq[2], ojo_izq[4])) / \
-              (2 * distancia(ojo_izq[0], ojo_izq[3]))
+def _como_array(landmarks):
+    # Acepta tanto el arreglo (N, 2) como la lista de puntos antigua
+    return np.asarray(landmarks, dtype=np.float64)
 
-    ear_der = (distancia(ojo_der[1], ojo_der[5]) + distancia(ojo_der[2], ojo_der[4])) / \
-              (2 * distancia(ojo_der[0], ojo_der[3]))
 
-    return (ear_izq + ear_der) / 2
+def _distancias_pares(puntos, pares):
+    # Producto punto por fila con matmul: mismo redondeo que np.linalg.norm
+    # sobre cada vector, así los resultados coinciden bit a bit con `distancia`
+    diff = puntos[pares[:, 0]] - puntos[pares[:, 1]]
+    return np.sqrt(np.matmul(diff[:, None, :], diff[:, :, None]).ravel())
 
 
 # ============================================================
-#  MAR
+#  EAR / MAR (vectorizados)
 # ============================================================
 
-def calcular_MAR(landmarks):
-    arriba = landmarks[13]
-    abajo = landmarks[14]
-    izquierda = landmarks[78]
-    derecha = landmarks[308]
+def calcular_EAR_MAR(landmarks):
+    """
+    Calcula EAR y MAR con una sola indexación de los 8 pares de puntos.
+    """
+    d = _distancias_pares(_como_array(landmarks), PARES_EAR_MAR)
+
+    ear_izq = (d[0] + d[1]) / (2 * d[2])
+    ear_der = (d[3] + d[4]) / (2 * d[5])
+    mar = d[6] / d[7]
+
+    return (ear_izq + ear_der) / 2, mar
 
-    mar = distancia(arriba, abajo) / distancia(izquierda, derecha)
-    return mar
+
+def calcular_EAR(landmarks):
+    return calcular_EAR_MAR(landmarks)[0]
+
+
+def calcular_MAR(landmarks):
+    return calcular_EAR_MAR(landmarks)[1]
 
 
 # ============================================================
 #  HEAD POSE — versión robusta, NO CRASHEA
 # ============================================================
 
-def calcular_head_pose(landmarks, img_shape):
+@lru_cache(maxsize=16)
+def matriz_camara(w, h):
+    """Matriz intrínseca aproximada (focal = ancho) por resolución de frame."""
+    matriz = np.array([
+        [w, 0, w / 2],
+        [0, w, h / 2],
+        [0, 0, 1]
+    ], dtype=np.float64)
+    # Compartida entre llamadas: se protege contra modificaciones
+    matriz.setflags(write=False)
+    return matriz
+
+
+def calcular_head_pose(landmarks, img_shape, estado=None):
+    """
+    Estima (pitch, yaw, roll) en grados con solvePnP.
+    Si se pasa el `estado` de la sesión con una pose previa, solvePnP parte
+    de ella (useExtrinsicGuess) en lugar de iniciar desde cero; la pose
+    obtenida se guarda para el frame siguiente.
+    """
     try:
         h, w = img_shape[:2]
 
-        puntos_2d = np.array([
-            landmarks[1],
-            landmarks[33],
-            landmarks[263],
-            landmarks[61],
-            landmarks[291],
-            landmarks[199]
-        ], dtype=np.float64)
-
-        puntos_3d = np.array([
-            [0.0, 0.0, 0.0],
-            [-30.0, -125.0, -30.0],
-            [30.0, -125.0, -30.0],
-            [-70.0, -70.0, -50.0],
-            [70.0, -70.0, -50.0],
-            [0.0, -150.0, -10.0]
-        ], dtype=np.float64)
-
-        focal_length = w
-        cam_matrix = np.array([
-            [focal_length, 0, w / 2],
-            [0, focal_length, h / 2],
-            [0, 0, 1]
-        ])
-
-        dist = np.zeros((4, 1))
-
-        ok, rot_vec, trans_vec = cv2.solvePnP(
-            puntos_3d,
-            puntos_2d,
-            cam_matrix,
-            dist,
-            flags=cv2.SOLVEPNP_ITERATIVE
-        )
+        puntos_2d = _como_array(landmarks)[HEAD_POSE_IDX]
+        cam_matrix = matriz_camara(w, h)
+
+        pose_previa = estado.pose if estado is not None else None
+        if pose_previa is not None:
+            # Copias: solvePnP escribe el resultado sobre los vectores guía
+            rot_guia, trans_guia = (v.copy() for v in pose_previa)
+            ok, rot_vec, trans_vec = cv2.solvePnP(
+                PUNTOS_3D_HEAD_POSE,
+                puntos_2d,
+                cam_matrix,
+                DISTORSION,
+                rot_guia,
+                trans_guia,
+                useExtrinsicGuess=True,
+                flags=cv2.SOLVEPNP_ITERATIVE
+            )
+        else:
+            ok, rot_vec, trans_vec = cv2.solvePnP(
+                PUNTOS_3D_HEAD_POSE,
+                puntos_2d,
+                cam_matrix,
+                DISTORSION,
+                flags=cv2.SOLVEPNP_ITERATIVE
+            )
 
         if not ok:
+            if estado is not None:
+                estado.pose = None
             return None, None, None
 
+        if estado is not None:
+            estado.pose = (rot_vec, trans_vec)
+
         rot_mat, _ = cv2.Rodrigues(rot_vec)
         angles = cv2.RQDecomp3x3(rot_mat)[0]
 
@@ -106,6 +642,9 @@ def calcular_head_pose(landmarks, img_shape):
 
     except Exception:
         # Si falta algún punto o solvePnP falla, devolvemos None
+        # (y el siguiente frame vuelve a resolver sin guía)
+        if estado is not None:
+            estado.pose = None
         return None, None, None
 
 
@@ -113,7 +652,87 @@ def calcular_head_pose(landmarks, img_shape):
 #  CORE: PROCESAR FRAME NUMPY (uso interno)
 # ============================================================
 
-def _procesar_frame_numpy(frame):
+def _estado_sesion(sesion_id, fin=None):
+    # El estado por sesión solo se mantiene si algún modo lo necesita
+    # (None también para sesiones que ya pasaron su `fin`)
+    if sesion_id is None or not (TRACKING_ACTIVO or ROI_ACTIVO or DEDUP_ACTIVO or HEAD_POSE_GUIADA):
+        return None
+    return _registro_sesiones.obtener(sesion_id, fin)
+
+
+@contextmanager
+def _sesion_bloqueada(sesion_id, fin=None):
+    """
+    Estado de la sesión con su `lock` tomado durante todo el frame: dos
+    frames de la misma sesión (pool del WebSocket, cola asíncrona) no se
+    pisan el tracking, la ROI, el dedup ni la pose guiada. Da None si no
+    hay estado o si la sesión se expulsó antes de tomar el lock (el frame
+    se procesa sin estado).
+    """
+    estado = _estado_sesion(sesion_id, fin)
+    if estado is None:
+        yield None
+        return
+    with estado.lock:
+        yield None if estado.cerrado else estado
+
+
+def _detectar_landmarks(rgb, estado=None):
+    """
+    Ejecuta FaceMesh sobre una imagen RGB.
+    Con tracking activo y el estado de la sesión (lock ya tomado) usa el
+    FaceMesh en modo video de esa sesión; en otro caso, una instancia del
+    pool.
+    """
+    if TRACKING_ACTIVO and estado is not None:
+        return estado.face_mesh.process(rgb)
+
+    # Instancia FaceMesh reutilizada del pool (no se construye por frame)
+    with obtener_pool().obtener() as face_mesh:
+        return face_mesh.process(rgb)
+
+
+def _extraer_puntos(frame, estado=None, origen=None, escala=1):
+    """
+    Landmarks del rostro como arreglo (N, 2) o None si no hay rostro.
+    Si `frame` es un recorte de una imagen reducida, `origen` (esquina del
+    recorte) y `escala` (factor de reducción) llevan los puntos de vuelta a
+    píxeles del frame completo.
+    """
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    results = _detectar_landmarks(rgb, estado)
+
+    if not results.multi_face_landmarks:
+        return None
+
+    h, w = frame.shape[:2]
+    lm = results.multi_face_landmarks[0]
+
+    # Convertir landmarks a coordenadas reales: arreglo (N, 2) en una pasada
+    puntos = landmarks_a_array(lm.landmark, w, h)
+    if origen is not None:
+        puntos += origen
+    if escala != 1:
+        puntos *= escala
+    return puntos
+
+
+def _calcular_features(puntos, img_shape, estado=None):
+    # EAR y MAR
+    ear, mar = calcular_EAR_MAR(puntos)
+
+    # Head Pose (guiada por la pose anterior de la sesión si está activo)
+    guia = estado if HEAD_POSE_GUIADA else None
+    pitch, yaw, roll = calcular_head_pose(puntos, img_shape, guia)
+    if pitch is None:
+        return None
+
+    # OJO: el orden debe coincidir con el CSV y el modelo:
+    # EAR, MAR, Yaw, Pitch, Roll
+    return ear, mar, yaw, pitch, roll
+
+
+def _procesar_frame_numpy(frame, sesion_id=None, fin=None):
     """
     Procesa un frame (numpy.ndarray).
     Retorna (ear, mar, yaw, pitch, roll) o None si falla.
@@ -121,54 +740,64 @@ def _procesar_frame_numpy(frame):
     if frame is None:
         return None
 
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    with _sesion_bloqueada(sesion_id, fin) as estado:
+        return _features_frame(frame, estado)
 
-    with mp_face_mesh.FaceMesh(
-        static_image_mode=True,
-        max_num_faces=1,
-        refine_landmarks=True,
-        min_detection_confidence=0.5
-    ) as face_mesh:
 
-        results = face_mesh.process(rgb)
+def _features_frame(frame, estado):
+    """Pasada completa sobre el frame decodificado (lock de `estado` tomado)."""
+    if frame is None:
+        return None
 
-        if not results.multi_face_landmarks:
-            return None
+    puntos = _extraer_puntos(frame, estado)
+    if puntos is None:
+        if estado is not None:
+            estado.olvidar_rostro()
+        return None
+
+    if estado is not None:
+        estado.recordar_rostro(puntos, frame.shape)
 
-        h, w = frame.shape[:2]
-        lm = results.multi_face_landmarks[0]
+    return _calcular_features(puntos, frame.shape, estado)
 
-        # Convertir landmarks a coordenadas reales
-        landmarks = []
-        for p in lm.landmark:
-            landmarks.append(np.array([p.x * w, p.y * h]))
 
-        # EAR
-        ear = calcular_EAR(landmarks)
+def _procesar_region_rostro(datos, estado):
+    """
+    Procesa solo la región del último rostro de la sesión: decodifica el
+    JPEG a resolución reducida (IMREAD_REDUCED_COLOR_2/4) si el rostro es
+    grande, recorta la región con margen y corre FaceMesh sobre el recorte.
+    Las features se calculan en coordenadas del frame completo, así que son
+    comparables con las de la pasada completa.
+    Retorna None si no encuentra el rostro (hay que hacer la pasada completa).
+    """
+    factor = estado.factor_reduccion()
+    imagen = cv2.imdecode(np.frombuffer(datos, np.uint8), DECODIFICACION_REDUCIDA[factor])
+    if imagen is None:
+        return None
 
-        # MAR
-        mar = calcular_MAR(landmarks)
+    x0, y0, x1, y1 = estado.region(factor, imagen.shape)
+    if x1 - x0 < 2 or y1 - y0 < 2:
+        return None
 
-        # Head Pose
-        pitch, yaw, roll = calcular_head_pose(landmarks, frame.shape)
-        if pitch is None:
-            return None
+    recorte = imagen[y0:y1, x0:x1]
+    puntos = _extraer_puntos(recorte, estado, origen=(x0, y0), escala=factor)
+    if puntos is None:
+        return None
 
-        # OJO: el orden debe coincidir con el CSV y el modelo:
-        # EAR, MAR, Yaw, Pitch, Roll
-        return ear, mar, yaw, pitch, roll
+    estado.recordar_rostro(puntos, estado.tamano_frame)
+    return _calcular_features(puntos, estado.tamano_frame, estado)
 
 
 # ============================================================
 #  API PARA ENTRENAMIENTO (si usas frames locales)
 # ============================================================
 
-def procesar_frame_numpy(frame):
+def procesar_frame_numpy(frame, sesion_id=None, fin=None):
     """
     Versión pública para usar con numpy.ndarray (entrenamiento offline).
     Retorna diccionario con claves: ear, mar, yaw, pitch, roll o None.
     """
-    resultado = _procesar_frame_numpy(frame)
+    resultado = _procesar_frame_numpy(frame, sesion_id, fin)
     if resultado is None:
         return None
 
@@ -183,12 +812,45 @@ def procesar_frame_numpy(frame):
 
 
 # ============================================================
-#  PROCESAMIENTO DESDE BASE64 (para frontend web)
+#  DECODIFICACIÓN (base64 o bytes crudos)
+# ============================================================
+
+def bytes_base64(imagen_base64):
+    """Decodifica un string base64 (con o sin prefijo data URL) a bytes."""
+    # imagen_base64 puede venir como "data:image/jpeg;base64,XXXX"
+    coma = imagen_base64.find(",")
+    if coma != -1:
+        imagen_base64 = imagen_base64[coma + 1:]
+    return base64.b64decode(imagen_base64)
+
+
+def decodificar_imagen(imagen):
+    """
+    Decodifica un frame JPEG/PNG/WebP a numpy.ndarray BGR.
+    `imagen` puede ser un string base64 (data URL) o un objeto bytes-like
+    (bytes, bytearray, memoryview). Los bytes crudos se pasan a
+    cv2.imdecode sin copiarlos (np.frombuffer comparte el buffer).
+    """
+    if isinstance(imagen, str):
+        imagen = bytes_base64(imagen)
+
+    np_img = np.frombuffer(imagen, np.uint8)
+    return cv2.imdecode(np_img, cv2.IMREAD_COLOR)
+
+
+# ============================================================
+#  PROCESAMIENTO DESDE EL NAVEGADOR (base64 o binario)
 # ============================================================
 
-def procesar_frame(imagen_base64):
+def procesar_frame(imagen, sesion_id=None, fin=None):
     """
-    Procesa un string base64 desde el navegador (uso en views.py).
+    Procesa un frame enviado desde el navegador (uso en views.py): un
+    string base64 ("data:image/jpeg;base64,...") o los bytes crudos del
+    JPEG/WebP (subida multipart o application/octet-stream).
+    Si se indica `sesion_id` y FACEMESH_TRACKING está activo, los frames
+    de la sesión se procesan en modo tracking hasta su `fin`; con
+    FACEMESH_DEDUP, un frame casi idéntico al último procesado de la sesión
+    reutiliza su resultado.
     Devuelve un diccionario:
     {
         "ear": ...,
@@ -200,15 +862,15 @@ def procesar_frame(imagen_base64):
     o None si falla.
     """
     try:
-        # imagen_base64 puede venir como "data:image/jpeg;base64,XXXX"
-        if "," in imagen_base64:
-            imagen_base64 = imagen_base64.split(",")[1]
+        if (ROI_ACTIVO or DEDUP_ACTIVO) and isinstance(imagen, str):
+            imagen = bytes_base64(imagen)
 
-        img_bytes = base64.b64decode(imagen_base64)
-        np_img = np.frombuffer(img_bytes, np.uint8)
-        frame = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
+        with _sesion_bloqueada(sesion_id, fin) as estado:
+            if DEDUP_ACTIVO and estado is not None:
+                resultado = _procesar_con_dedup(imagen, estado)
+            else:
+                resultado = _procesar_imagen(imagen, estado)
 
-        resultado = _procesar_frame_numpy(frame)
         if resultado is None:
             return None
 
@@ -226,6 +888,49 @@ def procesar_frame(imagen_base64):
         return None
 
 
+def _procesar_imagen(imagen, estado):
+    """Pasada completa del pipeline (con recorte ROI si está activo)."""
+    resultado = None
+
+    # Región del rostro anterior; si se pierde, pasada completa
+    if ROI_ACTIVO and estado is not None and estado.bbox is not None:
+        resultado = _procesar_region_rostro(imagen, estado)
+        if resultado is None:
+            estado.olvidar_rostro()
+
+    if resultado is None:
+        resultado = _features_frame(decodificar_imagen(imagen), estado)
+    return resultado
+
+
+def _procesar_con_dedup(datos, estado):
+    """
+    Reutiliza el resultado del último frame procesado de la sesión si el
+    nuevo frame es casi idéntico (miniatura en grises); si no, corre la
+    pasada completa y lo guarda como nueva referencia. La comparación es
+    siempre contra el último frame procesado, no contra el último recibido,
+    para que cambios lentos no se acumulen sin detectarse.
+    """
+    t0 = time.perf_counter()
+    miniatura = miniatura_gris(datos)
+    repetido = miniatura is not None and estado.frame_repetido(miniatura)
+    if repetido:
+        estado.racha += 1
+        resultado = estado.ultimo_resultado
+    t1 = time.perf_counter()
+
+    if repetido:
+        metricas_dedup.registrar(True, t1 - t0)
+        return resultado
+
+    resultado = _procesar_imagen(datos, estado)
+    metricas_dedup.registrar(False, t1 - t0, time.perf_counter() - t1)
+
+    if miniatura is not None:
+        estado.recordar_resultado(miniatura, resultado)
+    return resultado
+
+
 # Alias por compatibilidad si en algún lado antiguo se usa este nombre
 def procesar_frame_base64(imagen_base64):
     return procesar_frame(imagen_base64)
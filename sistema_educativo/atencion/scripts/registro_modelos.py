@@ -0,0 +1,282 @@
+"""
+Registro de versiones del modelo de atención.
+
+Estructura en disco (MODELO_ATENCION_DIR, por defecto atencion/scripts/modelos/):
+
+    modelos/
+        ACTIVO                     <- nombre de la versión activa
+        20261018-174500/
+            metadata.json          <- features, métricas, hash del dataset, fecha
+            bosque/                <- bosque plano, un .npy por arreglo (lo que se sirve)
+            modelo.pkl             <- RandomForest + scaler de scikit-learn (referencia)
+
+Cada versión se publica en un directorio temporal que se renombra al final,
+y el puntero ACTIVO se reemplaza con os.replace: ambos pasos son atómicos,
+así que un worker nunca ve una versión a medio escribir.
+
+Los workers cargan el modelo en el primer uso y revisan el puntero cada
+MODELO_ATENCION_REVISION segundos; si cambió, cargan la nueva versión y la
+intercambian sin reiniciar (la versión anterior sigue atendiendo hasta que
+la nueva está lista).
+
+El bosque plano se mapea en memoria (solo lectura): todos los workers del
+servidor comparten las mismas páginas físicas del modelo. Con
+`gunicorn --preload` el modelo se mapea una vez antes del fork.
+
+Si el registro está vacío se usa el modelo suelto antiguo
+(modelo_atencion_rf.npz / .pkl junto a este archivo) como versión "legacy".
+Los .npz (legacy o bosque.npz de versiones antiguas) se convierten al
+formato de directorio en la primera carga, para que también se mapeen.
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from atencion.scripts.bosque_plano import BosquePlano, guardar_bosque
+
+
+logger = logging.getLogger(__name__)
+
+
+DIRECTORIO_SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+
+MODELOS_DIR = os.environ.get("MODELO_ATENCION_DIR", os.path.join(DIRECTORIO_SCRIPTS, "modelos"))
+REVISION = float(os.environ.get("MODELO_ATENCION_REVISION", 5))  # segundos entre revisiones
+
+# Modelo suelto anterior al registro
+LEGACY_PKL = os.path.join(DIRECTORIO_SCRIPTS, "modelo_atencion_rf.pkl")
+LEGACY_NPZ = os.path.join(DIRECTORIO_SCRIPTS, "modelo_atencion_rf.npz")
+VERSION_LEGACY = "legacy"
+
+ARCHIVO_ACTIVO = "ACTIVO"
+ARCHIVO_METADATA = "metadata.json"
+ARCHIVO_BOSQUE = "bosque"
+ARCHIVO_BOSQUE_NPZ = "bosque.npz"  # versiones publicadas antes del formato mapeable
+ARCHIVO_PICKLE = "modelo.pkl"
+
+
+def hash_archivo(ruta):
+    """SHA-256 de un archivo (p. ej. el CSV de entrenamiento)."""
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def nueva_version():
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+
+# ============================================================
+#  MODELO CARGADO
+# ============================================================
+
+class ModeloAtencion:
+    """
+    Una versión del modelo lista para predecir.
+    `estimador` es un BosquePlano (scaler ya incorporado) o un
+    RandomForestClassifier de scikit-learn acompañado de su `scaler`.
+    """
+
+    def __init__(self, version, estimador, features, scaler=None, metadata=None):
+        self.version = version
+        self.estimador = estimador
+        self.features = list(features)
+        self.scaler = scaler
+        self.metadata = metadata or {}
+        self.clases = np.asarray(estimador.classes_)
+        # Columna de predict_proba que corresponde a la clase "atención" (1)
+        self.columna_atencion = list(self.clases).index(1)
+
+    def predecir_lote(self, matriz):
+        """
+        Clasifica una matriz (n, 5) con UNA pasada por los árboles.
+        Devuelve (niveles, prob_atencion), arreglos de largo n.
+        """
+        matriz = np.asarray(matriz, dtype=float).reshape(-1, len(self.features))
+        if len(matriz) == 0:
+            return np.empty(0, dtype=int), np.empty(0, dtype=float)
+
+        if self.scaler is not None:
+            matriz = self.scaler.transform(matriz)
+        probs = self.estimador.predict_proba(matriz)
+
+        # Misma regla que estimador.predict, sin volver a recorrer el bosque
+        niveles = self.clases.take(probs.argmax(axis=1)).astype(int)
+        return niveles, probs[:, self.columna_atencion]
+
+
+def _cargar_pickle(ruta, version, metadata=None):
+    with open(ruta, "rb") as f:
+        paquete = pickle.load(f)
+    return ModeloAtencion(
+        version, paquete["modelo"], paquete["features"], scaler=paquete["scaler"], metadata=metadata
+    )
+
+
+# ============================================================
+#  REGISTRO
+# ============================================================
+
+class RegistroModelos:
+    """Versiones publicadas en `directorio` y el puntero a la activa."""
+
+    def __init__(self, directorio=MODELOS_DIR):
+        self.directorio = directorio
+
+    def _ruta(self, *partes):
+        return os.path.join(self.directorio, *partes)
+
+    def versiones(self):
+        if not os.path.isdir(self.directorio):
+            return []
+        return sorted(
+            nombre for nombre in os.listdir(self.directorio)
+            if os.path.isfile(self._ruta(nombre, ARCHIVO_METADATA))
+        )
+
+    def version_activa(self):
+        """Versión apuntada por ACTIVO, "legacy" si hay un modelo suelto, o None."""
+        try:
+            with open(self._ruta(ARCHIVO_ACTIVO)) as f:
+                version = f.read().strip()
+            if version:
+                return version
+        except FileNotFoundError:
+            pass
+
+        if os.path.exists(LEGACY_NPZ) or os.path.exists(LEGACY_PKL):
+            return VERSION_LEGACY
+        return None
+
+    def rutas(self, version):
+        """(pickle, bosque plano) de una versión; pueden no existir."""
+        if version == VERSION_LEGACY:
+            return LEGACY_PKL, LEGACY_NPZ
+        return self._ruta(version, ARCHIVO_PICKLE), self._ruta(version, ARCHIVO_BOSQUE)
+
+    def metadata(self, version):
+        with open(self._ruta(version, ARCHIVO_METADATA)) as f:
+            return json.load(f)
+
+    def cargar(self, version):
+        """Carga una versión (prefiere el bosque plano al pickle)."""
+        ruta_pickle, ruta_bosque = self.rutas(version)
+        metadata = None if version == VERSION_LEGACY else self.metadata(version)
+
+        if not os.path.exists(ruta_bosque) and version != VERSION_LEGACY:
+            ruta_bosque = self._ruta(version, ARCHIVO_BOSQUE_NPZ)
+        if os.path.exists(ruta_bosque):
+            bosque = BosquePlano.cargar(ruta_bosque)
+            return ModeloAtencion(version, bosque, bosque.features, metadata=metadata)
+        return _cargar_pickle(ruta_pickle, version, metadata)
+
+    def publicar(self, arreglos, metadata, paquete_pickle=None, version=None, activar=False):
+        """
+        Publica una versión nueva: bosque plano + metadata (+ pickle de
+        scikit-learn opcional). Devuelve el nombre de la versión.
+        """
+        version = version or nueva_version()
+        destino = self._ruta(version)
+        if os.path.exists(destino):
+            raise FileExistsError(f"La versión {version} ya existe en el registro.")
+
+        os.makedirs(self.directorio, exist_ok=True)
+        temporal = tempfile.mkdtemp(prefix=f".{version}-", dir=self.directorio)
+        try:
+            # mkdtemp crea el directorio 0700: los workers deben poder leerlo
+            os.chmod(temporal, 0o755)
+            guardar_bosque(arreglos, os.path.join(temporal, ARCHIVO_BOSQUE))
+            if paquete_pickle is not None:
+                with open(os.path.join(temporal, ARCHIVO_PICKLE), "wb") as f:
+                    pickle.dump(paquete_pickle, f)
+
+            metadata = {**metadata, "version": version}
+            with open(os.path.join(temporal, ARCHIVO_METADATA), "w") as f:
+                json.dump(metadata, f, indent=2, ensure_ascii=False)
+
+            os.rename(temporal, destino)
+        except BaseException:
+            shutil.rmtree(temporal, ignore_errors=True)
+            raise
+
+        if activar:
+            self.activar(version)
+        return version
+
+    def activar(self, version):
+        """Cambia el puntero ACTIVO de forma atómica."""
+        if version not in self.versiones():
+            raise ValueError(f"La versión {version} no existe en el registro.")
+
+        descriptor, temporal = tempfile.mkstemp(prefix=".ACTIVO-", dir=self.directorio)
+        with os.fdopen(descriptor, "w") as f:
+            f.write(version + "\n")
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, self._ruta(ARCHIVO_ACTIVO))
+
+
+# ============================================================
+#  MODELO ACTIVO DEL PROCESO (carga diferida + recarga en caliente)
+# ============================================================
+
+class ModeloActivo:
+    """
+    Mantiene la versión activa cargada en el proceso. La primera llamada a
+    `obtener()` carga el modelo; luego, como mucho cada `revision` segundos,
+    se relee el puntero ACTIVO y, si cambió, se carga la nueva versión y se
+    intercambia la referencia (los hilos que ya tenían la anterior terminan
+    con ella).
+    """
+
+    def __init__(self, registro, revision=REVISION):
+        self.registro = registro
+        self.revision = revision
+        self._modelo = None
+        self._revisado = 0.0
+        self._lock = threading.Lock()
+
+    def obtener(self):
+        modelo = self._modelo
+        if modelo is not None and time.monotonic() - self._revisado < self.revision:
+            return modelo
+
+        with self._lock:
+            if self._modelo is None or time.monotonic() - self._revisado >= self.revision:
+                self._actualizar_locked()
+            return self._modelo
+
+    def _actualizar_locked(self):
+        version = self.registro.version_activa()
+        if version is None:
+            raise FileNotFoundError(
+                f"No hay modelo de atención activo en {self.registro.directorio} "
+                f"ni modelo suelto en {LEGACY_PKL}"
+            )
+
+        if self._modelo is None or self._modelo.version != version:
+            try:
+                nuevo = self.registro.cargar(version)
+            except Exception:
+                # Si la nueva versión no carga, se sigue con la anterior
+                if self._modelo is None:
+                    raise
+                logger.warning(
+                    "No se pudo cargar el modelo de atención %s; se mantiene %s.",
+                    version, self._modelo.version, exc_info=True,
+                )
+            else:
+                self._modelo = nuevo
+                logger.info("Modelo de atención %s cargado. Características: %s", version, nuevo.features)
+
+        self._revisado = time.monotonic()
@@ -0,0 +1,251 @@
+"""
+Lógica compartida del monitoreo de atención: extracción de métricas por
+frame, clasificación con Random Forest y registro en AtencionVisual.
+La usan el endpoint frame a frame, el endpoint por lotes, el canal
+WebSocket y la cola asíncrona.
+"""
+import base64
+import binascii
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from cursos.models import Curso
+
+from .agregados import agregador
+from .bloques import GUARDAR_BLOQUES, GUARDAR_FILAS, almacen_bloques
+from .escritura import buffer_escritura
+from .models import AtencionVisual
+
+# Procesamiento y modelo ML (se cargan en la primera llamada)
+from .motor import procesar_frame, clasificar, liberar_sesion
+
+
+MAX_FRAMES_LOTE = getattr(settings, "MONITOREO_MAX_FRAMES_LOTE", 60)
+
+MAX_BYTES_FRAME = getattr(settings, "MONITOREO_MAX_BYTES_FRAME", 2 * 1024 * 1024)
+
+# Tolerancia de los timestamps que envía el cliente (segundos): atraso
+# máximo de un frame acumulado en el navegador y desfase de reloj
+MAX_ATRASO_TIMESTAMP = getattr(settings, "MONITOREO_TIMESTAMP_ATRASO_MAX", 300)
+MAX_DESFASE_TIMESTAMP = getattr(settings, "MONITOREO_TIMESTAMP_DESFASE_MAX", 5)
+
+# Orden de columnas que espera el modelo
+COLUMNAS_METRICAS = ["ear", "mar", "yaw", "pitch", "roll"]
+
+# Rangos plausibles de las métricas calculadas en el navegador.
+# EAR/MAR fuera de estos límites indican landmarks mal detectados o datos
+# fabricados; los ángulos vienen en grados (RQDecomp3x3 / equivalente JS).
+RANGOS_METRICAS = {
+    "ear": (0.0, 1.0),
+    "mar": (0.0, 3.0),
+    "yaw": (-180.0, 180.0),
+    "pitch": (-180.0, 180.0),
+    "roll": (-180.0, 180.0),
+}
+
+# Cabeceras (magic bytes) de los formatos de imagen aceptados
+FIRMAS_IMAGEN = (b"\xff\xd8\xff", b"\x89PNG", b"RIFF")
+
+
+def validar_frame(frame):
+    """
+    Validación barata de un frame antes de encolarlo (sin decodificarlo):
+    tamaño y cabecera JPEG/PNG/WebP. Devuelve un mensaje de error o None.
+    """
+    if isinstance(frame, str):
+        datos = frame[frame.find(",") + 1:]
+        if len(datos) * 3 // 4 > MAX_BYTES_FRAME:
+            return f"El frame supera el máximo de {MAX_BYTES_FRAME} bytes."
+        try:
+            cabecera = base64.b64decode(datos[:16])
+        except (binascii.Error, ValueError):
+            return "El frame no es base64 válido."
+    else:
+        if len(frame) > MAX_BYTES_FRAME:
+            return f"El frame supera el máximo de {MAX_BYTES_FRAME} bytes."
+        cabecera = bytes(frame[:12])
+
+    if not cabecera.startswith(FIRMAS_IMAGEN):
+        return "Formato de imagen no soportado (JPEG, PNG o WebP)."
+    return None
+
+
+def validar_metricas(datos):
+    """
+    Valida las métricas extraídas en el navegador (modo sin frames).
+    Devuelve (metricas, None) con las 5 métricas como float, o
+    (None, mensaje) si faltan, no son números finitos o están fuera de
+    rango.
+    """
+    if not isinstance(datos, dict):
+        return None, "'metricas' debe ser un objeto con ear, mar, yaw, pitch y roll."
+
+    metricas = {}
+    for columna in COLUMNAS_METRICAS:
+        valor = datos.get(columna)
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+            return None, f"La métrica '{columna}' debe ser numérica."
+
+        valor = float(valor)
+        minimo, maximo = RANGOS_METRICAS[columna]
+        if not math.isfinite(valor) or not minimo <= valor <= maximo:
+            return None, f"La métrica '{columna}' está fuera de rango ({minimo}, {maximo})."
+        metricas[columna] = valor
+
+    return metricas, None
+
+
+def curso_requiere_frames(sesion):
+    """Política del curso de la sesión: si exige frames en vez de métricas."""
+    requiere = (
+        Curso.objects.filter(nivel__fase=sesion.fase_id)
+        .values_list("requiere_frames", flat=True)
+        .first()
+    )
+    return True if requiere is None else requiere
+
+
+def parsear_timestamp(valor):
+    """
+    Acepta ISO 8601 o epoch en milisegundos (Date.now() del navegador).
+    Devuelve un datetime aware o None si no se puede interpretar.
+    """
+    if valor in (None, ""):
+        return None
+
+    if isinstance(valor, bool):
+        return None
+    if isinstance(valor, (int, float)):
+        try:
+            return datetime.fromtimestamp(valor / 1000.0, tz=dt_timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+
+    fecha = parse_datetime(str(valor))
+    if fecha is not None and timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+def validar_timestamp(momento, sesion, ahora=None):
+    """
+    Timestamp enviado por el cliente: a lo sumo MAX_ATRASO_TIMESTAMP
+    segundos en el pasado, no en el futuro, y dentro de [inicio, fin] de
+    la sesión (ambos con MAX_DESFASE_TIMESTAMP de tolerancia de reloj).
+    Devuelve un mensaje de error o None.
+    """
+    ahora = ahora or timezone.now()
+    desfase = timedelta(seconds=MAX_DESFASE_TIMESTAMP)
+    desde = ahora - timedelta(seconds=MAX_ATRASO_TIMESTAMP)
+    hasta = ahora + desfase
+    if sesion.inicio is not None:
+        desde = max(desde, sesion.inicio - desfase)
+    if sesion.fin is not None:
+        hasta = min(hasta, sesion.fin + desfase)
+
+    if not desde <= momento <= hasta:
+        return "El timestamp está fuera de la ventana de la sesión."
+    return None
+
+
+def analizar_frames(sesion, frames):
+    """
+    Procesa una lista de frames de una sesión: extrae métricas de cada uno,
+    clasifica todos con UNA llamada al modelo (o un micro-lote compartido
+    con otras solicitudes concurrentes) y guarda los AtencionVisual
+    con UN bulk_create (o los deja en el buffer de escritura diferida,
+    escritura.py) y/o en el bloque columnar de la sesión (bloques.py,
+    según MONITOREO_ALMACENAMIENTO). Cada frame clasificado actualiza además los
+    agregados de la sesión (agregados.py).
+
+    `frames` es una lista de tuplas (imagen, timestamp). La imagen puede
+    ser también un dict de métricas ya validadas (validar_metricas) cuando
+    el navegador hizo la extracción: entonces no se decodifica ni se corre
+    FaceMesh, solo se clasifica y se guarda.
+    Devuelve una lista (mismo orden) con, por frame:
+        {"metricas": {...}, "score_atencion": ..., "estado_atencion": ...}
+    o {"error": "..."} si no se detectó rostro.
+    """
+    resultados = [None] * len(frames)
+    validos = []
+
+    for i, (imagen, momento) in enumerate(frames):
+        if isinstance(imagen, dict):
+            metricas = imagen
+        else:
+            metricas = procesar_frame(imagen, sesion_id=sesion.id, fin=sesion.fin)
+        if metricas is None:
+            resultados[i] = {"error": "No se detectó rostro."}
+            continue
+        validos.append((i, metricas, momento or timezone.now()))
+
+    if not validos:
+        return resultados
+
+    filas = [[metricas[c] for c in COLUMNAS_METRICAS] for _, metricas, _ in validos]
+    niveles, scores, version = clasificar(filas)
+
+    registros = []
+    for (i, metricas, momento), nivel, score in zip(validos, niveles, scores):
+        registros.append(
+            AtencionVisual(
+                sesion=sesion,
+                estudiante_id=sesion.estudiante_id,
+                recurso_id=sesion.recurso_id,
+                fase_id=sesion.fase_id,
+                nivel_atencion=nivel,
+                score_atencion=score,
+                modelo_version=version,
+                timestamp=momento,
+                **metricas,
+            )
+        )
+        resultados[i] = {
+            "metricas": metricas,
+            "score_atencion": score,
+            "estado_atencion": nivel,
+        }
+
+    if GUARDAR_FILAS:
+        buffer_escritura.agregar(registros)
+
+    for (_, metricas, momento), nivel, score in zip(validos, niveles, scores):
+        agregador.registrar(sesion.id, metricas, nivel, score, momento)
+        if GUARDAR_BLOQUES:
+            almacen_bloques.registrar(sesion.id, metricas, nivel, score, momento, version)
+
+    return resultados
+
+
+def analizar_frame_en_hilo(sesion, frame):
+    """
+    Versión de analizar_frames para un solo frame procesado fuera del
+    ciclo request/response (pool de hilos del WebSocket o de la cola):
+    cada hilo gestiona su propia conexión a la base de datos.
+    """
+    close_old_connections()
+    try:
+        return analizar_frames(sesion, [(frame, None)])[0]
+    finally:
+        close_old_connections()
+
+
+def guardar_pendientes_en_hilo(sesion_id):
+    """
+    Fin de la conexión de una sesión: escribe los registros diferidos, su
+    bloque columnar abierto y el volcado final de sus agregados, y libera
+    su estado de visión (FaceMesh en modo video), desde un hilo del pool.
+    """
+    close_old_connections()
+    try:
+        buffer_escritura.guardar()
+        almacen_bloques.cerrar(sesion_id)
+        agregador.cerrar(sesion_id)
+        liberar_sesion(sesion_id)
+    finally:
+        close_old_connections()
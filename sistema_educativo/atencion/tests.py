@@ -1,3 +1,1840 @@
-from django.test import TestCase
+import subprocess
+import sys
+from types import SimpleNamespace
 
-# Create your tests here.
+import cv2
+import numpy as np
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+
+from atencion.scripts import procesamiento_mediapipe as pm
+from atencion.servicios import validar_metricas
+
+
+def _landmarks_sinteticos(semilla, w=640, h=480):
+    """Landmarks normalizados (estilo MediaPipe) alrededor del centro de la imagen."""
+    rng = np.random.default_rng(semilla)
+    xy = np.clip(rng.normal(0.5, 0.12, (478, 2)), 0.0, 1.0)
+    return [SimpleNamespace(x=float(x), y=float(y)) for x, y in xy]
+
+
+class FeaturesVectorizadasTests(SimpleTestCase):
+    """
+    Las features calculadas sobre el arreglo (N, 2) deben coincidir con la
+    implementación original basada en una lista de puntos.
+    """
+
+    @staticmethod
+    def _lista_original(landmarks, w, h):
+        return [np.array([p.x * w, p.y * h]) for p in landmarks]
+
+    @staticmethod
+    def _ear_original(landmarks):
+        d = pm.distancia
+        izq = np.array([landmarks[i] for i in pm.LEFT_EYE])
+        der = np.array([landmarks[i] for i in pm.RIGHT_EYE])
+        ear_izq = (d(izq[1], izq[5]) + d(izq[2], izq[4])) / (2 * d(izq[0], izq[3]))
+        ear_der = (d(der[1], der[5]) + d(der[2], der[4])) / (2 * d(der[0], der[3]))
+        return (ear_izq + ear_der) / 2
+
+    @staticmethod
+    def _mar_original(landmarks):
+        d = pm.distancia
+        return d(landmarks[13], landmarks[14]) / d(landmarks[78], landmarks[308])
+
+    def test_landmarks_a_array(self):
+        landmarks = _landmarks_sinteticos(0)
+        puntos = pm.landmarks_a_array(landmarks, 640, 480)
+
+        self.assertEqual(puntos.shape, (478, 2))
+        np.testing.assert_array_equal(
+            puntos, np.array(self._lista_original(landmarks, 640, 480))
+        )
+
+    def test_ear_mar_identicos(self):
+        for semilla in range(50):
+            landmarks = _landmarks_sinteticos(semilla)
+            lista = self._lista_original(landmarks, 640, 480)
+            puntos = pm.landmarks_a_array(landmarks, 640, 480)
+
+            ear, mar = pm.calcular_EAR_MAR(puntos)
+            self.assertEqual(ear, self._ear_original(lista))
+            self.assertEqual(mar, self._mar_original(lista))
+            self.assertEqual(pm.calcular_EAR(lista), ear)
+            self.assertEqual(pm.calcular_MAR(lista), mar)
+
+    def test_head_pose_identico(self):
+        for semilla in range(10):
+            landmarks = _landmarks_sinteticos(semilla)
+            lista = self._lista_original(landmarks, 640, 480)
+            puntos = pm.landmarks_a_array(landmarks, 640, 480)
+
+            self.assertEqual(
+                pm.calcular_head_pose(puntos, (480, 640, 3)),
+                pm.calcular_head_pose(lista, (480, 640, 3)),
+            )
+
+
+class HeadPoseGuiadaTests(SimpleTestCase):
+    """
+    Matriz de cámara cacheada por resolución y arranque guiado de solvePnP
+    (useExtrinsicGuess) a partir de la pose del frame anterior.
+    """
+
+    @staticmethod
+    def _puntos(pitch, yaw, roll, w=640, h=480):
+        """Landmarks (478, 2) con los puntos de head pose proyectados desde una pose conocida."""
+        rot_vec = np.radians([pitch, yaw, roll]).reshape(3, 1)
+        trans_vec = np.array([[0.0], [0.0], [600.0]])
+        proyectados, _ = cv2.projectPoints(
+            pm.PUNTOS_3D_HEAD_POSE, rot_vec, trans_vec, pm.matriz_camara(w, h), pm.DISTORSION
+        )
+        puntos = np.full((478, 2), [w / 2, h / 2])
+        puntos[pm.HEAD_POSE_IDX] = proyectados.reshape(-1, 2)
+        return puntos
+
+    @staticmethod
+    def _espiar_solvepnp():
+        from unittest import mock
+
+        return mock.patch.object(pm.cv2, "solvePnP", wraps=cv2.solvePnP)
+
+    def test_matriz_por_resolucion(self):
+        pm.matriz_camara.cache_clear()
+        for _ in range(2):
+            pm.calcular_head_pose(self._puntos(5, 0, 0), (480, 640, 3))
+            pm.calcular_head_pose(self._puntos(5, 0, 0, 1280, 720), (720, 1280, 3))
+
+        info = pm.matriz_camara.cache_info()
+        self.assertEqual(info.currsize, 2)
+        self.assertIs(pm.matriz_camara(640, 480), pm.matriz_camara(640, 480))
+
+        chica, grande = pm.matriz_camara(640, 480), pm.matriz_camara(1280, 720)
+        np.testing.assert_array_equal(chica, [[640, 0, 320], [0, 640, 240], [0, 0, 1]])
+        np.testing.assert_array_equal(grande, [[1280, 0, 640], [0, 1280, 360], [0, 0, 1]])
+        # Compartida entre llamadas: no se puede modificar
+        with self.assertRaises(ValueError):
+            chica[0, 0] = 1
+
+    def test_guiada_igual_a_resolver_desde_cero(self):
+        estado = pm.EstadoSesion("s")
+        with self._espiar_solvepnp() as solve:
+            for i in range(10):
+                puntos = self._puntos(5 + i, -10 + 2 * i, 3 - i / 2)
+                guiada = pm.calcular_head_pose(puntos, (480, 640, 3), estado)
+                desde_cero = pm.calcular_head_pose(puntos, (480, 640, 3))
+
+                np.testing.assert_allclose(guiada, desde_cero, atol=1e-3)
+                self.assertIsNotNone(estado.pose)
+
+        # Solo la primera llamada con estado resolvió sin guía
+        guiadas = [c.kwargs.get("useExtrinsicGuess", False) for c in solve.call_args_list]
+        self.assertEqual(guiadas[0::2], [False] + [True] * 9)
+        self.assertEqual(guiadas[1::2], [False] * 10)
+
+    def test_guia_se_reinicia_tras_fallo(self):
+        from unittest import mock
+
+        estado = pm.EstadoSesion("s")
+        pm.calcular_head_pose(self._puntos(5, 0, 0), (480, 640, 3), estado)
+        self.assertIsNotNone(estado.pose)
+
+        # solvePnP sin solución
+        with mock.patch.object(pm.cv2, "solvePnP", return_value=(False, None, None)):
+            self.assertEqual(
+                pm.calcular_head_pose(self._puntos(6, 0, 0), (480, 640, 3), estado),
+                (None, None, None),
+            )
+        self.assertIsNone(estado.pose)
+
+        # Excepción dentro de solvePnP
+        pm.calcular_head_pose(self._puntos(5, 0, 0), (480, 640, 3), estado)
+        with mock.patch.object(pm.cv2, "solvePnP", side_effect=cv2.error("fallo")):
+            pm.calcular_head_pose(self._puntos(6, 0, 0), (480, 640, 3), estado)
+        self.assertIsNone(estado.pose)
+
+        with self._espiar_solvepnp() as solve:
+            pose = pm.calcular_head_pose(self._puntos(7, 0, 0), (480, 640, 3), estado)
+        self.assertNotIn("useExtrinsicGuess", solve.call_args.kwargs)
+        np.testing.assert_allclose(pose, (7, 0, 0), atol=0.1)
+
+    def test_guia_se_reinicia_con_sesion_nueva(self):
+        registro = pm.RegistroSesiones()
+        estado = registro.obtener("s")
+        pm.calcular_head_pose(self._puntos(5, 0, 0), (480, 640, 3), estado)
+        self.assertIsNotNone(estado.pose)
+
+        # Sin rostro en el frame se olvida también la pose
+        estado.olvidar_rostro()
+        self.assertIsNone(estado.pose)
+
+        pm.calcular_head_pose(self._puntos(5, 0, 0), (480, 640, 3), estado)
+        registro.descartar("s")
+        nuevo = registro.obtener("s")
+        self.assertIsNot(nuevo, estado)
+        self.assertIsNone(nuevo.pose)
+
+        with self._espiar_solvepnp() as solve:
+            pm.calcular_head_pose(self._puntos(5, 0, 0), (480, 640, 3), nuevo)
+        self.assertNotIn("useExtrinsicGuess", solve.call_args.kwargs)
+        nuevo.cerrar()
+
+
+class FramesRepetidosTests(SimpleTestCase):
+    """Reutilización del resultado anterior para frames casi idénticos."""
+
+    def setUp(self):
+        self.estado = pm.EstadoSesion("test")
+        self.miniatura = np.full((32, 32), 100, dtype=np.uint8)
+        self.estado.recordar_resultado(self.miniatura, (0.3, 0.1, 0.0, 0.0, 0.0))
+
+    def test_umbral(self):
+        self.assertTrue(self.estado.frame_repetido(self.miniatura + 1, umbral=2.0))
+        self.assertFalse(self.estado.frame_repetido(self.miniatura + 5, umbral=2.0))
+
+    def test_racha_maxima(self):
+        self.estado.racha = 3
+        self.assertFalse(self.estado.frame_repetido(self.miniatura, max_racha=3))
+
+    def test_sin_resultado_previo(self):
+        self.estado.recordar_resultado(self.miniatura, None)
+        self.assertFalse(self.estado.frame_repetido(self.miniatura))
+
+    def test_resumen_periodico_en_log(self):
+        from unittest import mock
+
+        metricas = pm.MetricasDedup(intervalo=60)
+        with mock.patch.object(pm.time, "monotonic", return_value=metricas._ultimo_resumen + 30), \
+                self.assertNoLogs("atencion.scripts.procesamiento_mediapipe", "INFO"):
+            metricas.registrar(False, 0.001, 0.02)
+            metricas.registrar(True, 0.001)
+
+        with mock.patch.object(pm.time, "monotonic", return_value=metricas._ultimo_resumen + 61), \
+                self.assertLogs("atencion.scripts.procesamiento_mediapipe", "INFO") as registros:
+            metricas.registrar(True, 0.001)
+            # Hasta el siguiente intervalo no se repite
+            metricas.registrar(True, 0.001)
+        self.assertEqual(len(registros.output), 1)
+        self.assertIn("2 de 3 reutilizados (66.7%)", registros.output[0])
+
+        with mock.patch.object(pm.time, "monotonic", return_value=1e9), \
+                self.assertNoLogs("atencion.scripts.procesamiento_mediapipe", "INFO"):
+            pm.MetricasDedup(intervalo=0).registrar(True, 0.001)
+
+
+class RegistroSesionesTests(SimpleTestCase):
+    """Estado de tracking por sesión: LRU acotado y sesiones vencidas."""
+
+    def test_sesion_vencida_no_se_recrea(self):
+        from datetime import datetime, timedelta, timezone
+
+        registro = pm.RegistroSesiones(max_sesiones=4)
+        pasado = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+        for _ in range(3):
+            self.assertIsNone(registro.obtener("vencida", fin=pasado))
+        self.assertNotIn("vencida", registro)
+
+    def test_vencida_se_expulsa_y_no_vuelve(self):
+        from datetime import datetime, timedelta, timezone
+
+        registro = pm.RegistroSesiones(max_sesiones=4)
+        estado = registro.obtener("s", fin=datetime.now(timezone.utc) + timedelta(hours=1))
+        estado.fin = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+        self.assertIsNone(registro.obtener("s", fin=estado.fin))
+        self.assertTrue(estado.cerrado)
+        self.assertEqual(len(registro), 0)
+
+    def test_pipeline_completo_bajo_lock_de_sesion(self):
+        from unittest import mock
+
+        vistos = []
+
+        def pasada(imagen, estado):
+            vistos.append(estado is not None and estado.lock.locked())
+            return (0.3, 0.1, 0.0, 0.0, 0.0)
+
+        with mock.patch.object(pm, "ROI_ACTIVO", True), \
+                mock.patch.object(pm, "_procesar_imagen", pasada), \
+                mock.patch.object(pm, "_registro_sesiones", pm.RegistroSesiones()):
+            self.assertIsNotNone(pm.procesar_frame(b"jpeg", sesion_id="s"))
+            # Expulsada antes de tomar el lock: el frame va sin estado
+            pm._registro_sesiones.obtener("s").cerrar()
+            self.assertIsNotNone(pm.procesar_frame(b"jpeg", sesion_id="s"))
+
+        self.assertEqual(vistos, [True, False])
+
+
+class FaceMeshPoolTests(SimpleTestCase):
+    """Préstamo y devolución de instancias FaceMesh (sin cargar MediaPipe)."""
+
+    def setUp(self):
+        from unittest import mock
+
+        self.creadas = []
+
+        def crear(**config):
+            instancia = mock.Mock(name=f"face_mesh_{len(self.creadas)}")
+            self.creadas.append(instancia)
+            return instancia
+
+        parche = mock.patch.object(pm, "mp_face_mesh", SimpleNamespace(FaceMesh=crear))
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_reutiliza_la_instancia(self):
+        pool = pm.FaceMeshPool(tamano=2)
+        with pool.obtener() as primera:
+            pass
+        with pool.obtener() as segunda:
+            pass
+
+        self.assertIs(primera, segunda)
+        self.assertEqual(len(self.creadas), 1)
+        primera.close.assert_not_called()
+
+    def test_descarta_la_instancia_si_falla(self):
+        pool = pm.FaceMeshPool(tamano=1)
+        with self.assertRaises(RuntimeError):
+            with pool.obtener() as fallida:
+                raise RuntimeError("grafo corrupto")
+
+        fallida.close.assert_called_once_with()
+        # Con tamano=1, el cupo liberado permite crear una nueva sin esperar
+        with pool.obtener(timeout=0.1) as nueva:
+            pass
+
+        self.assertIsNot(nueva, fallida)
+        self.assertEqual(len(self.creadas), 2)
+
+    def test_creacion_fallida_no_consume_cupo(self):
+        from unittest import mock
+
+        pool = pm.FaceMeshPool(tamano=1)
+        with mock.patch.object(pm.mp_face_mesh, "FaceMesh", side_effect=OSError("sin modelo")):
+            with self.assertRaises(OSError):
+                with pool.obtener():
+                    pass
+
+        with pool.obtener(timeout=0.1):
+            pass
+        self.assertEqual(len(self.creadas), 1)
+
+
+class RecorteRostroTests(SimpleTestCase):
+    """
+    ROI (FACEMESH_ROI): recorte a resolución reducida, puntos devueltos a
+    coordenadas del frame completo y pasada completa si el recorte falla.
+    El FaceMesh es un stub que "detecta" el rectángulo blanco del frame.
+    """
+
+    FRACCIONES = np.linspace(0.0, 1.0, 5)
+
+    def setUp(self):
+        from unittest import mock
+
+        self.entradas = []  # (alto, ancho) de cada imagen pasada a FaceMesh
+        self.puntos = []  # puntos que llegan a EAR/MAR/head pose
+
+        def detectar(rgb, estado=None):
+            self.entradas.append(rgb.shape[:2])
+            ys, xs = np.nonzero(rgb[..., 0] > 128)
+            if not len(xs):
+                return SimpleNamespace(multi_face_landmarks=None)
+            # Extremos [min, max + 1): en píxeles del recorte, como los normaliza MediaPipe
+            x0, y0, x1, y1 = xs.min(), ys.min(), xs.max() + 1, ys.max() + 1
+            h, w = rgb.shape[:2]
+            landmark = [
+                SimpleNamespace(x=(x0 + fx * (x1 - x0)) / w, y=(y0 + fy * (y1 - y0)) / h)
+                for fy in self.FRACCIONES for fx in self.FRACCIONES
+            ]
+            return SimpleNamespace(multi_face_landmarks=[SimpleNamespace(landmark=landmark)])
+
+        def features(puntos, img_shape, estado=None):
+            self.puntos.append((puntos.copy(), tuple(img_shape[:2])))
+            return (0.3, 0.2, 0.0, 0.0, 0.0)
+
+        for nombre, valor in (
+            ("ROI_ACTIVO", True), ("TRACKING_ACTIVO", False), ("DEDUP_ACTIVO", False),
+            ("_detectar_landmarks", detectar), ("_calcular_features", features),
+            ("_registro_sesiones", pm.RegistroSesiones()),
+        ):
+            parche = mock.patch.object(pm, nombre, valor)
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def _frame(self, rostro, w=1280, h=960):
+        """PNG (sin pérdida) negro con el "rostro" blanco en (x0, y0, x1, y1)."""
+        import cv2
+
+        imagen = np.zeros((h, w, 3), dtype=np.uint8)
+        x0, y0, x1, y1 = rostro
+        imagen[y0:y1, x0:x1] = 255
+        return cv2.imencode(".png", imagen)[1].tobytes()
+
+    def _esperados(self, rostro):
+        x0, y0, x1, y1 = rostro
+        return np.array([
+            (x0 + fx * (x1 - x0), y0 + fy * (y1 - y0)) for fy in self.FRACCIONES for fx in self.FRACCIONES
+        ])
+
+    def test_recorte_devuelve_puntos_del_frame_completo(self):
+        for rostro, factor in (
+            ((400, 200, 940, 760), 4),  # 540 px: se decodifica a 1/4
+            ((400, 200, 700, 520), 2),
+            ((400, 200, 560, 360), 1),
+        ):
+            with self.subTest(factor=factor):
+                self.entradas.clear()
+                self.puntos.clear()
+                datos = self._frame(rostro)
+                pm.procesar_frame(datos, sesion_id=factor)  # pasada completa: recuerda el rostro
+                pm.procesar_frame(datos, sesion_id=factor)  # solo la región
+
+                (completo, forma_completa), (recorte, forma_recorte) = self.puntos
+                np.testing.assert_allclose(recorte, completo)
+                np.testing.assert_allclose(completo, self._esperados(rostro))
+                # Las features se calculan con la forma del frame completo
+                self.assertEqual(forma_recorte, forma_completa)
+
+                alto, ancho = self.entradas[1]
+                lado = rostro[2] - rostro[0]
+                # Región = rostro + 50 % de margen por lado, a la escala decodificada
+                self.assertLessEqual(abs(ancho - 2 * lado / factor), 2)
+                self.assertLess(alto * ancho, (960 // factor) * (1280 // factor))
+
+    def test_sin_rostro_en_la_region_repite_con_el_frame_completo(self):
+        inicial, movido = (100, 100, 400, 400), (800, 500, 1100, 800)
+        pm.procesar_frame(self._frame(inicial), sesion_id="s")
+        resultado = pm.procesar_frame(self._frame(movido), sesion_id="s")
+
+        self.assertIsNotNone(resultado)
+        # Pasada completa, recorte sin rostro y nueva pasada completa
+        self.assertEqual(self.entradas, [(960, 1280), (275, 275), (960, 1280)])
+        np.testing.assert_allclose(self.puntos[-1][0], self._esperados(movido))
+        np.testing.assert_allclose(pm._registro_sesiones.obtener("s").bbox, movido)
+
+    def test_region_acotada_al_frame(self):
+        estado = pm.EstadoSesion("s")
+        estado.bbox = (0.0, 10.0, 200.0, 210.0)
+        self.assertEqual(estado.factor_reduccion(), 1)
+        self.assertEqual(estado.region(1, (480, 640)), (0, 0, 300, 310))
+        estado.bbox = (1000.0, 700.0, 1280.0, 960.0)
+        self.assertEqual(estado.factor_reduccion(), 2)
+        self.assertEqual(estado.region(2, (480, 640)), (430, 285, 640, 480))
+
+
+class CalentamientoTests(SimpleTestCase):
+    """motor.calentar y en qué procesos corre (AtencionConfig.ready)."""
+
+    def test_calienta_cada_instancia_y_el_camino_con_rostro(self):
+        from unittest import mock
+
+        from atencion import motor
+
+        pool = pm.FaceMeshPool(tamano=2)
+        self.addCleanup(pool.cerrar)
+        poses = []
+        original = pm.calcular_head_pose
+
+        def head_pose(*args, **kwargs):
+            poses.append(original(*args, **kwargs))
+            return poses[-1]
+
+        with mock.patch.object(pm, "obtener_pool", return_value=pool), \
+                mock.patch.object(pm, "calcular_head_pose", head_pose), \
+                mock.patch.object(motor, "clasificar") as clasificar:
+            motor.calentar()
+
+        self.assertEqual((pool._creadas, pool._libres.qsize()), (2, 2))
+        # solvePnP corrió sobre landmarks reales del rostro
+        self.assertEqual(len(poses), 1)
+        self.assertNotIn(None, poses[0])
+        (filas,), _ = clasificar.call_args
+        ear, mar, yaw, pitch, roll = filas[0]
+        self.assertTrue(0.1 < ear < 0.6)
+        self.assertEqual(yaw, poses[0][1])
+
+    def test_solo_en_el_proceso_que_atiende(self):
+        from atencion.apps import proceso_servidor
+
+        casos = (
+            (["gunicorn", "sistema_educativo.wsgi"], {}, True),
+            (["/venv/bin/uvicorn", "sistema_educativo.asgi:application"], {}, True),
+            (["manage.py", "runserver"], {"RUN_MAIN": "true"}, True),
+            (["manage.py", "runserver", "--noreload"], {}, True),
+            (["manage.py", "runserver"], {}, False),  # padre del autoreloader
+            (["manage.py", "migrate"], {}, False),
+            (["manage.py", "test", "atencion"], {}, False),
+            (["manage.py"], {}, False),
+        )
+        for argv, entorno, esperado in casos:
+            self.assertEqual(proceso_servidor(argv, entorno), esperado, argv)
+
+
+class BenchmarkAtencionTests(SimpleTestCase):
+    """Entradas por defecto de benchmark_atencion."""
+
+    def test_frames_por_defecto_con_rostro(self):
+        from io import StringIO
+
+        from atencion.benchmarks import Banco
+
+        banco = Banco({"imagen": [], "frames": 4}, StringIO())
+        secuencia = banco.secuencia_video(banco.cargar_frames())
+
+        self.assertEqual(len(secuencia), 4)
+        for frame in secuencia:
+            self.assertEqual(frame.shape, (480, 640, 3))
+            self.assertIsNotNone(pm.procesar_frame_numpy(frame))
+
+
+class DatasetEntrenamientoTests(SimpleTestCase):
+    """El dataset de entrenamiento usa las mismas features que el servidor."""
+
+    def test_mismas_metricas_que_el_servidor(self):
+        import importlib.util
+        import os
+        import tempfile
+
+        if importlib.util.find_spec("tqdm") is None:
+            self.skipTest("sin tqdm")
+        from atencion.scripts.generar_dataset_ddd import procesar_imagen
+
+        frame = pm.cara_sintetica(giro=6)
+        png = cv2.imencode(".png", frame)[1].tobytes()
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, "rostro.png")
+            with open(ruta, "wb") as f:
+                f.write(png)
+            fila = procesar_imagen(ruta, 1)
+
+        metricas = pm.procesar_frame(png)
+        self.assertEqual(fila, [metricas[c] for c in ("ear", "mar", "yaw", "pitch", "roll")] + [1])
+
+
+class ValidarMetricasTests(SimpleTestCase):
+    """Comprobaciones de plausibilidad del modo sin frames."""
+
+    METRICAS = {"ear": 0.3, "mar": 0.2, "yaw": 5, "pitch": -10.0, "roll": 1.5}
+
+    def test_metricas_validas(self):
+        metricas, error = validar_metricas(self.METRICAS)
+        self.assertIsNone(error)
+        self.assertEqual(metricas["yaw"], 5.0)
+
+    def test_rechaza_invalidas(self):
+        for cambio in ({"ear": 2.0}, {"yaw": float("nan")}, {"roll": "1"}, {"mar": True}, {"pitch": None}):
+            metricas, error = validar_metricas({**self.METRICAS, **cambio})
+            self.assertIsNone(metricas)
+            self.assertIsNotNone(error)
+
+
+def _bosque_entrenado(semilla=0, n_arboles=20):
+    """RandomForest + StandardScaler pequeños sobre métricas sintéticas."""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(semilla)
+    X = rng.normal([0.25, 0.3, 0, 0, 0], [0.05, 0.2, 20, 20, 8], (600, 5))
+    y = ((X[:, 0] > 0.22) & (np.abs(X[:, 2]) < 25)).astype(int)
+
+    scaler = StandardScaler().fit(X[:400])
+    modelo = RandomForestClassifier(n_estimators=n_arboles, max_depth=8, random_state=semilla)
+    modelo.fit(scaler.transform(X[:400]), y[:400])
+    return modelo, scaler, X[400:]
+
+
+FEATURES = ["EAR", "MAR", "Yaw", "Pitch", "Roll"]
+
+
+class BosquePlanoTests(SimpleTestCase):
+    """El bosque aplanado (scaler en los umbrales) reproduce a scikit-learn."""
+
+    def test_mismas_probabilidades(self):
+        from atencion.scripts.bosque_plano import BosquePlano, exportar_bosque
+
+        modelo, scaler, prueba = _bosque_entrenado()
+        bosque = BosquePlano(exportar_bosque(modelo, scaler, FEATURES))
+
+        np.testing.assert_array_equal(
+            bosque.predict_proba(prueba), modelo.predict_proba(scaler.transform(prueba))
+        )
+        np.testing.assert_array_equal(bosque.predict(prueba), modelo.predict(scaler.transform(prueba)))
+
+    def test_cargar_directorio_mapeado(self):
+        import os
+        import tempfile
+
+        from atencion.scripts.bosque_plano import BosquePlano, exportar_bosque, guardar_bosque
+
+        modelo, scaler, prueba = _bosque_entrenado(n_arboles=5)
+        arreglos = exportar_bosque(modelo, scaler, FEATURES)
+
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta_npz = os.path.join(directorio, "bosque.npz")
+            np.savez(ruta_npz, **arreglos)
+            guardar_bosque(arreglos, os.path.join(directorio, "plano"))
+
+            plano = BosquePlano.cargar(os.path.join(directorio, "plano"))
+            en_memoria = BosquePlano.cargar(ruta_npz, mmap=False)
+
+            for nombre in ("caracteristica", "umbral", "valor", "raices"):
+                self.assertIsInstance(getattr(plano, nombre), np.memmap)
+            self.assertIsInstance(plano._hijos, np.memmap)
+            self.assertNotIsInstance(en_memoria.umbral, np.memmap)
+            self.assertEqual(plano.features, FEATURES)
+            np.testing.assert_array_equal(plano.predict_proba(prueba), en_memoria.predict_proba(prueba))
+            np.testing.assert_array_equal(plano.predict(prueba), modelo.predict(scaler.transform(prueba)))
+
+    def test_npz_antiguo_se_convierte_al_cargar(self):
+        import os
+        import tempfile
+
+        from atencion.scripts.bosque_plano import BosquePlano, exportar_bosque
+
+        modelo, scaler, prueba = _bosque_entrenado(n_arboles=5)
+        arreglos = exportar_bosque(modelo, scaler, FEATURES)
+        # Formato .npz anterior: hijos izquierdo/derecho separados
+        hijos = arreglos.pop("hijos").reshape(-1, 2)
+        arreglos["izquierdo"], arreglos["derecho"] = hijos[:, 0], hijos[:, 1]
+
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta_npz = os.path.join(directorio, "modelo_atencion_rf.npz")
+            np.savez(ruta_npz, **arreglos)
+            esperado = BosquePlano.cargar(ruta_npz, mmap=False).predict_proba(prueba)
+
+            bosque = BosquePlano.cargar(ruta_npz)
+            convertido = os.path.join(directorio, "modelo_atencion_rf")
+            self.assertTrue(os.path.isfile(os.path.join(convertido, "hijos.npy")))
+            self.assertIsInstance(bosque.umbral, np.memmap)
+            self.assertIsInstance(bosque._hijos, np.memmap)
+            np.testing.assert_array_equal(bosque.predict_proba(prueba), esperado)
+
+            # La segunda carga reutiliza la conversión; un .npz más nuevo la rehace
+            creado = os.stat(os.path.join(convertido, "umbral.npy")).st_ino
+            BosquePlano.cargar(ruta_npz)
+            self.assertEqual(os.stat(os.path.join(convertido, "umbral.npy")).st_ino, creado)
+
+            otro, otro_scaler, _ = _bosque_entrenado(semilla=1, n_arboles=5)
+            np.savez(ruta_npz, **exportar_bosque(otro, otro_scaler, FEATURES))
+            futuro = os.path.getmtime(convertido) + 10
+            os.utime(ruta_npz, (futuro, futuro))
+            np.testing.assert_array_equal(
+                BosquePlano.cargar(ruta_npz).predict_proba(prueba),
+                otro.predict_proba(otro_scaler.transform(prueba)),
+            )
+            self.assertEqual(sorted(os.listdir(directorio)), ["modelo_atencion_rf", "modelo_atencion_rf.npz"])
+
+    def test_npz_en_directorio_de_solo_lectura(self):
+        import os
+        import tempfile
+        from unittest import mock
+
+        from atencion.scripts import bosque_plano
+        from atencion.scripts.bosque_plano import BosquePlano, exportar_bosque
+
+        modelo, scaler, prueba = _bosque_entrenado(n_arboles=5)
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta_npz = os.path.join(directorio, "bosque.npz")
+            np.savez(ruta_npz, **exportar_bosque(modelo, scaler, FEATURES))
+
+            with mock.patch.object(bosque_plano.tempfile, "mkdtemp", side_effect=PermissionError), \
+                    self.assertLogs("atencion.scripts.bosque_plano", "WARNING"):
+                bosque = BosquePlano.cargar(ruta_npz)
+
+            self.assertNotIsInstance(bosque.umbral, np.memmap)
+            np.testing.assert_array_equal(bosque.predict(prueba), modelo.predict(scaler.transform(prueba)))
+
+
+class RegistroModelosTests(SimpleTestCase):
+    """Versiones publicadas, puntero ACTIVO y recarga en caliente."""
+
+    def setUp(self):
+        import tempfile
+
+        from atencion.scripts.bosque_plano import exportar_bosque
+        from atencion.scripts.registro_modelos import RegistroModelos
+
+        self.directorio = tempfile.TemporaryDirectory()
+        self.registro = RegistroModelos(self.directorio.name)
+        self.versiones = []
+        for semilla in (0, 1):
+            modelo, scaler, self.prueba = _bosque_entrenado(semilla, n_arboles=5)
+            self.versiones.append(self.registro.publicar(
+                exportar_bosque(modelo, scaler, FEATURES),
+                {"features": FEATURES},
+                version=f"v{semilla}",
+            ))
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def test_activar_y_recargar(self):
+        from atencion.scripts.registro_modelos import ModeloActivo
+
+        self.assertEqual(self.registro.versiones(), ["v0", "v1"])
+        self.registro.activar("v0")
+        activo = ModeloActivo(self.registro, revision=0)
+        self.assertEqual(activo.obtener().version, "v0")
+
+        niveles, prob = activo.obtener().predecir_lote(self.prueba)
+        self.assertEqual(niveles.shape, (len(self.prueba),))
+        self.assertTrue(((prob >= 0) & (prob <= 1)).all())
+
+        self.registro.activar("v1")
+        self.assertEqual(activo.obtener().version, "v1")
+        self.assertEqual(self.registro.metadata("v1")["version"], "v1")
+
+    def test_version_inexistente(self):
+        with self.assertRaises(ValueError):
+            self.registro.activar("v9")
+
+    def test_cambio_fallido_mantiene_version_y_avisa(self):
+        from unittest import mock
+
+        from atencion.scripts.registro_modelos import ModeloActivo
+
+        self.registro.activar("v0")
+        activo = ModeloActivo(self.registro, revision=0)
+        activo.obtener()
+
+        self.registro.activar("v1")
+        with mock.patch.object(self.registro, "cargar", side_effect=OSError("corrupto")), \
+                self.assertLogs("atencion.scripts.registro_modelos", "WARNING") as registros:
+            self.assertEqual(activo.obtener().version, "v0")
+        self.assertIn("se mantiene v0", registros.output[0])
+
+
+class MicroLotesTests(SimpleTestCase):
+    """Reparto de un micro-lote entre llamadores concurrentes (inferencia.py)."""
+
+    def _funcion(self, matriz):
+        self.llamadas.append(len(matriz))
+        if np.isnan(matriz).any():
+            raise ValueError("fila inválida")
+        return matriz[:, 0] * 10, matriz[:, 1], "v1"
+
+    def setUp(self):
+        self.llamadas = []
+
+    def _en_paralelo(self, lotes, matrices):
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(len(matrices)) as pool:
+            futuros = [pool.submit(lotes.predecir, m) for m in matrices]
+            return [f.exception() or f.result() for f in futuros]
+
+    def test_una_llamada_y_cada_uno_recibe_sus_filas(self):
+        from atencion.inferencia import MicroLotes
+
+        matrices = [
+            np.arange(5 * n, dtype=float).reshape(n, 5) + 100 * n for n in (1, 2, 3)
+        ]
+        lotes = MicroLotes(self._funcion, ventana=5, max_filas=6)
+
+        resultados = self._en_paralelo(lotes, matrices)
+
+        self.assertEqual(self.llamadas, [6])
+        for matriz, (niveles, prob, version) in zip(matrices, resultados):
+            np.testing.assert_array_equal(niveles, matriz[:, 0] * 10)
+            np.testing.assert_array_equal(prob, matriz[:, 1])
+            self.assertEqual(version, "v1")
+
+    def test_error_se_entrega_a_todos(self):
+        from atencion.inferencia import MicroLotes
+
+        lotes = MicroLotes(self._funcion, ventana=5, max_filas=2)
+        resultados = self._en_paralelo(lotes, [np.zeros((1, 5)), np.full((1, 5), np.nan)])
+
+        self.assertEqual(self.llamadas, [2])
+        self.assertTrue(all(isinstance(r, ValueError) for r in resultados))
+
+        # El hilo sigue atendiendo después del error
+        niveles, _, _ = lotes.predecir(np.ones((2, 5)))
+        np.testing.assert_array_equal(niveles, [10.0, 10.0])
+
+    def test_matriz_vacia_sin_hilo(self):
+        from atencion.inferencia import MicroLotes
+
+        lotes = MicroLotes(self._funcion)
+        niveles, _, _ = lotes.predecir(np.empty((0, 5)))
+
+        self.assertEqual(len(niveles), 0)
+        self.assertIsNone(lotes._hilo)
+
+
+def _frames_agregado(n=50, semilla=0, inicio=None):
+    """Frames sintéticos (metricas, nivel, score, momento) a 1 fps desde `inicio` (ahora)."""
+    from datetime import timedelta
+
+    from django.utils import timezone
+
+    rng = np.random.default_rng(semilla)
+    inicio = inicio or timezone.now()
+    frames = []
+    for i in range(n):
+        metricas = {
+            "ear": float(rng.uniform(0.1, 0.35)),
+            "mar": float(rng.uniform(0.2, 0.8)),
+            "yaw": float(rng.uniform(-45, 45)),
+            "pitch": float(rng.uniform(-30, 30)),
+            "roll": 0.0,
+        }
+        score = float(rng.uniform(0, 100))
+        frames.append((metricas, int(score >= 50), score, inicio + timedelta(seconds=i)))
+    return frames
+
+
+def _sesion_de_prueba():
+    """Curso / nivel / fase / recurso mínimos y una SesionMonitoreo."""
+    from atencion.models import SesionMonitoreo
+    from cursos.models import Curso, Fase, Nivel, Recurso
+    from usuarios.models import Usuario
+
+    docente = Usuario.objects.create(username="doc", email="d@x.com", rol="docente")
+    estudiante = Usuario.objects.create(username="est", email="e@x.com", rol="estudiante")
+    curso = Curso.objects.create(nombre="C", descripcion="x", docente=docente)
+    fase = Fase.objects.create(nivel=Nivel.objects.create(curso=curso, orden=1, nombre="N"), orden=1, nombre="F")
+    recurso = Recurso.objects.create(fase=fase, nombre="R", tipo="video", archivo="recursos/x.mp4")
+    return SesionMonitoreo.objects.create(estudiante=estudiante, recurso=recurso, fase=fase)
+
+
+class AgregadosSesionTests(TestCase):
+    """Agregados en línea de la sesión: combinables y volcados a SesionMonitoreo."""
+
+    def test_combinar_por_partes_igual_a_una_pasada(self):
+        from atencion.agregados import Acumulador, EstadoAgregado
+
+        frames = _frames_agregado()
+        completo = EstadoAgregado()
+        for frame in frames:
+            completo.registrar(*frame, alfa=0.1)
+
+        # Tres volcados: cada uno arranca un delta nuevo
+        partes = EstadoAgregado()
+        guardado = Acumulador()
+        for inicio, fin in ((0, 10), (10, 35), (35, 50)):
+            for frame in frames[inicio:fin]:
+                partes.registrar(*frame, alfa=0.1)
+            guardado = guardado.combinar(partes.delta)
+            partes.delta = Acumulador()
+
+        for campo in Acumulador.CAMPOS:
+            self.assertAlmostEqual(getattr(guardado, campo), getattr(completo.delta, campo), places=9)
+
+        score, patrones = guardado.resumen()
+        self.assertAlmostEqual(score, np.mean([f[2] for f in frames]))
+        self.assertEqual(patrones["frames"], 50)
+        self.assertEqual(patrones["segundos"], 49.0)
+
+    def test_cerrar_guarda_en_la_sesion(self):
+        from atencion.agregados import AgregadorSesiones
+
+        sesion = _sesion_de_prueba()
+
+        frames = _frames_agregado()
+        agregador = AgregadorSesiones(intervalo=3600)
+        for frame in frames[:20]:
+            agregador.registrar(sesion.id, *frame)
+        agregador.guardar(sesion.id)
+        for frame in frames[20:]:
+            agregador.registrar(sesion.id, *frame)
+        agregador.cerrar(sesion.id)
+
+        sesion.refresh_from_db()
+        self.assertAlmostEqual(sesion.score_atencion, np.mean([f[2] for f in frames]))
+        self.assertEqual(sesion.patrones["frames"], 50)
+        self.assertEqual(
+            sesion.patrones["fraccion_no_atento"], round(sum(1 for f in frames if not f[1]) / 50, 4)
+        )
+
+
+    def test_barrido_periodico_sin_frames_nuevos(self):
+        import threading
+        from unittest import mock
+
+        from atencion.agregados import AgregadorSesiones
+
+        agregador = AgregadorSesiones(intervalo=0.05)
+        volcado = threading.Event()
+        # El hilo sigue vivo después de la prueba: guardar queda reemplazado
+        agregador.guardar = mock.Mock(side_effect=lambda *a, **k: volcado.set())
+
+        # Un solo frame y ninguno más: lo vuelca el hilo de fondo
+        agregador.registrar("s", *_frames_agregado(n=1)[0])
+        self.assertTrue(volcado.wait(2))
+        agregador.guardar.assert_called_with("s", olvidar=False)
+
+class BufferEscrituraTests(TestCase):
+    """Escritura diferida: nada llega a la base hasta el lote o el guardado explícito."""
+
+    def test_diferida_guarda_al_vaciar(self):
+        from atencion.escritura import BufferEscritura
+        from atencion.models import AtencionVisual
+
+        # Intervalo largo: solo escribe el guardado explícito (en este hilo)
+        buffer = BufferEscritura("diferida", max_filas=100, intervalo=3600)
+        buffer.agregar([AtencionVisual(score_atencion=float(i)) for i in range(10)])
+        self.assertEqual(buffer.pendientes, 10)
+        self.assertEqual(AtencionVisual.objects.count(), 0)
+
+        buffer.guardar()
+        self.assertEqual(buffer.pendientes, 0)
+        self.assertEqual(AtencionVisual.objects.count(), 10)
+
+    def test_base_caida_tope_de_pendientes(self):
+        from unittest import mock
+
+        from atencion.escritura import BufferEscritura
+        from atencion.models import AtencionVisual
+
+        buffer = BufferEscritura("diferida", max_filas=5, intervalo=3600, max_pendientes=12)
+        registros = [AtencionVisual(score_atencion=float(i)) for i in range(30)]
+        # Sin hilo de fondo: todas las escrituras son las del llamador (contrapresión)
+        with mock.patch.object(buffer, "_iniciar"), \
+                mock.patch.object(AtencionVisual.objects, "bulk_create", side_effect=RuntimeError("base caída")), \
+                self.assertLogs("atencion.escritura", "ERROR") as registro:
+            for inicio in range(0, 30, 5):
+                buffer.agregar(registros[inicio:inicio + 5])
+                self.assertLessEqual(buffer.pendientes, 12)
+
+        self.assertEqual(buffer.pendientes + buffer.descartados, 30)
+        self.assertGreater(buffer.descartados, 0)
+        self.assertTrue(any("descartaron" in linea for linea in registro.output))
+
+        # La base vuelve: se guardan los más recientes que quedaron
+        buffer.guardar()
+        self.assertEqual(buffer.pendientes, 0)
+        self.assertEqual(
+            sorted(AtencionVisual.objects.values_list("score_atencion", flat=True)),
+            [float(i) for i in range(30 - 12, 30)],
+        )
+
+    def test_fork_con_lock_tomado(self):
+        import os
+        import threading
+
+        from atencion.escritura import BufferEscritura
+
+        if not hasattr(os, "fork"):
+            self.skipTest("sin os.fork")
+
+        buffer = BufferEscritura("diferida", max_filas=5, intervalo=3600)
+        tomado, soltar = threading.Event(), threading.Event()
+
+        def sostener():
+            # Otro hilo del padre tiene la condición al momento del fork
+            with buffer._condicion:
+                tomado.set()
+                soltar.wait(5)
+
+        hilo = threading.Thread(target=sostener)
+        hilo.start()
+        tomado.wait(5)
+        pid = os.fork()
+        if pid == 0:
+            libres = buffer._condicion.acquire(timeout=1) and buffer._escritura.acquire(timeout=1)
+            os._exit(0 if libres and buffer.pendientes == 0 else 1)
+        soltar.set()
+        hilo.join()
+
+        _, estado = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(estado), 0)
+
+    def test_modo_invalido(self):
+        from atencion.escritura import BufferEscritura
+
+        with self.assertRaises(ValueError):
+            BufferEscritura("a veces")
+
+
+class BloquesAtencionTests(TestCase):
+    """Bloques columnares: lo que se registra es lo que cargar_sesion devuelve."""
+
+    def test_ida_y_vuelta(self):
+        from atencion.bloques import AlmacenBloques, cargar_sesion
+        from atencion.models import BloqueAtencion
+
+        sesion = _sesion_de_prueba()
+        frames = _frames_agregado(n=20)
+        almacen = AlmacenBloques(max_frames=7, intervalo=3600)
+        for metricas, nivel, score, momento in frames:
+            almacen.registrar(sesion.id, metricas, nivel, score, momento, "v1")
+        almacen.cerrar(sesion.id)
+
+        self.assertEqual(
+            list(BloqueAtencion.objects.filter(sesion=sesion).values_list("n_frames", flat=True).order_by("inicio")),
+            [7, 7, 6],
+        )
+        datos = cargar_sesion(sesion.id)
+        np.testing.assert_array_equal(datos["ear"], np.float32([f[0]["ear"] for f in frames]))
+        np.testing.assert_array_equal(datos["score"], np.float32([f[2] for f in frames]))
+        np.testing.assert_array_equal(datos["etiqueta"], [f[1] for f in frames])
+        self.assertEqual(
+            (datos["timestamp"][-1] - datos["timestamp"][0]).astype(int), 19000
+        )
+
+
+def _insertar_registros(sesion, frames):
+    from atencion.models import AtencionVisual
+
+    AtencionVisual.objects.bulk_create([
+        AtencionVisual(
+            sesion=sesion, estudiante_id=sesion.estudiante_id, recurso_id=sesion.recurso_id,
+            fase_id=sesion.fase_id, score_atencion=score, nivel_atencion=str(nivel),
+            timestamp=momento, **metricas,
+        )
+        for metricas, nivel, score, momento in frames
+    ])
+
+
+def _cliente(usuario):
+    from rest_framework.test import APIClient
+
+    cliente = APIClient()
+    cliente.force_authenticate(usuario)
+    return cliente
+
+
+def _clasificar_fijo(filas):
+    """Reemplazo del modelo en las pruebas de endpoints (sin archivos de modelo)."""
+    return [1] * len(filas), [80.0] * len(filas), "prueba"
+
+
+def _sesion_en_curso(requiere_frames=True):
+    """Sesión de prueba con el monitoreo iniciado hace un minuto (modo A)."""
+    from datetime import timedelta
+
+    from django.utils import timezone
+
+    from cursos.models import Curso
+
+    sesion = _sesion_de_prueba()
+    Curso.objects.update(requiere_frames=requiere_frames)
+    ahora = timezone.now()
+    sesion.inicio, sesion.fin = ahora - timedelta(minutes=1), ahora + timedelta(minutes=1)
+    sesion.save()
+    return sesion
+
+
+class ResumenesAtencionTests(TestCase):
+    """Los resúmenes incrementales dan lo mismo que agregar los registros crudos."""
+
+    def test_incremental_igual_a_crudo(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from atencion.resumenes import CRUDO, actualizar_resumenes, resumen_por_estudiante, serie_por_minuto
+
+        sesion = _sesion_de_prueba()
+        frames = _frames_agregado(n=150)
+
+        # Dos corridas: la segunda solo suma los registros nuevos
+        _insertar_registros(sesion, frames[:100])
+        actualizar_resumenes(hasta=timezone.now())
+        _insertar_registros(sesion, frames[100:])
+        minutos, estudiantes = actualizar_resumenes(hasta=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(estudiantes, 1)
+
+        for resumen, crudo in (
+            (serie_por_minuto(sesion), serie_por_minuto(sesion, CRUDO)),
+            (resumen_por_estudiante(recurso_id=sesion.recurso_id),
+             resumen_por_estudiante(CRUDO, recurso_id=sesion.recurso_id)),
+        ):
+            self.assertEqual(len(resumen), len(crudo))
+            for a, b in zip(resumen, crudo):
+                self.assertEqual(a["frames"], b["frames"])
+                self.assertAlmostEqual(a["score_medio"], b["score_medio"])
+                self.assertAlmostEqual(a["fraccion_atento"], b["fraccion_atento"])
+                for metrica in ("ear", "yaw"):
+                    self.assertAlmostEqual(a["varianzas"][metrica], b["varianzas"][metrica])
+
+        self.assertEqual(sum(m["frames"] for m in serie_por_minuto(sesion)), 150)
+
+    def test_bloques_igual_a_filas(self):
+        from unittest import mock
+
+        from atencion.bloques import AlmacenBloques
+        from atencion.models import BloqueAtencion
+        from atencion.resumenes import CRUDO, actualizar_resumenes, resumen_por_estudiante, serie_por_minuto
+
+        sesion = _sesion_de_prueba()
+        frames = _frames_agregado(n=150)
+        _insertar_registros(sesion, frames)
+        esperado = (serie_por_minuto(sesion, CRUDO), resumen_por_estudiante(CRUDO, recurso_id=sesion.recurso_id))
+
+        # Solo bloques; el bloque abierto se reescribe con cada frame (intervalo=0)
+        almacen = AlmacenBloques(max_frames=40, intervalo=0)
+        with mock.patch("atencion.resumenes.GUARDAR_FILAS", False):
+            for metricas, nivel, score, momento in frames[:100]:
+                almacen.registrar(sesion.id, metricas, nivel, score, momento, "v1")
+            actualizar_resumenes()
+            # El bloque abierto sigue creciendo: solo se suman sus frames nuevos
+            for metricas, nivel, score, momento in frames[100:]:
+                almacen.registrar(sesion.id, metricas, nivel, score, momento, "v1")
+            almacen.cerrar(sesion.id)
+            actualizar_resumenes()
+            self.assertEqual(actualizar_resumenes(), (0, 0))
+
+            obtenidos = [
+                (serie_por_minuto(sesion), resumen_por_estudiante(recurso_id=sesion.recurso_id)),
+                (serie_por_minuto(sesion, CRUDO), resumen_por_estudiante(CRUDO, recurso_id=sesion.recurso_id)),
+            ]
+
+        self.assertEqual(
+            sorted(BloqueAtencion.objects.values_list("n_frames", "n_resumidos")), [(30, 30), (40, 40), (40, 40), (40, 40)]
+        )
+        for obtenido in obtenidos:
+            for serie, serie_esperada in zip(obtenido, esperado):
+                self.assertEqual(len(serie), len(serie_esperada))
+                for a, b in zip(serie, serie_esperada):
+                    self.assertEqual(a.get("minuto"), b.get("minuto"))
+                    self.assertEqual(a["frames"], b["frames"])
+                    self.assertEqual(a["fraccion_atento"], b["fraccion_atento"])
+                    # Los bloques guardan float32
+                    self.assertAlmostEqual(a["score_medio"], b["score_medio"], places=4)
+                    self.assertAlmostEqual(a["varianzas"]["yaw"], b["varianzas"]["yaw"], places=3)
+
+
+class RetencionTests(TestCase):
+    """Purga por antigüedad y borrado de cursos con su telemetría, por lotes."""
+
+    def test_purga_conserva_resumenes(self):
+        from datetime import timedelta
+
+        from django.core.management import CommandError, call_command
+        from django.utils import timezone
+
+        from atencion.models import AtencionVisual, ResumenEstudianteRecurso
+        from atencion.retencion import purgar_frames_antiguos
+
+        sesion = _sesion_de_prueba()
+        _insertar_registros(sesion, _frames_agregado(n=30))
+        antiguos = list(AtencionVisual.objects.values_list("pk", flat=True)[:20])
+        AtencionVisual.objects.filter(pk__in=antiguos).update(fecha=timezone.now() - timedelta(days=200))
+
+        registros, _ = purgar_frames_antiguos(dias=180, lote=7, pausa=0)
+
+        self.assertEqual(registros, 20)
+        self.assertEqual(AtencionVisual.objects.count(), 10)
+        # Lo purgado ya estaba en el resumen (los 10 recientes entran en la próxima corrida)
+        self.assertEqual(ResumenEstudianteRecurso.objects.get().n_frames, 20)
+
+        # Tras la purga los resúmenes son la única copia: no se reconstruyen
+        with self.assertRaises(CommandError):
+            call_command("resumir_atencion", "--reconstruir")
+        self.assertEqual(ResumenEstudianteRecurso.objects.get().n_frames, 20)
+
+    def test_purga_de_bloques_solo_resumidos(self):
+        from datetime import timedelta
+        from unittest import mock
+
+        from django.core.management import CommandError, call_command
+        from django.utils import timezone
+
+        from atencion.bloques import AlmacenBloques
+        from atencion.models import BloqueAtencion, ResumenEstudianteRecurso
+        from atencion.retencion import purgar_frames_antiguos
+
+        sesion = _sesion_de_prueba()
+        almacen = AlmacenBloques(max_frames=10, intervalo=3600)
+        for metricas, nivel, score, momento in _frames_agregado(n=30, inicio=timezone.now() - timedelta(days=200)):
+            almacen.registrar(sesion.id, metricas, nivel, score, momento, "v1")
+        almacen.cerrar(sesion.id)
+
+        with mock.patch("atencion.resumenes.GUARDAR_FILAS", False), \
+                mock.patch("atencion.retencion.GUARDAR_FILAS", False):
+            # Sin resumir, los bloques son la única copia de esos frames
+            with mock.patch("atencion.retencion.actualizar_resumenes"):
+                self.assertEqual(purgar_frames_antiguos(dias=180, lote=2, pausa=0), (0, 0))
+            self.assertEqual(BloqueAtencion.objects.count(), 3)
+
+            self.assertEqual(purgar_frames_antiguos(dias=180, lote=2, pausa=0), (0, 3))
+
+        self.assertFalse(BloqueAtencion.objects.exists())
+        self.assertEqual(ResumenEstudianteRecurso.objects.get().n_frames, 30)
+        with self.assertRaises(CommandError):
+            call_command("resumir_atencion", "--reconstruir")
+
+    def test_borrar_curso_por_lotes(self):
+        from atencion.models import AtencionVisual, SesionMonitoreo
+        from atencion.retencion import borrar_con_telemetria
+        from cursos.models import Curso
+
+        sesion = _sesion_de_prueba()
+        _insertar_registros(sesion, _frames_agregado(n=30))
+
+        total = borrar_con_telemetria(Curso.objects.get(), lote=7, pausa=0)
+
+        self.assertEqual(total, 30)
+        self.assertFalse(Curso.objects.exists())
+        self.assertFalse(SesionMonitoreo.objects.exists())
+        self.assertFalse(AtencionVisual.objects.exists())
+
+
+class FinalizacionSesionTests(TestCase):
+    """Cierre de sesiones: agregados finales desde los frames y barrido de vencidas."""
+
+    def test_finalizar_calcula_desde_frames(self):
+        from datetime import datetime, timedelta, timezone as dt_timezone
+
+        from django.utils import timezone
+
+        from atencion.agregados import UMBRAL_OJOS_CERRADOS, finalizar_sesiones
+
+        sesion = _sesion_en_curso()
+        frames = _frames_agregado(n=40)
+        _insertar_registros(sesion, frames)
+        # Timestamp del cliente fuera de la corrida: no cuenta ni estira la duración
+        viejo = (frames[0][0], 0, 0.0, datetime(2025, 1, 1, tzinfo=dt_timezone.utc))
+        _insertar_registros(sesion, [viejo])
+
+        self.assertEqual(finalizar_sesiones([sesion.id]), 1)
+
+        sesion.refresh_from_db()
+        self.assertAlmostEqual(sesion.score_atencion, np.mean([f[2] for f in frames]), places=4)
+        self.assertEqual(sesion.patrones["frames"], 40)
+        self.assertEqual(
+            sesion.patrones["perclos"],
+            round(sum(f[0]["ear"] < UMBRAL_OJOS_CERRADOS for f in frames) / 40, 4),
+        )
+        self.assertIsNotNone(sesion.finalizada)
+        self.assertLessEqual(sesion.fin, timezone.now())
+        self.assertEqual(sesion.duracion, sesion.fin - sesion.inicio)
+        self.assertLess(sesion.duracion, timedelta(minutes=2))
+
+    def test_finalizada_no_admite_frames_ni_volcados_tardios(self):
+        from unittest import mock
+
+        from atencion.agregados import AgregadorSesiones, finalizar_sesiones
+
+        sesion = _sesion_en_curso(requiere_frames=False)
+        frames = _frames_agregado(n=10, inicio=sesion.inicio)
+        _insertar_registros(sesion, frames)
+        # Otro worker tiene frames de la sesión sin volcar
+        otro_worker = AgregadorSesiones(intervalo=3600)
+        otro_worker.registrar(sesion.id, *_frames_agregado(n=1, semilla=3)[0])
+
+        finalizar_sesiones([sesion.id])
+        sesion.refresh_from_db()
+        final = (sesion.score_atencion, sesion.patrones)
+
+        self.assertTrue(otro_worker.cerrar(sesion.id))
+        sesion.refresh_from_db()
+        self.assertEqual((sesion.score_atencion, sesion.patrones), final)
+
+        cliente = _cliente(sesion.estudiante)
+        metricas = {"ear": 0.3, "mar": 0.2, "yaw": 5.0, "pitch": -10.0, "roll": 1.5}
+        url = f"/api/sesiones/{sesion.id}/monitoreo-atencion/"
+        with mock.patch("atencion.servicios.clasificar", _clasificar_fijo):
+            self.assertEqual(cliente.post(url, {"metricas": metricas}, format="json").status_code, 409)
+            respuesta = cliente.post(f"{url}lote/", {"frames": [{"metricas": metricas}]}, format="json")
+            self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(sesion.registros_atencion.count(), 10)
+
+    def test_nueva_corrida_reabre_la_sesion(self):
+        from unittest import mock
+
+        from atencion.agregados import finalizar_sesiones
+
+        sesion = _sesion_en_curso()
+        _insertar_registros(sesion, _frames_agregado(n=10, inicio=sesion.inicio))
+        finalizar_sesiones([sesion.id])
+
+        with mock.patch("atencion.servicios.clasificar", _clasificar_fijo):
+            respuesta = _cliente(sesion.estudiante).post(
+                f"/api/sesiones/{sesion.id}/monitoreo-atencion/", {"duracion": 30}, format="json"
+            )
+        self.assertEqual(respuesta.status_code, 200)
+
+        sesion.refresh_from_db()
+        self.assertIsNone(sesion.finalizada)
+        self.assertIsNone(sesion.patrones)
+        self.assertEqual(sesion.duracion.total_seconds(), 30)
+
+        # La corrida nueva solo agrega sus propios frames
+        nuevos = _frames_agregado(n=5, semilla=1)
+        _insertar_registros(sesion, nuevos)
+        finalizar_sesiones([sesion.id])
+        sesion.refresh_from_db()
+        self.assertEqual(sesion.patrones["frames"], 5)
+        self.assertAlmostEqual(sesion.score_atencion, np.mean([f[2] for f in nuevos]), places=4)
+
+    def test_cierre_libera_estado_de_vision(self):
+        import sys
+        from unittest import mock
+
+        from atencion.agregados import reiniciar_sesion
+        from atencion.motor import liberar_sesion
+        from atencion.servicios import guardar_pendientes_en_hilo
+
+        sesion = _sesion_en_curso()
+        with mock.patch.object(pm, "_registro_sesiones", pm.RegistroSesiones()) as registro:
+            # Nueva corrida (modo A)
+            estado = registro.obtener(sesion.id)
+            reiniciar_sesion(sesion, 30)
+            self.assertNotIn(sesion.id, registro)
+            self.assertTrue(estado.cerrado)
+
+            # Desconexión del WebSocket
+            registro.obtener(sesion.id)
+            guardar_pendientes_en_hilo(sesion.id)
+            self.assertNotIn(sesion.id, registro)
+
+            # POST /finalizar/
+            registro.obtener(sesion.id)
+            respuesta = _cliente(sesion.estudiante).post(f"/api/sesiones/{sesion.id}/finalizar/")
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertNotIn(sesion.id, registro)
+
+        # Sin el stack de visión cargado no hay nada que liberar ni se importa
+        with mock.patch.dict(sys.modules):
+            del sys.modules["atencion.scripts.procesamiento_mediapipe"]
+            liberar_sesion(sesion.id)
+            self.assertNotIn("atencion.scripts.procesamiento_mediapipe", sys.modules)
+
+    def test_comando_finaliza_vencidas_e_historicas(self):
+        from datetime import timedelta
+        from io import StringIO
+
+        from django.core.management import call_command
+        from django.utils import timezone
+
+        from atencion.models import SesionMonitoreo
+        from cursos.models import Recurso
+
+        vencida = _sesion_de_prueba()
+        ahora = timezone.now()
+        vencida.inicio, vencida.fin = ahora - timedelta(hours=2), ahora - timedelta(hours=1)
+        vencida.save()
+
+        def otra_sesion(nombre, **campos):
+            # Una sesión por (estudiante, recurso, fase): cada una con su recurso
+            recurso = Recurso.objects.create(fase=vencida.fase, nombre=nombre, tipo="video", archivo="recursos/x.mp4")
+            return SesionMonitoreo.objects.create(
+                estudiante=vencida.estudiante, recurso=recurso, fase=vencida.fase, **campos
+            )
+
+        historica = otra_sesion("R2")
+        en_curso = otra_sesion("R3", inicio=ahora, fin=ahora + timedelta(hours=1))
+        for sesion in (vencida, historica, en_curso):
+            _insertar_registros(sesion, _frames_agregado(n=10, inicio=sesion.inicio))
+
+        call_command("finalizar_sesiones", "--historico", "--lote", "1", stdout=StringIO())
+
+        vencida.refresh_from_db()
+        historica.refresh_from_db()
+        en_curso.refresh_from_db()
+        self.assertIsNotNone(vencida.finalizada)
+        self.assertIsNotNone(vencida.score_atencion)
+        # Histórica sin `fin`: se completa el score pero no se cierra
+        self.assertIsNotNone(historica.score_atencion)
+        self.assertIsNone(historica.finalizada)
+        self.assertIsNone(en_curso.finalizada)
+
+
+class IndicesConsultasTests(TestCase):
+    """
+    Con un volumen realista (y ANALYZE), las consultas calientes usan los
+    índices compuestos: lo comprueba EXPLAIN QUERY PLAN de SQLite.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        from datetime import timedelta
+
+        from django.db import connection
+        from django.utils import timezone
+
+        from atencion.models import AtencionVisual, NotaAcademica, SesionMonitoreo
+        from cursos.models import Curso, Fase, Nivel, Recurso
+        from recomendaciones.models import HistorialEstudiante
+        from usuarios.models import Usuario
+
+        docente = Usuario.objects.create(username="doc", email="d@x.com", rol="docente")
+        estudiantes = Usuario.objects.bulk_create([
+            Usuario(username=f"est{i}", email=f"e{i}@x.com", rol="estudiante") for i in range(30)
+        ])
+        fases = []
+        for c in range(2):
+            curso = Curso.objects.create(nombre=f"C{c}", descripcion="x", docente=docente)
+            nivel = Nivel.objects.create(curso=curso, orden=1, nombre="N")
+            fases += [Fase.objects.create(nivel=nivel, orden=f + 1, nombre=f"F{f}") for f in range(4)]
+        recursos = [
+            Recurso.objects.create(fase=fase, nombre="R", tipo="video", archivo="recursos/x.mp4")
+            for fase in fases
+        ]
+
+        sesiones = SesionMonitoreo.objects.bulk_create([
+            SesionMonitoreo(estudiante=estudiante, recurso=recurso, fase=recurso.fase)
+            for estudiante in estudiantes for recurso in recursos
+        ])
+        inicio = timezone.now()
+        AtencionVisual.objects.bulk_create([
+            AtencionVisual(
+                sesion=sesion, estudiante_id=sesion.estudiante_id, recurso_id=sesion.recurso_id,
+                fase_id=sesion.fase_id, score_atencion=50.0, nivel_atencion="1",
+                ear=0.3, mar=0.1, yaw=0.0, pitch=0.0, roll=0.0,
+                timestamp=inicio + timedelta(seconds=i),
+            )
+            for sesion in sesiones for i in range(50)
+        ], batch_size=2000)
+        NotaAcademica.objects.bulk_create([
+            NotaAcademica(estudiante=estudiante, recurso=recurso, nota=70.0)
+            for estudiante in estudiantes for recurso in recursos
+        ])
+        HistorialEstudiante.objects.bulk_create([
+            HistorialEstudiante(
+                estudiante=estudiante, curso=recurso.fase.nivel.curso, nivel=recurso.fase.nivel,
+                fase=recurso.fase, recurso=recurso,
+            )
+            for estudiante in estudiantes for recurso in recursos
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        cls.sesion = sesiones[0]
+        cls.estudiante, cls.recurso, cls.curso = estudiantes[0], recursos[0], fases[0].nivel.curso
+
+    def _plan(self, queryset):
+        from django.db import connection
+
+        sql, parametros = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, parametros)
+            return " | ".join(fila[-1] for fila in cursor.fetchall())
+
+    def _indice_unico(self, tabla, columnas):
+        """Nombre del índice único de SQLite (sqlite_autoindex_...) sobre esas columnas."""
+        from django.db import connection
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA index_list({tabla})")
+            for fila in cursor.fetchall():
+                nombre, unico = fila[1], fila[2]
+                cursor.execute(f"PRAGMA index_info({nombre})")
+                if unico and [info[2] for info in cursor.fetchall()] == list(columnas):
+                    return nombre
+        self.fail(f"{tabla} no tiene índice único sobre {columnas}")
+
+    def test_frames_de_sesion_en_orden(self):
+        from atencion.models import AtencionVisual
+
+        plan = self._plan(AtencionVisual.objects.filter(sesion=self.sesion).order_by("timestamp"))
+        self.assertIn("atencionvisual_sesion_ts_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_nota_combinada(self):
+        from atencion.models import AtencionVisual, NotaAcademica, SesionMonitoreo
+
+        filtro = {"estudiante": self.estudiante, "recurso": self.recurso}
+        # La restricción única de SQLite queda como sqlite_autoindex_...
+        sesion_unica = self._indice_unico(
+            SesionMonitoreo._meta.db_table, ("estudiante_id", "recurso_id", "fase_id")
+        )
+        plan = self._plan(SesionMonitoreo.objects.filter(**filtro))
+        self.assertIn(f"USING INDEX {sesion_unica} (estudiante_id=? AND recurso_id=?)", plan)
+
+        nota_unica = self._indice_unico(NotaAcademica._meta.db_table, ("estudiante_id", "recurso_id"))
+        plan = self._plan(NotaAcademica.objects.filter(**filtro))
+        self.assertIn(f"USING INDEX {nota_unica} (estudiante_id=? AND recurso_id=?)", plan)
+        self.assertIn("atencionvisual_est_rec_idx", self._plan(AtencionVisual.objects.filter(**filtro)))
+
+    def test_historial_por_curso_y_estudiante(self):
+        from recomendaciones.models import HistorialEstudiante
+
+        plan = self._plan(HistorialEstudiante.objects.filter(curso=self.curso, estudiante=self.estudiante))
+        self.assertIn("historial_curso_est_idx", plan)
+        self.assertIn("curso_id=? AND estudiante_id=?", plan)
+
+
+class MonitoreoWebSocketTests(TestCase):
+    """Canal WebSocket: validación de cada mensaje y cierre ordenado."""
+
+    def _conversar(self, sesion, mensajes):
+        import asyncio
+
+        from asgiref.sync import async_to_sync
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        from atencion.websocket import monitoreo_websocket
+
+        entrada = [
+            {"type": "websocket.connect"},
+            *({"type": "websocket.receive", **mensaje} for mensaje in mensajes),
+            {"type": "websocket.disconnect"},
+        ]
+        enviados = []
+
+        async def receive():
+            await asyncio.sleep(0)
+            return entrada.pop(0)
+
+        async def send(mensaje):
+            enviados.append(mensaje)
+
+        scope = {
+            "type": "websocket",
+            "path": f"/ws/sesiones/{sesion.id}/monitoreo-atencion/",
+            "query_string": f"token={AccessToken.for_user(sesion.estudiante)}".encode(),
+        }
+        async_to_sync(monitoreo_websocket)(scope, receive, send)
+        return enviados
+
+    def test_valida_cada_mensaje(self):
+        import json
+        from unittest import mock
+
+        from atencion.servicios import MAX_BYTES_FRAME
+
+        sesion = _sesion_de_prueba()
+        with mock.patch("atencion.websocket.analizar_frame_en_hilo") as analizar, \
+                mock.patch("atencion.websocket.guardar_pendientes_en_hilo"):
+            enviados = self._conversar(sesion, [
+                {"bytes": b"GIF89a" + bytes(10)},
+                {"bytes": b"\xff\xd8\xff" + bytes(MAX_BYTES_FRAME)},
+                {"text": json.dumps({"frame": "data:image/gif;base64,R0lGODlhAQABAAAAACw="})},
+            ])
+
+        analizar.assert_not_called()
+        errores = [json.loads(m["text"]) for m in enviados if m["type"] == "websocket.send"]
+        self.assertEqual([e["tipo"] for e in errores], ["error"] * 3)
+        self.assertIn("máximo", errores[1]["error"])
+
+    def test_rechaza_sesion_finalizada(self):
+        from unittest import mock
+
+        from django.utils import timezone
+
+        from atencion.websocket import CIERRE_FINALIZADA
+
+        sesion = _sesion_de_prueba()
+        sesion.finalizada = timezone.now()
+        sesion.save()
+        with mock.patch("atencion.websocket.analizar_frame_en_hilo") as analizar:
+            enviados = self._conversar(sesion, [{"bytes": b"\xff\xd8\xff" + bytes(10)}])
+
+        self.assertEqual(enviados, [{"type": "websocket.close", "code": CIERRE_FINALIZADA}])
+        analizar.assert_not_called()
+
+    def test_volcado_final_despues_del_frame_en_curso(self):
+        import time
+        from unittest import mock
+
+        sesion = _sesion_de_prueba()
+        orden = []
+
+        def analizar(sesion, frame):
+            time.sleep(0.2)
+            orden.append("analizar")
+            return {"error": "No se detectó rostro."}
+
+        with mock.patch("atencion.websocket.analizar_frame_en_hilo", analizar), \
+                mock.patch("atencion.websocket.guardar_pendientes_en_hilo", lambda _: orden.append("guardar")):
+            self._conversar(sesion, [{"bytes": b"\xff\xd8\xff" + bytes(10)}] * 2)
+
+        self.assertEqual(orden, ["analizar", "analizar", "guardar"])
+
+
+class MonitoreoFrameBinarioTests(TestCase):
+    """POST monitoreo-atencion/ con la imagen como cuerpo (octet-stream, image/*) o multipart."""
+
+    JPEG = b"\xff\xd8\xff\xe0" + bytes(60)
+    METRICAS = {"ear": 0.3, "mar": 0.2, "yaw": 5.0, "pitch": -10.0, "roll": 1.5}
+
+    def setUp(self):
+        from unittest import mock
+
+        self.sesion = _sesion_en_curso()
+        self.cliente = _cliente(self.sesion.estudiante)
+        self.url = f"/api/sesiones/{self.sesion.id}/monitoreo-atencion/?modo=sincrono"
+        self.recibidos = []
+
+        def procesar(imagen, **_):
+            self.recibidos.append(bytes(imagen))
+            return dict(self.METRICAS)
+
+        for objetivo, reemplazo in (
+            ("atencion.servicios.clasificar", _clasificar_fijo),
+            ("atencion.servicios.procesar_frame", procesar),
+        ):
+            parche = mock.patch(objetivo, reemplazo)
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def test_cuerpo_binario(self):
+        for tipo in ("application/octet-stream", "image/jpeg", "image/webp"):
+            respuesta = self.cliente.post(self.url, self.JPEG, content_type=tipo)
+            self.assertEqual(respuesta.status_code, 200, tipo)
+            self.assertEqual(respuesta.data["metricas"], self.METRICAS)
+
+        self.assertEqual(self.recibidos, [self.JPEG] * 3)
+
+    def test_archivo_multipart(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        archivo = SimpleUploadedFile("frame.jpg", self.JPEG, content_type="image/jpeg")
+        respuesta = self.cliente.post(self.url, {"frame": archivo}, format="multipart")
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.recibidos, [self.JPEG])
+
+    def test_limite_de_tamano(self):
+        from unittest import mock
+
+        with mock.patch("atencion.parsers.MAX_BYTES_FRAME", len(self.JPEG) - 1):
+            for tipo in ("application/octet-stream", "image/jpeg"):
+                respuesta = self.cliente.post(self.url, self.JPEG, content_type=tipo)
+                self.assertEqual(respuesta.status_code, 400, tipo)
+                self.assertIn("máximo", respuesta.data["detail"])
+
+        self.assertEqual(self.cliente.post(self.url, b"", content_type="image/jpeg").status_code, 400)
+        self.assertEqual(self.recibidos, [])
+
+
+class MonitoreoSoloMetricasTests(TestCase):
+    """POST monitoreo-atencion/ con {"metricas": {...}} extraídas en el navegador."""
+
+    METRICAS = {"ear": 0.3, "mar": 0.2, "yaw": 5.0, "pitch": -10.0, "roll": 1.5}
+
+    def setUp(self):
+        from unittest import mock
+
+        parche = mock.patch("atencion.servicios.clasificar", _clasificar_fijo)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def _enviar(self, sesion, cuerpo):
+        url = f"/api/sesiones/{sesion.id}/monitoreo-atencion/"
+        return _cliente(sesion.estudiante).post(url, cuerpo, format="json")
+
+    def test_curso_sin_frames(self):
+        from unittest import mock
+
+        from atencion.models import AtencionVisual
+
+        sesion = _sesion_en_curso(requiere_frames=False)
+        with mock.patch("atencion.servicios.procesar_frame") as procesar:
+            respuesta = self._enviar(sesion, {"metricas": self.METRICAS})
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data["metricas"], self.METRICAS)
+        self.assertEqual(respuesta.data["score_atencion"], 80.0)
+        procesar.assert_not_called()
+        self.assertEqual(AtencionVisual.objects.get(sesion=sesion).ear, 0.3)
+
+        respuesta = self._enviar(sesion, {"metricas": {**self.METRICAS, "ear": "nan"}})
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_curso_requiere_frames(self):
+        from atencion.models import AtencionVisual
+
+        sesion = _sesion_en_curso(requiere_frames=True)
+        respuesta = self._enviar(sesion, {"metricas": self.METRICAS})
+        self.assertEqual(respuesta.status_code, 403)
+
+        url = f"/api/sesiones/{sesion.id}/monitoreo-atencion/lote/"
+        respuesta = _cliente(sesion.estudiante).post(url, {"frames": [{"metricas": self.METRICAS}]}, format="json")
+        self.assertEqual(respuesta.status_code, 403)
+        self.assertFalse(AtencionVisual.objects.exists())
+
+
+class MonitoreoAsincronoTests(TestCase):
+    """POST monitoreo-atencion/?modo=asincrono y su consulta en monitoreo-atencion/resultado/."""
+
+    FRAME = "data:image/jpeg;base64,/9j/4AAQSkZJRgABAQAAAQABAAD/2w=="
+
+    def setUp(self):
+        self.sesion = _sesion_en_curso()
+        self.cliente = _cliente(self.sesion.estudiante)
+        self.url = f"/api/sesiones/{self.sesion.id}/monitoreo-atencion/"
+
+    def _usar_cola(self, **opciones):
+        from unittest import mock
+
+        from atencion.cola import ColaMonitoreo
+
+        cola = ColaMonitoreo(**opciones)
+        parche = mock.patch("atencion.views.cola_monitoreo", cola)
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.addCleanup(lambda: cola._executor and cola._executor.shutdown())
+        return cola
+
+    def _resultado(self, secuencia):
+        return self.cliente.get(f"{self.url}resultado/", {"secuencia": secuencia})
+
+    def test_encolar_y_consultar_resultado(self):
+        import threading
+        import time
+        from unittest import mock
+
+        cola = self._usar_cola(hilos=1)
+        liberar = threading.Event()
+
+        def analizar(sesion, frame):
+            liberar.wait(5)
+            return {"metricas": {"ear": 0.3}, "score_atencion": 80.0, "estado_atencion": 1}
+
+        with mock.patch("atencion.cola.analizar_frame_en_hilo", analizar):
+            respuesta = self.cliente.post(f"{self.url}?modo=asincrono", {"frame": self.FRAME}, format="json")
+            self.assertEqual(respuesta.status_code, 202)
+            self.assertEqual(respuesta.data["estado"], "pendiente")
+            secuencia = respuesta.data["secuencia"]
+
+            self.assertEqual(self._resultado(secuencia).status_code, 202)
+            liberar.set()
+
+            limite = time.monotonic() + 5
+            while cola.pendientes and time.monotonic() < limite:
+                time.sleep(0.01)
+            respuesta = self._resultado(secuencia)
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data["estado"], "listo")
+        self.assertEqual(respuesta.data["score_atencion"], 80.0)
+        self.assertEqual(self._resultado(secuencia + 1).status_code, 404)
+        self.assertEqual(self._resultado("x").status_code, 400)
+
+    def test_cola_llena(self):
+        self._usar_cola(max_pendientes=0)
+
+        respuesta = self.cliente.post(f"{self.url}?modo=asincrono", {"frame": self.FRAME}, format="json")
+
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertEqual(respuesta["Retry-After"], "1")
+
+    def test_valida_antes_de_encolar(self):
+        cola = self._usar_cola(max_pendientes=0)
+
+        respuesta = self.cliente.post(
+            f"{self.url}?modo=asincrono", {"frame": "data:image/gif;base64,R0lGODlhAQABAAAAACw="}, format="json"
+        )
+
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(cola.pendientes, 0)
+
+
+class MonitoreoLoteTests(TestCase):
+    """POST /api/sesiones/<id>/monitoreo-atencion/lote/"""
+
+    METRICAS = {"ear": 0.3, "mar": 0.2, "yaw": 5.0, "pitch": -10.0, "roll": 1.5}
+
+    def setUp(self):
+        from unittest import mock
+
+        self.sesion = _sesion_en_curso(requiere_frames=False)
+        self.cliente = _cliente(self.sesion.estudiante)
+        self.url = f"/api/sesiones/{self.sesion.id}/monitoreo-atencion/lote/"
+        parche = mock.patch("atencion.servicios.clasificar", _clasificar_fijo)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def _lote(self, *timestamps):
+        return {"frames": [{"metricas": self.METRICAS, "timestamp": t} for t in timestamps]}
+
+    def test_lote_con_timestamps(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from atencion.models import AtencionVisual
+
+        ahora = timezone.now()
+        respuesta = self.cliente.post(self.url, self._lote(
+            int((ahora - timedelta(seconds=3)).timestamp() * 1000),
+            (ahora - timedelta(seconds=2)).isoformat(),
+            None,
+        ), format="json")
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data["procesados"], 3)
+        self.assertEqual([r["indice"] for r in respuesta.data["resultados"]], [0, 1, 2])
+        self.assertEqual(AtencionVisual.objects.filter(sesion=self.sesion).count(), 3)
+
+    def test_lote_de_frames_en_orden(self):
+        from unittest import mock
+
+        frame = "data:image/jpeg;base64,/9j/4AAQSkZJRgABAQAAAQABAAD/2w=="
+        lote = {"frames": [{"frame": frame}, {"frame": frame}, {"metricas": self.METRICAS}]}
+        with mock.patch("atencion.servicios.procesar_frame", side_effect=[None, dict(self.METRICAS)]):
+            respuesta = self.cliente.post(self.url, lote, format="json")
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual((respuesta.data["procesados"], respuesta.data["sin_rostro"]), (2, 1))
+        resultados = respuesta.data["resultados"]
+        self.assertEqual([r["indice"] for r in resultados], [0, 1, 2])
+        self.assertEqual(resultados[0]["error"], "No se detectó rostro.")
+        self.assertEqual(resultados[1]["metricas"], self.METRICAS)
+
+    def test_lote_vacio_o_demasiado_grande(self):
+        from atencion.servicios import MAX_FRAMES_LOTE
+
+        for cuerpo in ({"frames": []}, {"frames": "x"}, self._lote(*[None] * (MAX_FRAMES_LOTE + 1))):
+            self.assertEqual(self.cliente.post(self.url, cuerpo, format="json").status_code, 400)
+
+    def test_cuerpo_no_objeto(self):
+        respuesta = self.cliente.post(self.url, [{"metricas": self.METRICAS}], format="json")
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_rechaza_timestamps_fuera_de_la_sesion(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from atencion.models import AtencionVisual
+
+        ahora = timezone.now()
+        for timestamp in (
+            "2025-01-01T10:00:00Z",
+            (ahora + timedelta(hours=1)).isoformat(),
+            (ahora - timedelta(minutes=5)).isoformat(),  # antes del inicio de la sesión
+            "ayer",
+            10 ** 20,
+        ):
+            respuesta = self.cliente.post(self.url, self._lote(ahora.isoformat(), timestamp), format="json")
+            self.assertEqual(respuesta.status_code, 400, timestamp)
+            self.assertIn("Elemento 1", respuesta.data["error"])
+
+        self.assertFalse(AtencionVisual.objects.exists())
+
+
+class TiempoImportacionTests(SimpleTestCase):
+    """
+    Presupuesto de arranque: `manage.py check` (que importa todas las URLs)
+    no debe cargar el stack de visión/ML, que se importa en la primera
+    llamada de monitoreo (atencion.motor).
+    """
+
+    MODULOS_PESADOS = ("cv2", "mediapipe", "numpy", "sklearn", "atencion.scripts", "atencion.inferencia")
+    PRESUPUESTO_SEGUNDOS = 2.0
+
+    def test_manage_check_sin_vision(self):
+        salida = subprocess.run(
+            [sys.executable, "-X", "importtime", "manage.py", "check"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(salida.returncode, 0, salida.stderr[-2000:])
+
+        importados = []
+        total_us = 0
+        for linea in salida.stderr.splitlines():
+            # "import time:  self [us] | cumulative | imported package"
+            if not linea.startswith("import time:"):
+                continue
+            _, acumulado, nombre = linea[len("import time:"):].split("|")
+            if not acumulado.strip().isdigit():
+                continue
+            importados.append(nombre.strip())
+            # Solo los imports de primer nivel: su acumulado incluye a los anidados
+            if not nombre[1:].startswith(" "):
+                total_us += int(acumulado)
+
+        pesados = [m for m in importados if m.startswith(self.MODULOS_PESADOS)]
+        self.assertEqual(pesados, [], "manage.py check importó módulos de visión/ML")
+        self.assertLess(total_us / 1e6, self.PRESUPUESTO_SEGUNDOS)
@@ -7,6 +7,7 @@ from .views import (
     NotaAcademicaViewSet,
     crear_sesion_para_mi,
     obtener_nota_combinada,
+    resumen_atencion,
 )
 
 router = DefaultRouter()
@@ -18,5 +19,6 @@ urlpatterns = [
     # Solo dejamos estos extras; "crear-multiples" lo maneja el @action del ViewSet
     path('sesiones/crear-para-mi/', crear_sesion_para_mi, name='crear_sesion_para_mi'),
     path('nota-combinada/', obtener_nota_combinada, name='nota_combinada'),
+    path('resumen-atencion/', resumen_atencion, name='resumen_atencion'),
     path('', include(router.urls)),
 ]
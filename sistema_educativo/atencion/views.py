@@ -1,8 +1,10 @@
-from django.utils import timezone
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db.models import Avg
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
@@ -16,12 +18,87 @@ from .serializers import (
 from cursos.models import Recurso, Fase, Nivel, Curso, Inscripcion
 from usuarios.models import Usuario
 
-# Procesamiento y modelo ML
-from atencion.scripts.procesamiento_mediapipe import procesar_frame
-from atencion.scripts.modelo_atencion_rf import predecir_atencion
+from .agregados import finalizar_sesiones, reiniciar_sesion
+from .cola import cola_monitoreo, ColaLlena, PENDIENTE
+from .motor import liberar_sesion
+from .parsers import FrameBinarioParser, FrameImagenParser
+from .resumenes import CRUDO, RESUMEN, resumen_por_estudiante, serie_por_minuto
+from .retencion import BorradoConTelemetriaMixin
+from .servicios import (
+    analizar_frames,
+    curso_requiere_frames,
+    parsear_timestamp,
+    validar_frame,
+    validar_timestamp,
+    validar_metricas,
+    MAX_FRAMES_LOTE,
+)
+
+
+def _frame_de_request(request):
+    """
+    Extrae el frame de la solicitud, en cualquiera de sus formatos:
+    - JSON: {"frame": "data:image/jpeg;base64,..."}
+    - multipart: campo de archivo "frame"
+    - application/octet-stream o image/*: el cuerpo es la imagen
+    Los formatos binarios se devuelven como bytes/memoryview (sin base64).
+    """
+    if isinstance(request.data, (bytes, bytearray)):
+        return request.data or None
+
+    archivo = request.FILES.get("frame")
+    if archivo is not None:
+        contenido = getattr(archivo, "file", None)
+        # InMemoryUploadedFile: vista directa del buffer, sin copia
+        if hasattr(contenido, "getbuffer"):
+            return contenido.getbuffer()
+        return archivo.read()
+
+    return request.data.get("frame")
+
+
+def _metricas_de_request(request):
+    """{"metricas": {...}} del modo sin frames, o None si no se envió."""
+    if not hasattr(request.data, "get"):
+        return None
+    return request.data.get("metricas")
+
+
+RESPUESTA_FRAMES_REQUERIDOS = {
+    "error": "El curso de esta sesión requiere enviar frames, no solo métricas."
+}
+
+RESPUESTA_SESION_FINALIZADA = {
+    "error": "La sesión ya finalizó; inicie el monitoreo otra vez para enviar frames."
+}
+
+
+def _timestamp_de_item(item, sesion):
+    """(momento, None) del elemento de un lote; momento None = hora del servidor."""
+    valor = item.get("timestamp")
+    if valor in (None, ""):
+        return None, None
+    momento = parsear_timestamp(valor)
+    if momento is None:
+        return None, "timestamp inválido (ISO 8601 o epoch en milisegundos)."
+    return momento, validar_timestamp(momento, sesion)
+
 
+def _fuente_de_request(request):
+    """?fuente=resumen (por defecto) o crudo; None si es otro valor."""
+    fuente = request.query_params.get("fuente", RESUMEN)
+    return fuente if fuente in (RESUMEN, CRUDO) else None
 
-class SesionMonitoreoViewSet(viewsets.ModelViewSet):
+
+def _modo_asincrono(request):
+    """?modo=asincrono / ?modo=sincrono; si no se indica, MONITOREO_ASINCRONO."""
+    modo = request.query_params.get("modo")
+    if modo in ("asincrono", "sincrono"):
+        return modo == "asincrono"
+    return getattr(settings, "MONITOREO_ASINCRONO", False)
+
+
+class SesionMonitoreoViewSet(BorradoConTelemetriaMixin, viewsets.ModelViewSet):
     """
     CRUD de sesiones de monitoreo + endpoints de IA.
     """
@@ -125,7 +202,18 @@ class SesionMonitoreoViewSet(viewsets.ModelViewSet):
     # B) MONITOREO FRAME A FRAME
     #    URL: POST /api/sesiones/<id>/monitoreo-atencion/
     # =====================================================
-    @action(detail=True, methods=["post"], url_path="monitoreo-atencion")
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path="monitoreo-atencion",
+        parser_classes=[
+            JSONParser,
+            FormParser,
+            MultiPartParser,
+            FrameBinarioParser,
+            FrameImagenParser,
+        ],
+    )
     def monitoreo_atencion(self, request, pk=None):
         """
         Maneja 2 modos:
@@ -135,17 +223,31 @@ class SesionMonitoreoViewSet(viewsets.ModelViewSet):
                { "duracion": 20 }
 
         2) FRAME A FRAME
-           Body:
+           Body (cualquiera de estos formatos):
                { "frame": "data:image/jpeg;base64,..." }
+               multipart/form-data con el archivo en el campo "frame"
+               bytes JPEG/WebP con Content-Type application/octet-stream o image/*
+
+        3) SOLO MÉTRICAS (extraídas en el navegador con MediaPipe)
+           Body:
+               { "metricas": {"ear": ..., "mar": ..., "yaw": ..., "pitch": ..., "roll": ...} }
+           Solo si el curso lo permite (Curso.requiere_frames = False).
+
+           Con ?modo=asincrono (o MONITOREO_ASINCRONO=True) el frame se
+           valida, se encola y se responde 202 con su "secuencia"; el
+           resultado se consulta en monitoreo-atencion/resultado/.
+
+        Los modos 2 y 3 responden 409 si la sesión ya está finalizada.
         """
         sesion = self.get_object()
 
         # ---- MODO A: iniciar monitoreo ----
-        duracion = request.data.get("duracion")
+        duracion = (
+            request.data.get("duracion") if hasattr(request.data, "get") else None
+        )
         if duracion is not None:
-            sesion.inicio = timezone.now()
-            sesion.fin = timezone.now() + timezone.timedelta(seconds=int(duracion))
-            sesion.save()
+            # Nueva corrida: la sesión (única por estudiante/recurso/fase) se reabre
+            reiniciar_sesion(sesion, int(duracion))
 
             return Response(
                 {
@@ -155,55 +257,241 @@ class SesionMonitoreoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_200_OK,
             )
 
+        if sesion.finalizada is not None:
+            return Response(RESPUESTA_SESION_FINALIZADA, status=status.HTTP_409_CONFLICT)
+
+        # ---- MODO C: métricas calculadas en el navegador ----
+        metricas = _metricas_de_request(request)
+        if metricas is not None:
+            if curso_requiere_frames(sesion):
+                return Response(RESPUESTA_FRAMES_REQUERIDOS, status=status.HTTP_403_FORBIDDEN)
+
+            metricas, error = validar_metricas(metricas)
+            if error:
+                return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+            resultado = analizar_frames(sesion, [(metricas, None)])[0]
+            return Response(
+                {"sesion": sesion.id, **resultado},
+                status=status.HTTP_200_OK,
+            )
+
         # ---- MODO B: recibir frame ----
-        frame_b64 = request.data.get("frame")
-        if not frame_b64:
+        frame = _frame_de_request(request)
+        if frame is None or len(frame) == 0:
             return Response(
                 {"error": "No se recibió 'frame' en la solicitud."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        resultado = procesar_frame(frame_b64)
+        if _modo_asincrono(request):
+            error = validar_frame(frame)
+            if error:
+                return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+            try:
+                secuencia = cola_monitoreo.encolar(sesion, frame)
+            except ColaLlena:
+                return Response(
+                    {"error": "Capacidad de procesamiento saturada, reintente."},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={"Retry-After": "1"},
+                )
+
+            return Response(
+                {"sesion": sesion.id, "secuencia": secuencia, "estado": PENDIENTE},
+                status=status.HTTP_202_ACCEPTED,
+            )
+
+        resultado = analizar_frames(sesion, [(frame, None)])[0]
 
-        if resultado is None:
+        if "error" in resultado:
             return Response(
-                {"error": "No se detectó rostro."},
+                {"error": resultado["error"]},
                 status=status.HTTP_422_UNPROCESSABLE_ENTITY,
             )
 
-        ear = resultado["ear"]
-        mar = resultado["mar"]
-        yaw = resultado["yaw"]
-        pitch = resultado["pitch"]
-        roll = resultado["roll"]
-
-        pred = predecir_atencion(ear, mar, yaw, pitch, roll)
-
-        AtencionVisual.objects.create(
-            sesion=sesion,
-            estudiante=sesion.estudiante,
-            recurso=sesion.recurso,
-            fase=sesion.fase,
-            ear=ear,
-            mar=mar,
-            yaw=yaw,
-            pitch=pitch,
-            roll=roll,
-            nivel_atencion=pred["nivel_atencion"],
-            score_atencion=pred.get("score"),
-            timestamp=timezone.now(),
+        return Response(
+            {
+                "sesion": sesion.id,
+                "metricas": resultado["metricas"],
+                "score_atencion": resultado["score_atencion"],
+                "estado_atencion": resultado["estado_atencion"],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    # =====================================================
+    # B.2) RESULTADO DE UN FRAME ENCOLADO (modo asíncrono)
+    #    URL: GET /api/sesiones/<id>/monitoreo-atencion/resultado/?secuencia=N
+    # =====================================================
+    @action(detail=True, methods=["get"], url_path="monitoreo-atencion/resultado")
+    def monitoreo_atencion_resultado(self, request, pk=None):
+        """
+        200 con el resultado si ya se procesó, 202 si sigue pendiente y 404
+        si la secuencia no se conoce en este proceso (expirada o atendida
+        por otro worker: ver los registros AtencionVisual de la sesión).
+        """
+        sesion = self.get_object()
+
+        try:
+            secuencia = int(request.query_params.get("secuencia"))
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "Se requiere 'secuencia' numérica."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        estado, resultado = cola_monitoreo.resultado(sesion.id, secuencia)
+        if estado is None:
+            return Response(
+                {"error": "Secuencia desconocida o expirada."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        if estado == PENDIENTE:
+            return Response(
+                {"sesion": sesion.id, "secuencia": secuencia, "estado": estado},
+                status=status.HTTP_202_ACCEPTED,
+            )
+
+        return Response(
+            {"sesion": sesion.id, "secuencia": secuencia, "estado": estado, **resultado},
+            status=status.HTTP_200_OK,
         )
 
+    # =====================================================
+    # C) MONITOREO POR LOTES
+    #    URL: POST /api/sesiones/<id>/monitoreo-atencion/lote/
+    # =====================================================
+    @action(detail=True, methods=["post"], url_path="monitoreo-atencion/lote")
+    def monitoreo_atencion_lote(self, request, pk=None):
+        """
+        Recibe varios frames con su timestamp en una sola solicitud.
+        Body:
+            {
+                "frames": [
+                    {"frame": "data:image/jpeg;base64,...", "timestamp": "2025-01-01T10:00:00Z"},
+                    {"frame": "...", "timestamp": 1735725601000},
+                    ...
+                ]
+            }
+        El timestamp puede ser ISO 8601 o epoch en milisegundos y debe caer
+        dentro de la sesión (sin futuro ni más de unos minutos de atraso).
+        Si el curso no requiere frames, cada elemento puede traer
+        "metricas" (EAR, MAR, pose del navegador) en lugar de "frame".
+        """
+        sesion = self.get_object()
+        if sesion.finalizada is not None:
+            return Response(RESPUESTA_SESION_FINALIZADA, status=status.HTTP_409_CONFLICT)
+
+        frames = request.data.get("frames") if isinstance(request.data, dict) else None
+        if not isinstance(frames, list) or not frames:
+            return Response(
+                {"error": "Se requiere 'frames' como lista no vacía."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if len(frames) > MAX_FRAMES_LOTE:
+            return Response(
+                {"error": f"Máximo {MAX_FRAMES_LOTE} frames por lote."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        entradas = []
+        requiere_frames = None
+        for i, item in enumerate(frames):
+            if isinstance(item, dict):
+                momento, error = _timestamp_de_item(item, sesion)
+                if error:
+                    return Response(
+                        {"error": f"Elemento {i}: {error}"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+
+            if isinstance(item, dict) and item.get("metricas") is not None:
+                if requiere_frames is None:
+                    requiere_frames = curso_requiere_frames(sesion)
+                if requiere_frames:
+                    return Response(RESPUESTA_FRAMES_REQUERIDOS, status=status.HTTP_403_FORBIDDEN)
+
+                metricas, error = validar_metricas(item["metricas"])
+                if error:
+                    return Response(
+                        {"error": f"Elemento {i}: {error}"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                entradas.append((metricas, momento))
+                continue
+
+            if not isinstance(item, dict) or not item.get("frame"):
+                return Response(
+                    {"error": f"El elemento {i} no contiene 'frame'."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            entradas.append((item["frame"], momento))
+
+        resultados = analizar_frames(sesion, entradas)
+
+        respuesta = []
+        for i, ((_, momento), resultado) in enumerate(zip(entradas, resultados)):
+            respuesta.append({"indice": i, "timestamp": momento, **resultado})
+
+        procesados = sum(1 for r in resultados if "error" not in r)
         return Response(
             {
                 "sesion": sesion.id,
-                "metricas": resultado,
-                "score_atencion": pred.get("score"),
-                "estado_atencion": pred["nivel_atencion"],
+                "procesados": procesados,
+                "sin_rostro": len(resultados) - procesados,
+                "resultados": respuesta,
             },
             status=status.HTTP_200_OK,
         )
 
+    # =====================================================
+    # D) ATENCIÓN MINUTO A MINUTO
+    #    URL: GET /api/sesiones/<id>/resumen-atencion/[?fuente=crudo]
+    # =====================================================
+    @action(detail=True, methods=["get"], url_path="resumen-atencion")
+    def resumen_atencion(self, request, pk=None):
+        """
+        Serie por minuto de la sesión (frames, score medio, fracción atenta,
+        medias y varianzas de EAR/MAR/pose). Se lee de ResumenMinuto
+        (`manage.py resumir_atencion`); con ?fuente=crudo se calcula desde
+        los registros AtencionVisual.
+        """
+        sesion = self.get_object()
+        fuente = _fuente_de_request(request)
+        if fuente is None:
+            return Response(
+                {"error": f"'fuente' debe ser '{RESUMEN}' o '{CRUDO}'."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            {"sesion": sesion.id, "fuente": fuente, "minutos": serie_por_minuto(sesion, fuente)},
+            status=status.HTTP_200_OK,
+        )
+
+    # =====================================================
+    # E) CIERRE DE LA SESIÓN
+    #    URL: POST /api/sesiones/<id>/finalizar/
+    # =====================================================
+    @action(detail=True, methods=["post"], url_path="finalizar")
+    def finalizar(self, request, pk=None):
+        """
+        Cierra la sesión: calcula score_atencion, patrones y duracion con una
+        consulta agregada sobre sus frames y marca `finalizada`. Si se llama
+        antes del `fin` previsto, la sesión termina ahora. Repetirlo
+        recalcula los agregados. Libera también su estado de visión
+        (FaceMesh en modo video) en este proceso.
+        """
+        sesion = self.get_object()
+        finalizar_sesiones([sesion.id])
+        liberar_sesion(sesion.id)
+        sesion.refresh_from_db()
+        return Response(self.get_serializer(sesion).data, status=status.HTTP_200_OK)
+
 
 class AtencionVisualViewSet(viewsets.ModelViewSet):
     queryset = AtencionVisual.objects.all()
@@ -328,3 +616,41 @@ def obtener_nota_combinada(request):
         },
         status=status.HTTP_200_OK,
     )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def resumen_atencion(request):
+    """
+    Atención por estudiante y recurso (todas sus sesiones).
+    Endpoint: GET /api/resumen-atencion/?estudiante=<id>&recurso=<id>[&fuente=crudo]
+    Se requiere al menos uno de los dos filtros.
+    """
+    filtros = {}
+    if request.query_params.get("estudiante"):
+        filtros["estudiante_id"] = request.query_params["estudiante"]
+    if request.query_params.get("recurso"):
+        filtros["recurso_id"] = request.query_params["recurso"]
+
+    if not filtros:
+        return Response(
+            {"detail": "Se requiere 'estudiante' o 'recurso' como parámetro."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    fuente = _fuente_de_request(request)
+    if fuente is None:
+        return Response(
+            {"detail": f"'fuente' debe ser '{RESUMEN}' o '{CRUDO}'."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        resultados = resumen_por_estudiante(fuente, **filtros)
+    except ValidationError:
+        return Response(
+            {"detail": "Identificador de recurso inválido."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    return Response({"fuente": fuente, "resultados": resultados}, status=status.HTTP_200_OK)
@@ -0,0 +1,197 @@
+"""
+Canal WebSocket de monitoreo de atención (ASGI puro, sin Channels).
+
+Ruta:  ws://<host>/ws/sesiones/<id>/monitoreo-atencion/?token=<jwt de acceso>
+
+El cliente envía frames por la misma conexión:
+    - mensaje binario: bytes JPEG/WebP
+    - mensaje de texto: {"frame": "data:image/jpeg;base64,..."}
+y recibe por cada frame procesado:
+    {"tipo": "resultado", "secuencia": n, "metricas": {...}, "score_atencion": ..., "estado_atencion": ...}
+    {"tipo": "resultado", "secuencia": n, "error": "No se detectó rostro."}
+
+Una sesión ya finalizada se rechaza con el código de cierre 4409.
+
+Cada conexión tiene una cola acotada (MONITOREO_WS_MAX_COLA). Si el cliente
+envía más rápido de lo que se procesa, se descarta el frame más antiguo
+(los frames viejos ya no aportan a un monitoreo en tiempo real) y se avisa
+con {"tipo": "descartados", "total": n}. Cada mensaje pasa por
+validar_frame (tamaño y formato, como en HTTP) antes de encolarse. El
+procesamiento de visión y la escritura en BD corren en un pool de hilos,
+fuera del event loop. Al desconectarse el cliente se procesan los frames
+ya recibidos y recién entonces se guardan los pendientes de la sesión.
+"""
+import asyncio
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+
+from .models import SesionMonitoreo
+from .servicios import analizar_frame_en_hilo, guardar_pendientes_en_hilo, validar_frame
+
+
+RUTA_MONITOREO = re.compile(
+    r"^/ws/sesiones/(?P<pk>[0-9a-fA-F-]{32,36})/monitoreo-atencion/?$"
+)
+
+MAX_COLA = getattr(settings, "MONITOREO_WS_MAX_COLA", 4)
+HILOS_CV = getattr(settings, "MONITOREO_WS_HILOS", os.cpu_count() or 1)
+
+# Pool compartido por todas las conexiones del proceso
+_executor = ThreadPoolExecutor(max_workers=HILOS_CV, thread_name_prefix="monitoreo-ws")
+
+# Códigos de cierre (rango de aplicación 4000-4999)
+CIERRE_NO_AUTENTICADO = 4401
+CIERRE_NO_ENCONTRADO = 4404
+CIERRE_FINALIZADA = 4409
+
+
+def _autenticar(token):
+    if not token:
+        return None
+    try:
+        auth = JWTAuthentication()
+        return auth.get_user(auth.get_validated_token(token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    finally:
+        close_old_connections()
+
+
+def _obtener_sesion(pk):
+    try:
+        return SesionMonitoreo.objects.get(pk=pk)
+    except (SesionMonitoreo.DoesNotExist, ValueError):
+        return None
+    finally:
+        close_old_connections()
+
+
+class ConexionMonitoreo:
+    """Estado de una conexión WebSocket abierta para una sesión."""
+
+    def __init__(self, sesion, send):
+        self.sesion = sesion
+        self.send = send
+        self.cola = asyncio.Queue(maxsize=MAX_COLA)
+        self.secuencia = 0
+        self.descartados = 0
+        self.abierta = True
+
+    async def enviar_json(self, datos):
+        if self.abierta:
+            await self.send({"type": "websocket.send", "text": json.dumps(datos, default=str)})
+
+    async def encolar(self, frame):
+        self.secuencia += 1
+        if self.cola.full():
+            # Backpressure: se descarta el frame más antiguo pendiente
+            self.cola.get_nowait()
+            self.cola.task_done()
+            self.descartados += 1
+            await self.enviar_json({"tipo": "descartados", "total": self.descartados})
+        self.cola.put_nowait((self.secuencia, frame))
+
+    async def procesar(self):
+        analizar = sync_to_async(analizar_frame_en_hilo, thread_sensitive=False, executor=_executor)
+        while True:
+            item = await self.cola.get()
+            if item is None:
+                break
+            secuencia, frame = item
+            try:
+                resultado = await analizar(self.sesion, frame)
+            except Exception:
+                resultado = {"error": "Error procesando el frame."}
+            finally:
+                self.cola.task_done()
+            await self.enviar_json({"tipo": "resultado", "secuencia": secuencia, **resultado})
+
+    async def cerrar(self):
+        """
+        Cliente desconectado: termina los frames en cola y el que está en
+        análisis (sin enviar resultados). Así ningún agregador.registrar
+        llega después del volcado final de la sesión.
+        """
+        self.abierta = False
+        await self.cola.put(None)
+
+
+def _frame_de_mensaje(mensaje):
+    if mensaje.get("bytes"):
+        return mensaje["bytes"]
+    texto = mensaje.get("text")
+    if not texto:
+        return None
+    try:
+        datos = json.loads(texto)
+    except ValueError:
+        return None
+    return datos.get("frame") if isinstance(datos, dict) else None
+
+
+async def monitoreo_websocket(scope, receive, send):
+    """Aplicación ASGI para conexiones `websocket`."""
+    coincidencia = RUTA_MONITOREO.match(scope.get("path", ""))
+
+    # El primer mensaje siempre es websocket.connect
+    await receive()
+
+    if coincidencia is None:
+        await send({"type": "websocket.close", "code": CIERRE_NO_ENCONTRADO})
+        return
+
+    query = parse_qs(scope.get("query_string", b"").decode())
+    token = (query.get("token") or [None])[0]
+
+    usuario = await sync_to_async(_autenticar)(token)
+    if usuario is None:
+        await send({"type": "websocket.close", "code": CIERRE_NO_AUTENTICADO})
+        return
+
+    sesion = await sync_to_async(_obtener_sesion)(coincidencia.group("pk"))
+    if sesion is None:
+        await send({"type": "websocket.close", "code": CIERRE_NO_ENCONTRADO})
+        return
+    if sesion.finalizada is not None:
+        await send({"type": "websocket.close", "code": CIERRE_FINALIZADA})
+        return
+
+    await send({"type": "websocket.accept"})
+
+    conexion = ConexionMonitoreo(sesion, send)
+    tarea = asyncio.create_task(conexion.procesar())
+    try:
+        while True:
+            mensaje = await receive()
+            if mensaje["type"] == "websocket.disconnect":
+                break
+            if mensaje["type"] != "websocket.receive":
+                continue
+
+            frame = _frame_de_mensaje(mensaje)
+            if not frame:
+                await conexion.enviar_json({"tipo": "error", "error": "Mensaje sin 'frame'."})
+                continue
+            error = validar_frame(frame)
+            if error:
+                await conexion.enviar_json({"tipo": "error", "error": error})
+                continue
+            await conexion.encolar(frame)
+    finally:
+        if not tarea.done():
+            await conexion.cerrar()
+        # Un error del procesador no impide el volcado final
+        await asyncio.gather(tarea, return_exceptions=True)
+        # El cliente se fue: registros diferidos y agregados de la sesión se guardan ya
+        await sync_to_async(
+            guardar_pendientes_en_hilo, thread_sensitive=False, executor=_executor
+        )(sesion.id)
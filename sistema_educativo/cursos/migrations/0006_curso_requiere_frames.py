@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cursos', '0005_alter_fase_options_alter_fase_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='curso',
+            name='requiere_frames',
+            field=models.BooleanField(default=True, help_text='Si es False, el navegador puede enviar solo las métricas de atención (EAR, MAR, pose) en lugar de los frames'),
+        ),
+    ]
@@ -23,6 +23,10 @@ class Curso(models.Model):
         validators=[MinValueValidator(0.0), MaxValueValidator(100.0)],
         help_text="Umbral de aprobación en porcentaje (0-100)"
     )
+    requiere_frames = models.BooleanField(
+        default=True,
+        help_text="Si es False, el navegador puede enviar solo las métricas de atención (EAR, MAR, pose) en lugar de los frames"
+    )
     creado_por = models.ForeignKey(
         Usuario,
         on_delete=models.SET_NULL,
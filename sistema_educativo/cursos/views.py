@@ -5,10 +5,11 @@ from rest_framework.response import Response
 from .models import Curso, Nivel, Fase, Recurso, Inscripcion
 from .serializers import CursoSerializer, NivelSerializer, FaseSerializer, RecursoSerializer, InscripcionSerializer
 from usuarios.models import Usuario
+from atencion.retencion import BorradoConTelemetriaMixin
 import csv
 
 
-class CursoViewSet(viewsets.ModelViewSet):
+class CursoViewSet(BorradoConTelemetriaMixin, viewsets.ModelViewSet):
     queryset = Curso.objects.all()
     serializer_class = CursoSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -51,7 +52,7 @@ class CursoViewSet(viewsets.ModelViewSet):
         ]
         return Response(data)
 
-class NivelViewSet(viewsets.ModelViewSet):
+class NivelViewSet(BorradoConTelemetriaMixin, viewsets.ModelViewSet):
     queryset = Nivel.objects.all()
     serializer_class = NivelSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -63,7 +64,7 @@ class NivelViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(curso_id=curso_id)
         return queryset
 
-class FaseViewSet(viewsets.ModelViewSet):
+class FaseViewSet(BorradoConTelemetriaMixin, viewsets.ModelViewSet):
     queryset = Fase.objects.all().order_by('nivel', 'orden')
     serializer_class = FaseSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -75,7 +76,7 @@ class FaseViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(nivel_id=nivel_id)
         return queryset.order_by('orden')
 
-class RecursoViewSet(viewsets.ModelViewSet):
+class RecursoViewSet(BorradoConTelemetriaMixin, viewsets.ModelViewSet):
     queryset = Recurso.objects.all()
     serializer_class = RecursoSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cursos', '0006_curso_requiere_frames'),
+        ('recomendaciones', '0002_alter_historialestudiante_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historialestudiante',
+            index=models.Index(fields=['curso', 'estudiante'], name='historial_curso_est_idx'),
+        ),
+    ]
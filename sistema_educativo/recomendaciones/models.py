@@ -113,4 +113,8 @@ class HistorialEstudiante(models.Model):
     class Meta:
         verbose_name = "Historial Estudiante"
         verbose_name_plural = "Historiales Estudiantes"
-        unique_together = ('estudiante', 'fase')  # Evita duplicados por estudiante y fase
\ No newline at end of file
+        unique_together = ('estudiante', 'fase')  # Evita duplicados por estudiante y fase
+        indexes = [
+            # El historial se consulta por curso y por curso + estudiante
+            models.Index(fields=['curso', 'estudiante'], name='historial_curso_est_idx'),
+        ]
\ No newline at end of file
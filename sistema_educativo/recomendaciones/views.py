@@ -45,6 +45,16 @@ class HistorialEstudianteViewSet(viewsets.ModelViewSet):
     serializer_class = HistorialEstudianteSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        curso_id = self.request.query_params.get("curso")
+        estudiante_id = self.request.query_params.get("estudiante")
+        if curso_id:
+            queryset = queryset.filter(curso_id=curso_id)
+        if estudiante_id:
+            queryset = queryset.filter(estudiante_id=estudiante_id)
+        return queryset
+
 # Endpoint para generar recomendación IA (Claude)
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
@@ -2,6 +2,8 @@
 ASGI config for sistema_educativo project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django; WebSocket connections go to the attention monitoring
+channel (atencion.websocket).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sistema_educativo.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Importar después de get_asgi_application() (requiere apps cargadas)
+from atencion.websocket import monitoreo_websocket  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        await monitoreo_websocket(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -100,6 +100,44 @@ WSGI_APPLICATION = 'sistema_educativo.wsgi.application'
 UMBRALES_ATENCION = {'ALTO': 80, 'MEDIO': 50, 'BAJO': 0}
 MAX_UPLOAD_SIZE = 104857600  # 100 MB
 
+# Monitoreo de atención
+MONITOREO_MAX_FRAMES_LOTE = 60  # frames por solicitud en monitoreo-atencion/lote/
+MONITOREO_MAX_BYTES_FRAME = 2 * 1024 * 1024  # frames binarios (octet-stream / image/*)
+MONITOREO_TIMESTAMP_ATRASO_MAX = 300  # segundos de atraso aceptados en timestamps del cliente (lotes)
+MONITOREO_TIMESTAMP_DESFASE_MAX = 5  # desfase de reloj tolerado (futuro, bordes de la sesión)
+MONITOREO_WS_MAX_COLA = 4  # frames pendientes por conexión WebSocket
+MONITOREO_WS_HILOS = os.cpu_count() or 1  # hilos de visión compartidos por las conexiones
+MONITOREO_ASINCRONO = False  # True: monitoreo-atencion encola y responde 202 (o ?modo=asincrono)
+MONITOREO_COLA_HILOS = os.cpu_count() or 1  # hilos de la cola de procesamiento en segundo plano
+MONITOREO_COLA_MAX_PENDIENTES = 256  # frames encolados antes de responder 503
+MONITOREO_COLA_MAX_RESULTADOS = 10000  # resultados retenidos en memoria para consulta
+MONITOREO_MICROLOTES = False  # agrupar predicciones concurrentes en una sola llamada al modelo
+MONITOREO_MICROLOTES_VENTANA_MS = 2  # espera máxima para juntar predicciones
+MONITOREO_MICROLOTES_MAX_FILAS = 128  # filas máximas por llamada al modelo
+MONITOREO_AGREGADO_INTERVALO = 10  # segundos entre volcados de agregados a SesionMonitoreo
+MONITOREO_AGREGADO_ALFA = 0.1  # peso del frame nuevo en la EWMA del score
+MONITOREO_AGREGADO_INACTIVIDAD = 300  # segundos sin frames antes de liberar el agregado
+MONITOREO_ESCRITURA = "directa"  # "diferida": AtencionVisual se guarda por lotes en segundo plano
+MONITOREO_ESCRITURA_MAX_FILAS = 500  # filas por bulk_create en modo diferido
+MONITOREO_ESCRITURA_INTERVALO_MS = 1000  # espera máxima antes de escribir (frames en riesgo ante un crash)
+MONITOREO_ESCRITURA_MAX_PENDIENTES = 20000  # con más pendientes, el llamador escribe en línea; si la base falla, tope (se descartan los más viejos)
+MONITOREO_ALMACENAMIENTO = "filas"  # "bloques": frames en BloqueAtencion columnar; "ambos"
+MONITOREO_BLOQUE_MAX_FRAMES = 600  # frames por BloqueAtencion
+MONITOREO_BLOQUE_INTERVALO = 10  # segundos entre reescrituras del bloque abierto
+MONITOREO_RETENCION_DIAS = 180  # frames crudos; resúmenes y agregados se guardan siempre
+MONITOREO_PURGA_LOTE = 5000  # filas por DELETE al purgar o borrar cursos/recursos/sesiones
+MONITOREO_PURGA_PAUSA_MS = 50  # pausa entre lotes para no acaparar el lock de escritura
+MONITOREO_BORRADO_ASINCRONO_MIN_FILAS = 10000  # desde cuántos frames el borrado sigue en segundo plano
+MONITOREO_CALENTAR = False  # True: cada worker (no migrate, test, etc.) pasa un rostro sintético por el pipeline al arrancar
+
+# Mensajes del monitoreo de atención (calentamiento, etc.) en consola
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"consola": {"class": "logging.StreamHandler"}},
+    "loggers": {"atencion": {"handlers": ["consola"], "level": "INFO"}},
+}
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
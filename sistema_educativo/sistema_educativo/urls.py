@@ -4,7 +4,7 @@ from rest_framework.routers import DefaultRouter
 
 from usuarios.views import UsuarioViewSet, PerfilUsuarioViewSet, CustomTokenObtainPairView
 from cursos.views import CursoViewSet, NivelViewSet, FaseViewSet, RecursoViewSet, InscripcionViewSet
-from atencion.views import SesionMonitoreoViewSet, AtencionVisualViewSet
+from atencion.views import SesionMonitoreoViewSet, AtencionVisualViewSet, resumen_atencion
 from recomendaciones.views import RecomendacionIAViewSet, HistorialEstudianteViewSet, generar_recomendacion_ia
 
 from rest_framework_simplejwt.views import TokenRefreshView
@@ -41,6 +41,9 @@ urlpatterns = [
     # Endpoint especial IA
     path('api/recomendaciones/generar/', generar_recomendacion_ia, name='generar_recomendacion_ia'),
 
+    # Atención por estudiante/recurso (desde los resúmenes)
+    path('api/resumen-atencion/', resumen_atencion, name='resumen_atencion'),
+
     # Rutas generadas automáticamente por Django REST Framework
     path('api/', include(router.urls)),
 